@@ -17,26 +17,30 @@ SO101 机械臂控制模块（基于 LeRobot + FeetechMotorsBus 的薄封装）
 
 本文件在此基础上，提供：
 - ArmController：按“关节 ID / 简单动作”来控制机械臂，方便与你的小车逻辑对接。
+  动作按 duration_ms 插值，由 arm_trajectory.TrajectoryStreamer 以固定频率流式写入目标位置；
+  arm_state.ArmStatePoller 在后台读取当前位置，get_state() / wait_until_reached() 不再阻塞读总线。
+  arm_kinematics.SO101Kinematics 提供末端位姿（get_end_effector_pose）和笛卡尔直线运动（move_linear）。
 """
 
 from __future__ import annotations
 
+import threading
 import time
-from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, Optional, Sequence
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
 
 import draccus
+import numpy as np
 from lerobot.motors import Motor, MotorCalibration, MotorNormMode
 from lerobot.motors.feetech import FeetechMotorsBus
 
+from arm_kinematics import KINEMATIC_JOINTS, SO101Kinematics
+from arm_model import SO101_JOINTS, SO101_LIMITS, JointLimit, JointModel
+from arm_state import POSITION_FIELD, ArmState, ArmStatePoller
+from arm_trajectory import JointTrajectory, TrajectoryStreamer
 
-@dataclass
-class JointLimit:
-    """单个关节的角度或开合范围限制."""
-
-    min_val: float
-    max_val: float
+# 动作完成回调 on_done(时序报告, 异常)，在轨迹线程中调用
+DoneCallback = Callable[[Dict, Optional[BaseException]], None]
 
 
 class ArmController:
@@ -57,6 +61,10 @@ class ArmController:
         port:      USB 串口设备路径，例如 '/dev/ttyACM0'
         robot_id:  标定时使用的 --robot.id，例如 'my_follower_arm'
         joint_limits: 关节限制配置，key 为关节 ID（1~6）
+        control_rate_hz: 轨迹流式写入频率
+        profile:   轨迹速度曲线，'trapezoid'（梯形速度）或 'cubic'（三次多项式）
+        state_poll_hz: 后台读取当前位置的频率，0 表示不启动后台轮询
+        poll_extras: 后台轮询是否同时读取负载和温度
     """
 
     def __init__(
@@ -64,29 +72,26 @@ class ArmController:
         port: str = "/dev/ttyACM0",
         robot_id: str = "my_follower_arm",
         joint_limits: Optional[Dict[int, JointLimit]] = None,
+        control_rate_hz: float = 50.0,
+        profile: str = "trapezoid",
+        state_poll_hz: float = 20.0,
+        poll_extras: bool = False,
     ) -> None:
         self._port = port
         self._robot_id = robot_id
+        self.profile = profile
 
         # 关节 ID -> 名称 映射
-        self.id_to_name: Dict[int, str] = {
-            1: "shoulder_pan",
-            2: "shoulder_lift",
-            3: "elbow_flex",
-            4: "wrist_flex",
-            5: "wrist_roll",
-            6: "gripper",
-        }
+        self.id_to_name: Dict[int, str] = dict(SO101_JOINTS)
 
         # 关节限制（1~5：角度，单位度；6：夹爪开合百分比 0~100）
-        self.joint_limits: Dict[int, JointLimit] = joint_limits or {
-            1: JointLimit(-90.0, 90.0),
-            2: JointLimit(-60.0, 90.0),
-            3: JointLimit(-120.0, 120.0),
-            4: JointLimit(-120.0, 120.0),
-            5: JointLimit(-180.0, 180.0),
-            6: JointLimit(0.0, 100.0),  # 夹爪开合 0~100%
-        }
+        self.joint_limits: Dict[int, JointLimit] = joint_limits or dict(SO101_LIMITS)
+
+        # 数组形式的关节模型（下标映射 + 限位向量），用于向量化限位和轨迹校验
+        self.joints = JointModel.from_limits(self.id_to_name, self.joint_limits)
+
+        # 关节 1~4 的运动学（末端位置和俯仰），几何参数或零点与实物不符时可替换
+        self.kinematics = SO101Kinematics(joint_model=self.joints)
 
         # 加载标定文件
         calibration = self._load_calibration(robot_id)
@@ -111,6 +116,23 @@ class ArmController:
         #   self._bus.enable_torque(...)
         self._bus.connect()
 
+        # 总线读写锁：轨迹线程写目标位置，其他线程可能同时读状态
+        self._bus_lock = threading.Lock()
+        self._streamer = TrajectoryStreamer(
+            self._write_goals, self._read_positions, rate_hz=control_rate_hz
+        )
+
+        # 最近一次动作的最终目标 {关节名: 值}，wait_until_reached 默认等待它
+        self._target: Dict[str, float] = {}
+
+        # 后台状态轮询
+        self.state_poller: Optional[ArmStatePoller] = None
+        if state_poll_hz > 0:
+            self.state_poller = ArmStatePoller(
+                self._read_field, rate_hz=state_poll_hz, poll_extras=poll_extras
+            )
+            self.state_poller.start()
+
     @staticmethod
     def _load_calibration(robot_id: str) -> Dict[str, MotorCalibration]:
         """
@@ -139,9 +161,61 @@ class ArmController:
             calibration = draccus.load(Dict[str, MotorCalibration], f)
         return calibration
 
+    # ===================== 总线读写 ===================== #
+    def _write_goals(self, goals: Dict[str, float]) -> None:
+        """同步写入多个关节的目标位置（轨迹线程每个控制周期调用一次）。"""
+        # 使用归一化写入：1~5 关节为角度（度），6 号为开合百分比（0~100）
+        with self._bus_lock:
+            self._bus.sync_write("Goal_Position", goals, normalize=True)
+
+    def _read_field(self, field: str) -> Dict[str, float]:
+        """同步读取全部关节的一个寄存器（位置为归一化值）。"""
+        with self._bus_lock:
+            values = self._bus.sync_read(field, normalize=True)
+        return {name: float(value) for name, value in values.items()}
+
+    def _read_positions(self) -> Dict[str, float]:
+        """全部关节的当前位置：优先使用后台轮询的新鲜快照，否则直接读总线。"""
+        state = self.get_state()
+        if state is not None and state.age < 0.5:
+            return dict(state.positions)
+        return self._read_field(POSITION_FIELD)
+
+    def _goals(
+        self, joint_ids: Sequence[int], values: Sequence[float], clamp: bool = True
+    ) -> Dict[str, float]:
+        """关节 ID 和目标值 -> {关节名: 目标值}，clamp=True 时按关节限位裁剪。"""
+        if len(joint_ids) != len(values):
+            raise ValueError("joint_ids 和 angles_deg 长度必须一致")
+        # 单个姿态走标量路径，数组限位只用于成批姿态和轨迹校验
+        return self.joints.goals(joint_ids, values, clamp=clamp)
+
+    def _plan(
+        self,
+        waypoints: Iterable[Dict[int, float]],
+        duration_ms: int,
+        pause_ms_between: int,
+        clamp: bool = True,
+    ):
+        """路径点 -> (目标列表, 每段用时)；段间停顿为目标不变的一段。"""
+        goals: List[Dict[str, float]] = []
+        durations: List[float] = []
+        for wp in waypoints:
+            if not wp:
+                continue
+            if goals and pause_ms_between > 0:
+                goals.append({})
+                durations.append(pause_ms_between / 1000.0)
+            goals.append(self._goals(list(wp.keys()), list(wp.values()), clamp=clamp))
+            durations.append(duration_ms / 1000.0)
+        return goals, durations
+
     # ===================== 对外高层接口 ===================== #
     def close(self) -> None:
-        """断开总线连接，释放扭矩。"""
+        """停止轨迹线程和状态轮询，断开总线连接，释放扭矩。"""
+        self._streamer.close()
+        if self.state_poller is not None:
+            self.state_poller.stop()
         if self._bus:
             self._bus.disconnect()
 
@@ -150,7 +224,9 @@ class ArmController:
         joint_id: int,
         angle_deg: float,
         duration_ms: int = 500,
-    ) -> None:
+        wait: bool = True,
+        on_done: Optional[DoneCallback] = None,
+    ) -> Optional[Dict]:
         """
         设置单个关节角度。
 
@@ -159,51 +235,37 @@ class ArmController:
             angle_deg: 目标值：
                 - 关节 1~5：角度（度）
                 - 关节 6：夹爪开合百分比（0~100）
-            duration_ms: 运动时间，毫秒（当前版本依赖 LeRobot 默认时间常数）
+            duration_ms: 运动时间，毫秒（按速度曲线插值，0 表示直接写入目标）
+            wait: 是否等待运动完成；等待时返回本次运动的时序报告
+            on_done: 不等待时的完成回调（含被新动作抢占）
         """
-        if joint_id not in self.id_to_name:
-            raise ValueError(f"未知关节 ID: {joint_id}")
-
-        name = self.id_to_name[joint_id]
-        limit = self.joint_limits.get(joint_id)
-        value = angle_deg
-        if limit:
-            value = max(limit.min_val, min(limit.max_val, value))
-
-        # 这里直接写入目标位置，具体时间参数由 LeRobot/舵机内部控制
-        # 使用归一化写入：1~5 关节为角度（度），6 号为开合百分比（0~100）
-        self._bus.write("Goal_Position", name, float(value), normalize=True)
+        return self.set_pose(
+            [joint_id], [angle_deg], duration_ms=duration_ms, wait=wait, on_done=on_done
+        )
 
     def set_pose(
         self,
         joint_ids: Sequence[int],
         angles_deg: Sequence[float],
         duration_ms: int = 800,
-    ) -> None:
+        wait: bool = True,
+        on_done: Optional[DoneCallback] = None,
+    ) -> Optional[Dict]:
         """
         同步设置多个关节角度（典型用于一个动作姿态）。
 
         Args:
             joint_ids: 关节 ID 列表（1~6）
             angles_deg: 对应的目标值列表
-            duration_ms: 所有关节共同的运动时间（当前版本依赖 LeRobot 默认时间常数）
+            duration_ms: 所有关节共同的运动时间，毫秒
+            wait: 是否等待运动完成；等待时返回本次运动的时序报告
+            on_done: 不等待时的完成回调（含被新动作抢占）
         """
-        if len(joint_ids) != len(angles_deg):
-            raise ValueError("joint_ids 和 angles_deg 长度必须一致")
-
-        goals: Dict[str, float] = {}
-        for jid, ang in zip(joint_ids, angles_deg):
-            if jid not in self.id_to_name:
-                raise ValueError(f"未知关节 ID: {jid}")
-            name = self.id_to_name[jid]
-            limit = self.joint_limits.get(jid)
-            value = ang
-            if limit:
-                value = max(limit.min_val, min(limit.max_val, value))
-            goals[name] = float(value)
-
-        # 同步写入多个关节的目标位置
-        self._bus.sync_write("Goal_Position", goals, normalize=True)
+        goals = self._goals(joint_ids, angles_deg)
+        self._target.update(goals)
+        return self._streamer.execute(
+            [goals], [duration_ms / 1000.0], profile=self.profile, wait=wait, on_done=on_done
+        )
 
     def open_gripper(self, open_percent: float = 100.0) -> None:
         """打开夹爪，参数为 0~100 的开合百分比。"""
@@ -213,7 +275,12 @@ class ArmController:
         """闭合夹爪，参数为 0~100 的开合百分比。"""
         self.set_joint_angle(6, close_percent)
 
-    def go_home(self, duration_ms: int = 1000) -> None:
+    def go_home(
+        self,
+        duration_ms: int = 1000,
+        wait: bool = True,
+        on_done: Optional[DoneCallback] = None,
+    ) -> Optional[Dict]:
         """
         回到预设“初始姿态”，可以根据实际需要修改各关节角度。
         这里假设：
@@ -227,29 +294,172 @@ class ArmController:
         """
         joint_ids = [1, 2, 3, 4, 5, 6]
         angles = [0.0, 0.0, 0.0, 0.0, 0.0, 50.0]
-        self.set_pose(joint_ids, angles, duration_ms=duration_ms)
+        return self.set_pose(joint_ids, angles, duration_ms=duration_ms, wait=wait, on_done=on_done)
 
     def execute_trajectory(
         self,
         waypoints: Iterable[Dict[int, float]],
         duration_ms: int = 800,
         pause_ms_between: int = 200,
-    ) -> None:
+        wait: bool = True,
+        on_done: Optional[DoneCallback] = None,
+    ) -> Optional[Dict]:
         """
         按顺序执行一系列关节空间路径点（适合简单抓取/放置动作）。
 
+        整条轨迹作为一次流式执行：每段按 duration_ms 插值，段间停顿 pause_ms_between。
+
         Args:
             waypoints: 每个元素是 {joint_id: angle_deg} 的字典
             duration_ms: 每个路径点的移动时间
             pause_ms_between: 相邻路径点之间的停顿时间
+            wait: 是否等待执行完成；等待时返回整条轨迹的时序报告
+            on_done: 不等待时的完成回调（含被新动作抢占）
         """
-        for wp in waypoints:
-            if not wp:
-                continue
-            joint_ids = list(wp.keys())
-            angles = list(wp.values())
-            self.set_pose(joint_ids, angles, duration_ms=duration_ms)
-            time.sleep(pause_ms_between / 1000.0)
+        goals, durations = self._plan(waypoints, duration_ms, pause_ms_between)
+        if not goals:
+            return None
+        for goal in goals:
+            self._target.update(goal)
+        return self._streamer.execute(
+            goals, durations, profile=self.profile, wait=wait, on_done=on_done
+        )
+
+    def move_linear(
+        self,
+        xyz: Sequence[float],
+        pitch: Optional[float] = None,
+        duration_ms: int = 1000,
+        wait: bool = True,
+        on_done: Optional[DoneCallback] = None,
+    ) -> Optional[Dict]:
+        """
+        末端沿直线移动到目标位置（笛卡尔空间直线，关节 5、夹爪不动）。
+
+        路径按梯形速度在每个控制周期取一个点，逐点求逆解（以上一点为初值），
+        再作为密集路径点交给轨迹线程执行。起点为当前目标位置，建议在机械臂静止时调用。
+
+        Args:
+            xyz: 目标位置 (x, y, z)，米，坐标系见 arm_kinematics
+            pitch: 目标俯仰角（度），None 表示保持当前俯仰
+            duration_ms: 运动时间，毫秒
+            wait: 是否等待运动完成；等待时返回本次运动的时序报告
+            on_done: 不等待时的完成回调（含被新动作抢占）
+
+        Raises:
+            ValueError: 路径上有不可达的点（此时不会开始运动）
+        """
+        kin = self.kinematics
+        current = dict(self._streamer.setpoint)
+        if not all(name in current for name in kin.names):
+            current = self._read_positions()
+        q_start = [current[name] for name in kin.names]
+        period = self._streamer.period
+        path = kin.linear_path(q_start, xyz, pitch, duration=duration_ms / 1000.0, dt=period)
+        goals = [dict(zip(kin.names, row)) for row in path.tolist()]
+        self._target.update(goals[-1])
+        return self._streamer.execute(
+            goals, [period] * len(goals), profile=self.profile, wait=wait, on_done=on_done
+        )
+
+    def validate_trajectory(
+        self,
+        waypoints: Iterable[Dict[int, float]],
+        duration_ms: int = 800,
+        pause_ms_between: int = 200,
+        max_velocity: Optional[float] = None,
+    ) -> Dict:
+        """
+        在执行前批量校验整条轨迹（不裁剪），按控制频率采样后一次检查全部采样点。
+
+        Args:
+            waypoints: 与 execute_trajectory 相同
+            max_velocity: 关节最大速度（度/秒），None 表示只检查限位
+
+        Returns:
+            JointModel.validate 的结果（ok、越限采样数、各关节的越限统计等）
+        """
+        goals, durations = self._plan(waypoints, duration_ms, pause_ms_between, clamp=False)
+        if not goals:
+            return self.joints.validate(np.empty((0, len(self.joints))))
+        start = dict(self._streamer.setpoint)
+        trajectory = JointTrajectory.from_waypoints(start, goals, durations, self.profile)
+        period = self._streamer.period
+        ts = np.append(np.arange(0.0, trajectory.duration, period), trajectory.duration)
+        return self.joints.validate(
+            trajectory.sample_many(ts),
+            self.joints.name_indices(trajectory.joints),
+            dt=period,
+            max_velocity=max_velocity,
+        )
+
+    def stop_motion(self, wait: bool = True) -> None:
+        """停止正在执行的动作，机械臂停在当前目标位置；wait=False 时只发出停止请求，立即返回。"""
+        self._streamer.cancel()
+        if wait:
+            self._streamer.wait(1.0)
+        self._target = dict(self._streamer.setpoint)
+
+    # ===================== 状态读取 ===================== #
+    def get_state(self) -> Optional[ArmState]:
+        """最新的状态快照（位置、时间戳，可选负载/温度），不访问总线；未启用轮询或尚未读到时为 None。"""
+        if self.state_poller is None:
+            return None
+        return self.state_poller.latest()
+
+    def get_joint_angles(self) -> Dict[int, float]:
+        """当前各关节的值 {关节 ID: 值}（来自快照；未启用轮询时读一次总线）。"""
+        state = self.get_state()
+        positions = state.positions if state is not None else self._read_field(POSITION_FIELD)
+        return {jid: positions[name] for jid, name in self.id_to_name.items() if name in positions}
+
+    def get_end_effector_pose(self) -> Dict[str, float]:
+        """当前末端位姿 {'x', 'y', 'z'（米）, 'pitch'（度）}，由回读的关节 1~4 角度正解得到。"""
+        angles = self.get_joint_angles()
+        x, y, z, pitch = self.kinematics.forward([angles[jid] for jid in KINEMATIC_JOINTS]).tolist()
+        return {"x": x, "y": y, "z": z, "pitch": pitch}
+
+    def wait_until_reached(
+        self,
+        joint_ids: Optional[Sequence[int]] = None,
+        tolerance: float = 2.0,
+        timeout: float = 5.0,
+    ) -> bool:
+        """
+        等待机械臂到达最近一次动作的目标（先等待轨迹写完，再根据回读位置判断）。
+
+        Args:
+            joint_ids: 只检查这些关节，None 表示检查目标中的全部关节
+                （夹住物体时夹爪到不了目标，可以排除关节 6）
+            tolerance: 允许的偏差（度 / 夹爪百分比）
+            timeout: 超时时间（秒），从调用时开始计算
+
+        Returns:
+            是否在超时前到位
+        """
+        if self.state_poller is None:
+            raise RuntimeError("未启用状态轮询（state_poll_hz=0）")
+        deadline = time.monotonic() + timeout
+        if not self._streamer.wait(timeout):
+            return False
+        joints = None
+        if joint_ids is not None:
+            joints = [self.id_to_name[jid] for jid in joint_ids if jid in self.id_to_name]
+        return self.state_poller.wait_until(
+            dict(self._target), tolerance, max(0.0, deadline - time.monotonic()), joints
+        )
+
+    def position_error(self) -> Dict[int, float]:
+        """最新快照与最近目标的偏差 {关节 ID: 当前值 - 目标值}。"""
+        state = self.get_state()
+        if state is None:
+            return {}
+        errors = state.errors(self._target)
+        return {jid: errors[name] for jid, name in self.id_to_name.items() if name in errors}
+
+    def timing_stats(self) -> Dict:
+        """轨迹流式写入的累计时序统计（周期数、错过的周期、抖动）。"""
+        return self._streamer.stats()
 
 
 def _demo() -> None:
@@ -260,21 +470,18 @@ def _demo() -> None:
     """
     arm = ArmController(port="/dev/ttyACM0", robot_id="my_follower_arm")
     try:
-        arm.go_home(duration_ms=1500)
-        time.sleep(2.0)
+        report = arm.go_home(duration_ms=1500)
+        print(f"回零: 计划 {report['planned_s']:.2f}s, 实际 {report['actual_s']:.2f}s")
 
-        # 让第二关节小幅度上下摆动三次
+        # 让第二关节小幅度上下摆动三次（动作按时长插值，调用返回时已完成）
         for _ in range(3):
             arm.set_joint_angle(2, 30, duration_ms=600)
-            time.sleep(0.8)
             arm.set_joint_angle(2, -10, duration_ms=600)
-            time.sleep(0.8)
 
         # 打开/闭合夹爪
         arm.open_gripper()
-        time.sleep(1.0)
         arm.close_gripper()
-        time.sleep(1.0)
+        print(f"时序统计: {arm.timing_stats()}")
     finally:
         arm.close()
 
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+SO101 机械臂运动学：批量正运动学、带热启动的迭代逆运动学、笛卡尔直线运动
+
+ArmController 只接受关节角度，抓取/放置动作只能手工调角度列表。这里提供：
+- forward：正运动学，对形状 (..., 4) 的关节角度一次算出末端位置 (x, y, z) 和俯仰角，可批量评估大量姿态
+- inverse：阻尼最小二乘（Levenberg-Marquardt）迭代逆运动学，批量求解；以当前姿态为初值（热启动）时
+  只需少量迭代；已收敛的目标不再参与后续迭代，每次迭代后按关节限位裁剪
+- linear_path：末端沿直线运动，按梯形速度在控制周期上离散，逐点用上一点的解热启动求逆解，
+  结果作为密集路径点交给 TrajectoryStreamer 流式执行
+
+模型（近似，按实物测量修改 SO101Geometry）：
+- 坐标系：原点在底座转轴与底面交点，x 向前，y 向左，z 向上，单位米
+- 关节 1（shoulder_pan）绕 z 轴旋转，0 为正前方，正方向向左
+- 关节 2（shoulder_lift）为 0 时大臂竖直向上，正方向向前倾
+- 关节 3（elbow_flex）为 0 时小臂与大臂垂直、指向前方，正方向向下弯
+- 关节 4（wrist_flex）为 0 时夹爪与小臂同向，正方向向下弯
+- 关节 5（wrist_roll）和夹爪不影响末端位置
+- 俯仰角 pitch 为夹爪方向与竖直向上的夹角（度）：90 为水平向前，180 为竖直向下
+标定后的舵机角度与上述约定方向或零点不一致时，用 signs / offsets_deg 换算。
+
+基准测试（不需要机械臂）：
+
+    python3 arm_kinematics.py --count 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from arm_model import JointModel, default_model
+from arm_trajectory import trapezoid_profile
+
+# 影响末端位置和俯仰的关节（ID）
+KINEMATIC_JOINTS = (1, 2, 3, 4)
+
+
+@dataclass
+class SO101Geometry:
+    """SO101 连杆尺寸（米，近似值）."""
+
+    base_height: float = 0.119      # 底面到大臂转轴
+    shoulder_offset: float = 0.031  # 大臂转轴相对底座转轴的前向偏移
+    upper_arm: float = 0.116        # 大臂转轴 -> 肘关节
+    forearm: float = 0.135          # 肘关节 -> 手腕俯仰轴
+    tool: float = 0.100             # 手腕俯仰轴 -> 夹爪指尖
+
+
+class SO101Kinematics:
+    """
+    SO101 运动学（关节 1~4，角度单位为标定后的舵机角度（度））。
+
+    参数:
+        geometry:     连杆尺寸
+        joint_model:  关节模型（提供关节 1~4 的限位）
+        signs:        舵机角度到模型角度的方向（+1 / -1），长度 4
+        offsets_deg:  模型零点对应的舵机角度，长度 4
+        pitch_weight: 逆解中俯仰误差（弧度）相对位置误差（米）的权重
+    """
+
+    def __init__(
+        self,
+        geometry: Optional[SO101Geometry] = None,
+        joint_model: Optional[JointModel] = None,
+        signs: Sequence[float] = (1.0, 1.0, 1.0, 1.0),
+        offsets_deg: Sequence[float] = (0.0, 0.0, 0.0, 0.0),
+        pitch_weight: float = 0.1,
+    ) -> None:
+        self.geometry = geometry or SO101Geometry()
+        model = joint_model or default_model()
+        idx = model.indices(KINEMATIC_JOINTS)
+        self.names = [model.names[i] for i in idx]
+        self.min = model.min[idx]
+        self.max = model.max[idx]
+        self.signs = np.asarray(signs, dtype=float)
+        self.offsets = np.asarray(offsets_deg, dtype=float)
+        self.pitch_weight = pitch_weight
+
+    # ---------- 正运动学 ---------- #
+    def _chain(self, q_deg: np.ndarray):
+        """舵机角度 -> (底座转角, 三段连杆方向角, 水平距离 r, 高度 z)"""
+        g = self.geometry
+        q = np.radians(self.signs * (np.asarray(q_deg, dtype=float) - self.offsets))
+        pan = q[..., 0]
+        phi2 = q[..., 1]
+        phi3 = phi2 + np.pi / 2 + q[..., 2]
+        phi4 = phi3 + q[..., 3]
+        r = (g.shoulder_offset + g.upper_arm * np.sin(phi2) + g.forearm * np.sin(phi3)
+             + g.tool * np.sin(phi4))
+        z = (g.base_height + g.upper_arm * np.cos(phi2) + g.forearm * np.cos(phi3)
+             + g.tool * np.cos(phi4))
+        return pan, phi2, phi3, phi4, r, z
+
+    def forward(self, q_deg) -> np.ndarray:
+        """
+        正运动学（可批量）。
+
+        Args:
+            q_deg: 形状 (..., 4) 的关节 1~4 舵机角度（度）
+
+        Returns:
+            形状 (..., 4) 的 [x, y, z, pitch]（米、米、米、度）
+        """
+        pan, _, _, phi4, r, z = self._chain(q_deg)
+        return np.stack([r * np.cos(pan), r * np.sin(pan), z, np.degrees(phi4)], axis=-1)
+
+    def _task(self, q_deg: np.ndarray):
+        """任务向量 [x, y, z, w*pitch] 及其对舵机角度（度）的雅可比，形状 (..., 4) 和 (..., 4, 4)"""
+        g = self.geometry
+        pan, phi2, phi3, phi4, r, z = self._chain(q_deg)
+        c, s = np.cos(pan), np.sin(pan)
+        # 平面内 r、z 对关节 2~4 的偏导
+        dr4, dz4 = g.tool * np.cos(phi4), -g.tool * np.sin(phi4)
+        dr3, dz3 = g.forearm * np.cos(phi3) + dr4, -g.forearm * np.sin(phi3) + dz4
+        dr2, dz2 = g.upper_arm * np.cos(phi2) + dr3, -g.upper_arm * np.sin(phi2) + dz3
+        dr = np.stack([dr2, dr3, dr4], axis=-1)
+        dz = np.stack([dz2, dz3, dz4], axis=-1)
+
+        jac = np.zeros(np.shape(r) + (4, 4))
+        jac[..., 0, 0] = -r * s
+        jac[..., 1, 0] = r * c
+        jac[..., 0, 1:] = dr * c[..., None]
+        jac[..., 1, 1:] = dr * s[..., None]
+        jac[..., 2, 1:] = dz
+        jac[..., 3, 1:] = self.pitch_weight
+        # 模型弧度 -> 舵机角度（度）
+        jac *= self.signs * (np.pi / 180.0)
+
+        task = np.stack([r * c, r * s, z, self.pitch_weight * phi4], axis=-1)
+        return task, jac
+
+    # ---------- 逆运动学 ---------- #
+    def inverse(
+        self,
+        targets,
+        q0,
+        tol: float = 5e-4,
+        max_iter: int = 50,
+        damping: float = 1e-4,
+        max_step_deg: float = 20.0,
+    ) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        阻尼最小二乘迭代逆运动学（可批量）。
+
+        Args:
+            targets: 形状 (..., 4) 的 [x, y, z, pitch]（米、度）
+            q0:      初值（舵机角度，度），形状 (..., 4) 或 (4,)；用当前姿态热启动收敛最快
+            tol:     收敛阈值（任务空间误差范数，米；俯仰误差按 pitch_weight 折算）
+            max_iter: 最大迭代次数
+            damping: 阻尼系数，越大在奇异位形（手臂伸直/折叠）附近越稳定，但收敛越慢
+            max_step_deg: 单次迭代每个关节最大变化量
+
+        Returns:
+            (关节角度 (..., 4)，是否收敛 (...)，实际迭代次数)
+        """
+        targets = np.asarray(targets, dtype=float)
+        shape = targets.shape[:-1]
+        goal = targets.reshape(-1, 4).copy()
+        goal[:, 3] = self.pitch_weight * np.radians(goal[:, 3])
+        q = np.broadcast_to(np.asarray(q0, dtype=float), targets.shape).reshape(-1, 4)
+        q = np.minimum(np.maximum(q, self.min), self.max)
+        eye = np.eye(4) * damping ** 2
+
+        converged = np.zeros(len(goal), dtype=bool)
+        active = np.arange(len(goal))  # 还没收敛的目标，只对它们继续迭代
+        iterations = 0
+        for iterations in range(1, max_iter + 1):
+            task, jac = self._task(q[active])
+            error = goal[active] - task
+            done = np.linalg.norm(error, axis=-1) < tol
+            converged[active[done]] = True
+            keep = ~done
+            active, error, jac = active[keep], error[keep], jac[keep]
+            if not len(active):
+                iterations -= 1
+                break
+            # dq = J^T (J J^T + λ²I)^-1 e
+            jac_t = np.swapaxes(jac, -1, -2)
+            step = jac_t @ np.linalg.solve(jac @ jac_t + eye, error[..., None])
+            step = np.clip(step[..., 0], -max_step_deg, max_step_deg)
+            q[active] = np.minimum(np.maximum(q[active] + step, self.min), self.max)
+        else:
+            task, _ = self._task(q[active])
+            converged[active] = np.linalg.norm(goal[active] - task, axis=-1) < tol
+        return q.reshape(targets.shape), converged.reshape(shape), iterations
+
+    # ---------- 笛卡尔直线运动 ---------- #
+    def linear_path(
+        self,
+        q_start,
+        goal_xyz: Sequence[float],
+        pitch: Optional[float] = None,
+        duration: float = 1.0,
+        dt: float = 0.02,
+        tol: float = 5e-4,
+    ) -> np.ndarray:
+        """
+        末端从当前位置沿直线移动到 goal_xyz，按梯形速度在每个控制周期取一个点并求逆解。
+
+        Args:
+            q_start:  起点关节 1~4 舵机角度（度）
+            goal_xyz: 目标位置（米）
+            pitch:    目标俯仰角（度），None 表示保持起点俯仰
+            duration: 运动时间（秒）
+            dt:       离散间隔（秒），通常等于轨迹流式写入的控制周期
+
+        Returns:
+            形状 (N, 4) 的关节角度序列，第 i 行对应时刻 (i + 1) * dt（最后一行为终点）
+
+        Raises:
+            ValueError: 某个路径点不可达（超出工作空间或关节限位）
+        """
+        q_start = np.asarray(q_start, dtype=float)
+        start = self.forward(q_start)
+        goal = np.array([*goal_xyz, start[3] if pitch is None else pitch], dtype=float)
+        steps = max(1, int(np.ceil(duration / dt)))
+        s = trapezoid_profile(np.arange(1, steps + 1) / steps)
+        targets = start + (goal - start) * s[:, None]
+
+        path = np.empty((steps, 4))
+        q = q_start
+        for i, target in enumerate(targets):
+            q, ok, _ = self.inverse(target, q, tol=tol)
+            if not ok:
+                raise ValueError(
+                    f"直线路径第 {i + 1}/{steps} 点不可达: "
+                    f"({target[0]:.3f}, {target[1]:.3f}, {target[2]:.3f}) m, 俯仰 {target[3]:.1f}°")
+            path[i] = q
+        return path
+
+
+# ===================== 基准测试 ===================== #
+def benchmark(count: int = 10000, seed: int = 0) -> dict:
+    """FK / IK 每秒求解次数和逆解成功率"""
+    kin = SO101Kinematics()
+    rng = np.random.default_rng(seed)
+    # 在关节限位内（去掉边缘）随机取姿态，用其正解作为可达的逆解目标
+    low, high = np.maximum(kin.min, -100.0), np.minimum(kin.max, 100.0)
+    q_true = rng.uniform(low, high, size=(count, 4))
+    targets = kin.forward(q_true)
+    report = {}
+
+    start = time.perf_counter()
+    kin.forward(q_true)
+    report["fk_batch"] = count / (time.perf_counter() - start)
+
+    n = min(count, 2000)
+    start = time.perf_counter()
+    for q in q_true[:n]:
+        kin.forward(q)
+    report["fk_single"] = n / (time.perf_counter() - start)
+
+    # 热启动：初值在真实解附近（相当于相邻控制周期的上一帧解）
+    q_warm = np.clip(q_true + rng.normal(0.0, 3.0, size=q_true.shape), kin.min, kin.max)
+    start = time.perf_counter()
+    _, ok, iterations = kin.inverse(targets, q_warm)
+    report["ik_batch_warm"] = count / (time.perf_counter() - start)
+    report["ik_batch_warm_success"] = float(ok.mean())
+    report["ik_batch_warm_iterations"] = iterations
+
+    # 冷启动：全部从零位出发
+    start = time.perf_counter()
+    _, ok, iterations = kin.inverse(targets, np.zeros(4))
+    report["ik_batch_cold"] = count / (time.perf_counter() - start)
+    report["ik_batch_cold_success"] = float(ok.mean())
+    report["ik_batch_cold_iterations"] = iterations
+
+    start = time.perf_counter()
+    single_ok = 0
+    for target, q0 in zip(targets[:n], q_warm[:n]):
+        single_ok += bool(kin.inverse(target, q0)[1])
+    report["ik_single_warm"] = n / (time.perf_counter() - start)
+    report["ik_single_warm_success"] = single_ok / n
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SO101 运动学基准测试")
+    parser.add_argument("--count", type=int, default=10000, help="批量测试的姿态数")
+    args = parser.parse_args()
+
+    report = benchmark(args.count)
+    print(f"正解（批量）: {report['fk_batch']:,.0f} 次/秒")
+    print(f"正解（逐个）: {report['fk_single']:,.0f} 次/秒")
+    for key, label in (("ik_batch_warm", "逆解（批量，热启动）"),
+                       ("ik_batch_cold", "逆解（批量，零位冷启动）")):
+        print(f"{label}: {report[key]:,.0f} 次/秒, 成功率 {report[key + '_success']:.1%}, "
+              f"迭代 {report[key + '_iterations']} 次")
+    print(f"逆解（逐个，热启动）: {report['ik_single_warm']:,.0f} 次/秒, "
+          f"成功率 {report['ik_single_warm_success']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+SO101 机械臂关节模型：关节 ID/名称与数组下标的映射，关节限位保存为 NumPy 向量
+
+原来每次 set_pose 都在 Python 循环里逐个关节查字典、限位、拼 goals 字典，
+单个姿态没有问题，但 100Hz 流式写入或批量评估成千上万个候选姿态时开销明显。这里改为：
+- JointModel 保存 min/max 向量和下标映射，clamp 对形状 (..., 关节数) 的数组一次完成限位；
+  单个姿态（set_pose）用 goals 的标量路径，几个关节时 NumPy 的调用开销反而比循环大
+- validate 对整条轨迹（N 个采样点）批量检查限位和关节速度，返回违规统计
+- 不依赖 LeRobot，可以在没有机械臂的机器上单独运行基准测试：
+
+    python3 arm_model.py --count 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass
+class JointLimit:
+    """单个关节的角度或开合范围限制."""
+
+    min_val: float
+    max_val: float
+
+
+# SO101 默认关节（1~5：角度，单位度；6：夹爪开合百分比 0~100）
+SO101_JOINTS: Dict[int, str] = {
+    1: "shoulder_pan",
+    2: "shoulder_lift",
+    3: "elbow_flex",
+    4: "wrist_flex",
+    5: "wrist_roll",
+    6: "gripper",
+}
+
+SO101_LIMITS: Dict[int, JointLimit] = {
+    1: JointLimit(-90.0, 90.0),
+    2: JointLimit(-60.0, 90.0),
+    3: JointLimit(-120.0, 120.0),
+    4: JointLimit(-120.0, 120.0),
+    5: JointLimit(-180.0, 180.0),
+    6: JointLimit(0.0, 100.0),  # 夹爪开合 0~100%
+}
+
+
+class JointModel:
+    """
+    数组形式的关节模型。
+
+    参数:
+        ids:      关节 ID 列表（决定数组中的顺序）
+        names:    对应的关节名称（电机总线上的名字）
+        min_vals: 每个关节的下限
+        max_vals: 每个关节的上限
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[int],
+        names: Sequence[str],
+        min_vals: Sequence[float],
+        max_vals: Sequence[float],
+    ) -> None:
+        self.ids = list(ids)
+        self.names = list(names)
+        self.min = np.asarray(min_vals, dtype=float)
+        self.max = np.asarray(max_vals, dtype=float)
+        self.index_of_id = {jid: i for i, jid in enumerate(self.ids)}
+        self.index_of_name = {name: i for i, name in enumerate(self.names)}
+        # 单个姿态用的标量表 {ID: (名称, 下限, 上限)}：几个关节时纯 Python 比 NumPy 调用开销小
+        self._scalar = {jid: (name, float(lo), float(hi))
+                        for jid, name, lo, hi in zip(self.ids, self.names, self.min, self.max)}
+
+    @classmethod
+    def from_limits(
+        cls,
+        id_to_name: Dict[int, str],
+        joint_limits: Dict[int, JointLimit],
+    ) -> "JointModel":
+        """由 {ID: 名称} 和 {ID: JointLimit} 构造；没有限位的关节不限制。"""
+        ids = sorted(id_to_name)
+        limits = [joint_limits.get(jid) for jid in ids]
+        return cls(
+            ids,
+            [id_to_name[jid] for jid in ids],
+            [limit.min_val if limit else -np.inf for limit in limits],
+            [limit.max_val if limit else np.inf for limit in limits],
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def indices(self, joint_ids: Sequence[int]) -> np.ndarray:
+        """关节 ID 列表 -> 数组下标"""
+        try:
+            return np.fromiter((self.index_of_id[jid] for jid in joint_ids), dtype=np.intp)
+        except KeyError as e:
+            raise ValueError(f"未知关节 ID: {e.args[0]}") from None
+
+    def name_indices(self, names: Sequence[str]) -> np.ndarray:
+        """关节名称列表 -> 数组下标"""
+        try:
+            return np.fromiter((self.index_of_name[name] for name in names), dtype=np.intp)
+        except KeyError as e:
+            raise ValueError(f"未知关节: {e.args[0]}") from None
+
+    def clamp(self, values, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        向量化限位。
+
+        Args:
+            values:  形状 (..., k) 的数组；indices 为 None 时 k 为全部关节数
+            indices: values 最后一维对应的关节下标
+        """
+        values = np.asarray(values, dtype=float)
+        # minimum/maximum 比 np.clip 的调用开销小，单个姿态时更明显
+        if indices is None:
+            return np.minimum(np.maximum(values, self.min), self.max)
+        return np.minimum(np.maximum(values, self.min[indices]), self.max[indices])
+
+    def to_goals(self, values, indices: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """一组关节值 -> {关节名: 值}（sync_write 的参数格式）"""
+        names = self.names if indices is None else [self.names[i] for i in indices]
+        return dict(zip(names, np.asarray(values, dtype=float).tolist()))
+
+    def goals(
+        self, joint_ids: Sequence[int], values: Sequence[float], clamp: bool = True
+    ) -> Dict[str, float]:
+        """
+        单个姿态：关节 ID 和目标值 -> {关节名: 值}，clamp=True 时按限位裁剪。
+
+        标量快速路径（set_pose 每次调用一次）；成批姿态用 clamp / validate。
+        """
+        scalar = self._scalar
+        goals: Dict[str, float] = {}
+        for jid, value in zip(joint_ids, values):
+            try:
+                name, low, high = scalar[jid]
+            except KeyError:
+                raise ValueError(f"未知关节 ID: {jid}") from None
+            value = float(value)
+            if clamp:
+                value = low if value < low else high if value > high else value
+            goals[name] = value
+        return goals
+
+    def validate(
+        self,
+        points,
+        indices: Optional[np.ndarray] = None,
+        dt: Optional[float] = None,
+        max_velocity=None,
+        tolerance: float = 1e-6,
+    ) -> Dict:
+        """
+        批量检查整条轨迹。
+
+        Args:
+            points:       形状 (N, k) 的采样点
+            indices:      列对应的关节下标，None 表示全部关节
+            dt:           采样间隔（秒），与 max_velocity 一起用于速度检查
+            max_velocity: 关节最大速度（单位/秒），标量或长度 k 的向量
+            tolerance:    允许的越界量
+
+        Returns:
+            {'ok', 'samples', 'limit_violations', 'velocity_violations',
+             'first_violation', 'joints': {关节名: {'below', 'above', 'worst'}}}
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        idx = np.arange(len(self)) if indices is None else np.asarray(indices)
+        below = np.maximum(self.min[idx] - points, 0.0)
+        above = np.maximum(points - self.max[idx], 0.0)
+        limit_bad = (below > tolerance) | (above > tolerance)
+        bad_rows = limit_bad.any(axis=1)
+
+        velocity_rows = np.zeros(len(points), dtype=bool)
+        if dt is not None and max_velocity is not None and len(points) > 1:
+            velocity = np.abs(np.diff(points, axis=0)) / dt
+            velocity_rows[1:] = (velocity > np.asarray(max_velocity) + tolerance).any(axis=1)
+
+        any_rows = bad_rows | velocity_rows
+        joints = {}
+        for column in np.flatnonzero(limit_bad.any(axis=0)):
+            joints[self.names[idx[column]]] = {
+                "below": int((below[:, column] > tolerance).sum()),
+                "above": int((above[:, column] > tolerance).sum()),
+                "worst": float(max(below[:, column].max(), above[:, column].max())),
+            }
+        return {
+            "ok": not any_rows.any(),
+            "samples": len(points),
+            "limit_violations": int(bad_rows.sum()),
+            "velocity_violations": int(velocity_rows.sum()),
+            "first_violation": int(np.argmax(any_rows)) if any_rows.any() else None,
+            "joints": joints,
+        }
+
+
+def default_model() -> JointModel:
+    """SO101 默认关节模型"""
+    return JointModel.from_limits(SO101_JOINTS, SO101_LIMITS)
+
+
+# ===================== 基准测试 ===================== #
+def _legacy_goals(joint_ids, values) -> Dict[str, float]:
+    """原 set_pose 的逐关节限位（基准对照）"""
+    goals: Dict[str, float] = {}
+    for jid, value in zip(joint_ids, values):
+        if jid not in SO101_JOINTS:
+            raise ValueError(f"未知关节 ID: {jid}")
+        limit = SO101_LIMITS.get(jid)
+        if limit:
+            value = max(limit.min_val, min(limit.max_val, value))
+        goals[SO101_JOINTS[jid]] = float(value)
+    return goals
+
+
+def benchmark(count: int = 100000, seed: int = 0) -> Dict[str, float]:
+    """每秒可生成的限位后目标值（setpoints/s）"""
+    from arm_trajectory import JointTrajectory
+
+    model = default_model()
+    rng = np.random.default_rng(seed)
+    poses = rng.uniform(-200.0, 200.0, size=(count, len(model)))
+    joint_ids = model.ids
+    report = {}
+
+    # 原实现：每个姿态 Python 循环 + 字典
+    n = min(count, 20000)
+    rows = poses[:n].tolist()
+    start = time.perf_counter()
+    for row in rows:
+        _legacy_goals(joint_ids, row)
+    report["legacy_loop"] = n / (time.perf_counter() - start)
+
+    # 单个姿态：向量化限位 + 生成 goals 字典（NumPy 调用开销，几个关节时不比循环快）
+    idx = model.indices(joint_ids)
+    start = time.perf_counter()
+    for row in poses[:n]:
+        model.to_goals(model.clamp(row, idx), idx)
+    report["vector_single"] = n / (time.perf_counter() - start)
+
+    # 单个姿态：标量快速路径（set_pose 实际使用）
+    start = time.perf_counter()
+    for row in rows:
+        model.goals(joint_ids, row)
+    report["scalar_single"] = n / (time.perf_counter() - start)
+
+    # 批量限位：一次处理全部候选姿态
+    start = time.perf_counter()
+    model.clamp(poses)
+    report["vector_batch"] = count / (time.perf_counter() - start)
+
+    # 批量轨迹采样 + 校验（100Hz 采样的多段轨迹）
+    waypoints = model.clamp(poses[:50])
+    trajectory = JointTrajectory(model.names, waypoints, [0.5] * (len(waypoints) - 1))
+    ts = np.arange(0.0, trajectory.duration, 0.01)
+    start = time.perf_counter()
+    model.validate(trajectory.sample_many(ts), dt=0.01, max_velocity=360.0)
+    report["trajectory_validate"] = len(ts) / (time.perf_counter() - start)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="机械臂关节模型基准测试")
+    parser.add_argument("--count", type=int, default=100000, help="批量测试的姿态数")
+    args = parser.parse_args()
+
+    labels = {
+        "legacy_loop": "逐关节循环（原实现）",
+        "vector_single": "向量化限位（单个姿态）",
+        "scalar_single": "标量快速路径（单个姿态，set_pose 使用）",
+        "vector_batch": "向量化限位（批量）",
+        "trajectory_validate": "轨迹采样 + 批量校验",
+    }
+    for key, rate in benchmark(args.count).items():
+        print(f"{labels[key]}: {rate:,.0f} setpoints/s")
+
+
+if __name__ == "__main__":
+    main()
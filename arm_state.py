@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+机械臂状态后台轮询：按固定频率 sync_read 当前位置（可选负载/温度），缓存为带时间戳的快照
+
+原来 ArmController 从不回读状态，想知道机械臂在哪里只能每次阻塞读一次总线，
+脚本只能用固定的 time.sleep 猜测动作是否完成。这里改为：
+- 后台线程按 rate_hz 读取 Present_Position，每 extra_every 次额外读取负载和温度，
+  结果替换为新的 ArmState 快照（加锁），调用方 latest() 直接取快照，不访问总线
+- wait_until(targets, tolerance) 在每个新快照到达时检查，全部关节进入容差即返回，
+  动作一到位脚本就继续，不用等固定时间
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence
+
+POSITION_FIELD = "Present_Position"
+EXTRA_FIELDS = ("Present_Load", "Present_Temperature")
+
+
+@dataclass(frozen=True)
+class ArmState:
+    """一次读取的机械臂状态快照（timestamp 为 time.monotonic()）."""
+
+    seq: int
+    timestamp: float
+    positions: Dict[str, float]
+    load: Optional[Dict[str, float]] = None
+    temperature: Optional[Dict[str, float]] = None
+
+    @property
+    def age(self) -> float:
+        """快照距今的时间（秒）"""
+        return time.monotonic() - self.timestamp
+
+    def errors(self, targets: Dict[str, float]) -> Dict[str, float]:
+        """各关节与目标值的偏差（当前值 - 目标值）"""
+        return {name: self.positions[name] - value for name, value in targets.items()
+                if name in self.positions}
+
+
+class ArmStatePoller:
+    """
+    后台状态轮询线程。
+
+    参数:
+        read:        读取函数 read(字段名) -> {关节名: 值}，由调用方负责总线加锁
+        rate_hz:     位置读取频率
+        poll_extras: 是否读取负载和温度
+        extra_every: 每读取多少次位置读取一次负载和温度
+    """
+
+    def __init__(
+        self,
+        read: Callable[[str], Dict[str, float]],
+        rate_hz: float = 20.0,
+        poll_extras: bool = False,
+        extra_every: int = 10,
+    ) -> None:
+        self.read = read
+        self.period = 1.0 / rate_hz
+        self.poll_extras = poll_extras
+        self.extra_every = max(1, extra_every)
+
+        self._state: Optional[ArmState] = None
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        # 统计
+        self.reads = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self._read_time = 0.0
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ArmStatePoller")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def latest(self) -> Optional[ArmState]:
+        """最新快照（不访问总线）；还没有读到时返回 None"""
+        with self._cond:
+            return self._state
+
+    def wait_for_update(self, after_seq: int = 0, timeout: Optional[float] = None) -> Optional[ArmState]:
+        """等待序号大于 after_seq 的快照，超时返回 None"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._state is None or self._state.seq <= after_seq:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not self._running or (remaining is not None and remaining <= 0):
+                    return None
+                self._cond.wait(remaining)
+            return self._state
+
+    def wait_until(
+        self,
+        targets: Dict[str, float],
+        tolerance: float = 2.0,
+        timeout: float = 5.0,
+        joints: Optional[Sequence[str]] = None,
+    ) -> bool:
+        """
+        等待指定关节全部进入目标容差范围。
+
+        只使用调用之后读取的快照，避免用旧状态误判到位。
+
+        Args:
+            targets:   {关节名: 目标值}
+            tolerance: 允许的偏差（度 / 夹爪百分比）
+            timeout:   超时时间（秒）
+            joints:    只检查这些关节，None 表示检查 targets 中的全部关节
+
+        Returns:
+            是否在超时前到位
+        """
+        if joints is not None:
+            targets = {name: targets[name] for name in joints if name in targets}
+        deadline = time.monotonic() + timeout
+        called = time.monotonic()
+        seq = 0
+        while True:
+            state = self.wait_for_update(seq, deadline - time.monotonic())
+            if state is None:
+                return False
+            seq = state.seq
+            if state.timestamp >= called and all(
+                abs(error) <= tolerance for error in state.errors(targets).values()
+            ):
+                return True
+
+    def _run(self) -> None:
+        seq = 0
+        next_time = time.monotonic()
+        while self._running:
+            read_start = time.monotonic()
+            try:
+                positions = self.read(POSITION_FIELD)
+                load = temperature = None
+                if self.poll_extras and seq % self.extra_every == 0:
+                    load = self.read(EXTRA_FIELDS[0])
+                    temperature = self.read(EXTRA_FIELDS[1])
+                elif self._state is not None:
+                    # 负载/温度沿用上一次的读数
+                    load, temperature = self._state.load, self._state.temperature
+            except Exception as e:
+                self.errors += 1
+                if str(e) != self.last_error:
+                    print(f"读取机械臂状态失败: {e}")
+                self.last_error = str(e)
+            else:
+                seq += 1
+                now = time.monotonic()
+                self.reads += 1
+                self._read_time += now - read_start
+                with self._cond:
+                    # 时间戳取读取开始和结束的中点
+                    self._state = ArmState(seq, (read_start + now) / 2, positions, load, temperature)
+                    self._cond.notify_all()
+
+            next_time += self.period
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = time.monotonic()  # 读取太慢时不补读
+
+    def stats(self) -> Dict:
+        state = self.latest()
+        return {
+            "reads": self.reads,
+            "errors": self.errors,
+            "read_ms_mean": self._read_time / self.reads * 1000 if self.reads else 0.0,
+            "age_ms": state.age * 1000 if state is not None else None,
+        }
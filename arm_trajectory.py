@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+机械臂关节空间轨迹：按时间插值并以固定控制频率流式写入目标位置
+
+原来 set_pose 只写一次 Goal_Position，运动快慢取决于舵机默认速度，duration_ms 不起作用。
+这里改为：
+- JointTrajectory：相邻路径点之间按速度曲线插值（梯形速度或三次多项式，每段起止速度为 0），
+  给定时刻 t 即可算出全部关节的目标值
+- TrajectoryStreamer：独立的高优先级线程，按固定频率（默认 50Hz）在每个截止时刻采样轨迹，
+  通过 write(setpoints) 一次 sync_write 全部关节；用 sleep + 短暂自旋对齐截止时刻，
+  统计唤醒抖动和错过的周期，2 秒的动作实际就用 2 秒
+- 新轨迹会抢占正在执行的轨迹，从当前目标值开始平滑过渡
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def cubic_profile(u: np.ndarray) -> np.ndarray:
+    """三次多项式：位置 0->1，起止速度为 0"""
+    return u * u * (3.0 - 2.0 * u)
+
+
+def trapezoid_profile(u: np.ndarray, accel_fraction: float = 0.25) -> np.ndarray:
+    """梯形速度：前后各 accel_fraction 的时间匀加速/匀减速，中间匀速"""
+    ta = accel_fraction
+    v = 1.0 / (1.0 - ta)  # 匀速段速度
+    a = v / ta
+    return np.where(
+        u < ta,
+        0.5 * a * u * u,
+        np.where(u <= 1.0 - ta, 0.5 * v * ta + v * (u - ta), 1.0 - 0.5 * a * (1.0 - u) ** 2),
+    )
+
+
+PROFILES: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "trapezoid": trapezoid_profile,
+    "cubic": cubic_profile,
+}
+
+
+class JointTrajectory:
+    """
+    多段关节空间轨迹。
+
+    参数:
+        joints:    关节名称列表（与 points 的列对应）
+        points:    路径点数组，形状 (段数 + 1, 关节数)，第一行为起点
+        durations: 每段用时（秒），长度为段数
+        profile:   'trapezoid' 或 'cubic'
+    """
+
+    def __init__(
+        self,
+        joints: Sequence[str],
+        points,
+        durations: Sequence[float],
+        profile: str = "trapezoid",
+    ) -> None:
+        if profile not in PROFILES:
+            raise ValueError(f"未知速度曲线: {profile}")
+        self.joints: List[str] = list(joints)
+        self.points = np.asarray(points, dtype=float).reshape(-1, len(self.joints))
+        if len(durations) != len(self.points) - 1:
+            raise ValueError("durations 长度必须等于路径点数 - 1")
+        self.times = np.concatenate([[0.0], np.cumsum(np.maximum(durations, 0.0))])
+        self.duration = float(self.times[-1])
+        self.profile = profile
+        self._profile = PROFILES[profile]
+
+    @classmethod
+    def from_waypoints(
+        cls,
+        start: Dict[str, float],
+        waypoints: Sequence[Dict[str, float]],
+        durations: Sequence[float],
+        profile: str = "trapezoid",
+    ) -> "JointTrajectory":
+        """
+        由起点和一系列（可以只含部分关节的）路径点构造轨迹，未指定的关节保持上一路径点的值。
+
+        Args:
+            start:     起点 {关节名: 值}
+            waypoints: 路径点列表 [{关节名: 值}, ...]
+            durations: 每个路径点的用时（秒）
+        """
+        joints = list(start)
+        for wp in waypoints:
+            joints.extend(name for name in wp if name not in joints)
+        current = dict(start)
+        for name in joints:
+            if name not in current:
+                # 起点未知的关节直接从第一次出现的目标值开始，不产生运动
+                current[name] = next(wp[name] for wp in waypoints if name in wp)
+        rows = [[current[name] for name in joints]]
+        for wp in waypoints:
+            current.update(wp)
+            rows.append([current[name] for name in joints])
+        return cls(joints, rows, durations, profile)
+
+    def sample_many(self, ts) -> np.ndarray:
+        """批量采样：返回形状 (len(ts), 关节数) 的目标值"""
+        ts = np.asarray(ts, dtype=float)
+        last = len(self.points) - 2
+        if last < 0:
+            return np.repeat(self.points, len(ts), axis=0)
+        seg = np.clip(np.searchsorted(self.times, ts, side="right") - 1, 0, last)
+        seg_duration = self.times[seg + 1] - self.times[seg]
+        safe = np.where(seg_duration > 0, seg_duration, 1.0)
+        u = np.where(seg_duration > 0, np.clip((ts - self.times[seg]) / safe, 0.0, 1.0), 1.0)
+        s = self._profile(u)[:, None]
+        return self.points[seg] + (self.points[seg + 1] - self.points[seg]) * s
+
+    def sample(self, t: float) -> np.ndarray:
+        """时刻 t（秒）的全部关节目标值"""
+        return self.sample_many([t])[0]
+
+
+class _Job:
+    """一次轨迹执行请求"""
+
+    def __init__(self, waypoints, durations, profile, on_done=None):
+        self.waypoints = waypoints
+        self.durations = durations
+        self.profile = profile
+        self.on_done = on_done
+        self.started = False
+        self.done = threading.Event()
+        self.report: Dict = {}
+        self.error: Optional[BaseException] = None
+
+
+class TrajectoryStreamer:
+    """
+    轨迹流式执行线程。
+
+    参数:
+        write:         写入函数 write({关节名: 目标值})，每个控制周期调用一次
+        read_position: 读取当前位置的函数，返回 {关节名: 值}，用于第一条轨迹的起点
+        rate_hz:       控制频率
+        realtime_priority: SCHED_FIFO 优先级（1~99），0 表示不提升；没有权限时退回普通优先级
+        spin_s:        截止时刻前改为自旋等待的时间（秒），sleep 精度不足时提高对齐精度
+    """
+
+    def __init__(
+        self,
+        write: Callable[[Dict[str, float]], None],
+        read_position: Callable[[], Dict[str, float]],
+        rate_hz: float = 50.0,
+        realtime_priority: int = 10,
+        spin_s: float = 0.0005,
+    ) -> None:
+        self.write = write
+        self.read_position = read_position
+        self.period = 1.0 / rate_hz
+        self.realtime_priority = realtime_priority
+        self.spin_s = spin_s
+        self.priority = "normal"
+
+        self.setpoint: Dict[str, float] = {}  # 最后写入的目标值
+        self._job: Optional[_Job] = None      # 最新请求的轨迹（cancel 后为 None）
+        self._running: Optional[_Job] = None  # 轨迹线程正在写入的轨迹，写完最后一个周期后才清空
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+        # 累计统计
+        self.trajectories = 0
+        self.ticks = 0
+        self.missed = 0
+        self.preempted = 0
+        self._jitter = deque(maxlen=10000)  # 最近的唤醒抖动（秒）
+
+    # ---------- 对外接口 ---------- #
+    def execute(
+        self,
+        waypoints: Sequence[Dict[str, float]],
+        durations: Sequence[float],
+        profile: str = "trapezoid",
+        wait: bool = True,
+        on_done: Optional[Callable[[Dict, Optional[BaseException]], None]] = None,
+    ) -> Optional[Dict]:
+        """
+        执行轨迹（从当前目标值出发，依次经过 waypoints），抢占正在执行的轨迹。
+
+        Args:
+            waypoints: 路径点列表 [{关节名: 值}, ...]
+            durations: 每个路径点的用时（秒）
+            profile:   速度曲线
+            wait:      True 时等待执行完成并返回本次的时序报告
+            on_done:   完成（含被抢占、出错）后在轨迹线程中调用 on_done(报告, 异常)，
+                       回调应尽快返回，不要在其中做网络或总线 I/O
+        """
+        if profile not in PROFILES:
+            raise ValueError(f"未知速度曲线: {profile}")
+        job = _Job(list(waypoints), list(durations), profile, on_done)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("轨迹线程已关闭")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="TrajectoryStreamer")
+                self._thread.daemon = True
+                self._thread.start()
+            skipped = self._replace(job)
+            self._cond.notify_all()
+        self._finish_skipped(skipped)
+        if not wait:
+            return None
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.report
+
+    def cancel(self) -> None:
+        """停止当前轨迹，机械臂停在最后写入的目标值"""
+        with self._cond:
+            skipped = self._replace(None)
+            self._cond.notify_all()
+        self._finish_skipped(skipped)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待轨迹线程空闲（没有待执行的轨迹，且正在执行的轨迹已停止写入），返回是否已空闲
+
+        cancel() 之后轨迹线程可能还会写入最后一个周期，这里会等到它真正停下，
+        返回后 setpoint 不再变化。
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._job is None and self._running is None, timeout)
+
+    @property
+    def busy(self) -> bool:
+        return self._job is not None or self._running is not None
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            skipped = self._replace(None)
+            self._cond.notify_all()
+        self._finish_skipped(skipped)
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def stats(self) -> Dict:
+        """累计时序统计：周期数、错过的周期、唤醒抖动（毫秒）"""
+        report = {
+            "rate_hz": 1.0 / self.period,
+            "priority": self.priority,
+            "trajectories": self.trajectories,
+            "ticks": self.ticks,
+            "missed": self.missed,
+            "preempted": self.preempted,
+        }
+        if self._jitter:
+            report["jitter_ms"] = self._jitter_summary(np.asarray(self._jitter))
+        return report
+
+    def _replace(self, job: Optional[_Job]) -> Optional[_Job]:
+        """（持锁调用）替换当前轨迹，返回还没开始执行就被替换的旧轨迹"""
+        previous = self._job
+        self._job = job
+        if previous is None:
+            return None
+        self.preempted += 1
+        return None if previous.started else previous
+
+    def _finish_skipped(self, job: Optional[_Job]) -> None:
+        if job is not None:
+            job.report = {"planned_s": 0.0, "actual_s": 0.0, "ticks": 0, "missed": 0,
+                          "interrupted": True}
+            self._finish(job)
+
+    @staticmethod
+    def _finish(job: _Job) -> None:
+        job.done.set()
+        if job.on_done is not None:
+            try:
+                job.on_done(job.report, job.error)
+            except Exception as e:
+                print(f"轨迹完成回调出错: {e}")
+
+    # ---------- 线程 ---------- #
+    def _set_priority(self) -> None:
+        """尝试把当前线程切换为 SCHED_FIFO 实时调度（Linux 下对调用线程生效）"""
+        if self.realtime_priority <= 0 or not hasattr(os, "sched_setscheduler"):
+            return
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.realtime_priority))
+            self.priority = f"SCHED_FIFO:{self.realtime_priority}"
+        except (PermissionError, OSError):
+            # 需要 root 或 CAP_SYS_NICE，没有权限时使用普通优先级
+            pass
+
+    def _run(self) -> None:
+        self._set_priority()
+        while True:
+            with self._cond:
+                while self._job is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                job = self._job
+                job.started = True
+                self._running = job
+            try:
+                self._stream(job)
+            except Exception as e:
+                job.error = e
+            with self._cond:
+                if self._job is job:
+                    self._job = None
+            self._finish(job)
+            with self._cond:
+                self._running = None
+                self._cond.notify_all()
+
+    def _sleep_until(self, deadline: float) -> None:
+        remaining = deadline - time.perf_counter()
+        if remaining > self.spin_s:
+            time.sleep(remaining - self.spin_s)
+        while time.perf_counter() < deadline:
+            pass
+
+    def _stream(self, job: _Job) -> None:
+        start = dict(self.setpoint) if self.setpoint else self.read_position()
+        trajectory = JointTrajectory.from_waypoints(start, job.waypoints, job.durations, job.profile)
+        period = self.period
+        jitter = []
+        missed = 0
+        write_time = 0.0
+        interrupted = False
+
+        t0 = time.perf_counter()
+        k = 0
+        while True:
+            if self._job is not job:
+                interrupted = True
+                break
+            deadline = t0 + k * period
+            self._sleep_until(deadline)
+            now = time.perf_counter()
+            late = now - deadline
+            if late >= period:
+                # 错过了整周期（例如写入阻塞），跳到当前周期，按当前时刻采样
+                skipped = int(late // period)
+                missed += skipped
+                k += skipped
+                late -= skipped * period
+            jitter.append(late)
+
+            t = min(k * period, trajectory.duration)
+            setpoint = dict(zip(trajectory.joints, trajectory.sample(t).tolist()))
+            write_start = time.perf_counter()
+            self.write(setpoint)
+            write_time += time.perf_counter() - write_start
+            self.setpoint.update(setpoint)
+            if t >= trajectory.duration:
+                break
+            k += 1
+        elapsed = time.perf_counter() - t0
+
+        self.trajectories += 1
+        self.ticks += len(jitter)
+        self.missed += missed
+        self._jitter.extend(jitter)
+        job.report = {
+            "planned_s": trajectory.duration,
+            "actual_s": elapsed,
+            "ticks": len(jitter),
+            "missed": missed,
+            "interrupted": interrupted,
+            "write_ms_mean": write_time / max(len(jitter), 1) * 1000,
+            "priority": self.priority,
+        }
+        if jitter:
+            job.report["jitter_ms"] = self._jitter_summary(np.asarray(jitter))
+
+    @staticmethod
+    def _jitter_summary(jitter: np.ndarray) -> Dict[str, float]:
+        jitter_ms = jitter * 1000
+        return {
+            "mean": float(jitter_ms.mean()),
+            "p95": float(np.percentile(jitter_ms, 95)),
+            "max": float(jitter_ms.max()),
+        }
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+机械臂命令工作线程：控制连接只负责把机械臂命令放入有界队列，由独立线程执行并回复完成确认
+
+机械臂动作是串口总线 I/O，直接在 handle_client 里调用会阻塞同一连接上的电机命令。这里改为：
+- submit 只解析参数并入队（不访问总线），接收线程立即返回继续处理驱动命令
+- 工作线程按顺序启动动作（ArmController 的 wait=False 接口，轨迹由轨迹线程流式执行），
+  动作完成、被抢占或出错时在工作线程中发送完成确认 {'ack': id, 'ok': ..., 'report': {...}}
+- 默认新动作抢占：清空还没开始的命令（确认为 preempted），正在执行的轨迹从当前目标平滑切换到新动作；
+  命令带 "queue": true 时排在当前动作之后执行
+- 队列满时新命令直接失败，不阻塞接收线程
+
+命令格式（关节 ID 为 1~6，6 为夹爪开合百分比）：
+    {'command': 'arm_joint', 'joint': 2, 'angle': 30, 'duration_ms': 600}
+    {'command': 'arm_pose', 'joints': {'1': 0, '2': 30}, 'duration_ms': 800}
+    {'command': 'arm_trajectory', 'waypoints': [{'2': 30}, {'2': -10}], 'duration_ms': 800, 'pause_ms': 200}
+    {'command': 'arm_linear', 'xyz': [0.25, 0.0, 0.12], 'pitch': 150, 'duration_ms': 1000}
+    {'command': 'arm_gripper', 'percent': 100, 'duration_ms': 300}
+    {'command': 'arm_home', 'duration_ms': 1000}
+    {'command': 'arm_stop'}
+"""
+
+import threading
+from collections import deque
+
+
+ARM_COMMANDS = ('arm_joint', 'arm_pose', 'arm_trajectory', 'arm_linear', 'arm_gripper',
+                'arm_home', 'arm_stop')
+
+
+class _ArmCommand:
+    """一条排队的机械臂命令"""
+
+    def __init__(self, command, start, is_motion, reply):
+        self.command = command
+        self.start = start  # start(on_done)：启动动作，动作结束时调用 on_done(报告, 异常)
+        self.is_motion = is_motion  # False 表示 start 返回即完成（例如停止）
+        self.reply = reply
+        self.preempt = not command.get('queue', False)
+        self.finished = False  # 已收到完成回调
+
+
+def _joint_map(joints):
+    """JSON 对象的键是字符串，转换为 {关节 ID: 值}"""
+    return {int(jid): float(value) for jid, value in joints.items()}
+
+
+class ArmCommandWorker:
+    """机械臂命令工作线程
+
+    参数:
+        arm: ArmController
+        max_queue: 等待执行的命令上限
+    """
+
+    def __init__(self, arm, max_queue=8):
+        self.arm = arm
+        self.max_queue = max_queue
+        self._queue = deque()
+        self._finished = deque()  # (命令, 报告, 异常)，由轨迹线程的完成回调写入
+        self._active = None       # 正在执行的动作
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        # 统计
+        self.submitted = 0
+        self.completed = 0
+        self.preempted = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ArmCommandWorker")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            dropped = list(self._queue)
+            self._queue.clear()
+            self._cond.notify()
+        for entry in dropped:
+            self._reply(entry, {'ok': False, 'error': '服务端已停止'})
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    # ---------- 接收线程 ---------- #
+    def submit(self, command, reply=None):
+        """解析并入队（接收线程调用，不访问总线）；参数错误或队列已满时抛出异常
+
+        参数:
+            command: 命令字典
+            reply: 回复函数 reply(消息)，动作结束后在工作线程中调用；None 表示不回复
+        """
+        try:
+            start, is_motion = self._parse(command)
+        except KeyError as e:
+            raise ValueError(f"缺少参数: {e.args[0]}") from None
+        entry = _ArmCommand(command, start, is_motion, reply)
+        with self._cond:
+            if entry.preempt:
+                # 还没开始的命令被新动作取代，由工作线程确认为 preempted
+                self._finished.extend((old, {'interrupted': True}, None) for old in self._queue)
+                self._queue.clear()
+            elif len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise RuntimeError("机械臂命令队列已满")
+            self._queue.append(entry)
+            self.submitted += 1
+            self._cond.notify()
+
+    def _parse(self, command):
+        """命令 -> (start(on_done), 是否为动作)，参数在这里检查，出错时直接返回给客户端"""
+        arm = self.arm
+        cmd = command.get('command')
+        duration_ms = int(command.get('duration_ms', 800))
+        if cmd == 'arm_joint':
+            joint_id, angle = int(command['joint']), float(command['angle'])
+            duration_ms = int(command.get('duration_ms', 500))
+            return (lambda on_done: arm.set_joint_angle(
+                joint_id, angle, duration_ms, wait=False, on_done=on_done)), True
+        if cmd == 'arm_pose':
+            joints = _joint_map(command['joints'])
+            return (lambda on_done: arm.set_pose(
+                list(joints), list(joints.values()), duration_ms, wait=False, on_done=on_done)), True
+        if cmd == 'arm_trajectory':
+            waypoints = [_joint_map(wp) for wp in command['waypoints']]
+            if not any(waypoints):
+                raise ValueError("waypoints 不能为空")
+            pause_ms = int(command.get('pause_ms', 200))
+            return (lambda on_done: arm.execute_trajectory(
+                waypoints, duration_ms, pause_ms, wait=False, on_done=on_done)), True
+        if cmd == 'arm_linear':
+            xyz = [float(v) for v in command['xyz']]
+            if len(xyz) != 3:
+                raise ValueError("xyz 必须是 [x, y, z]（米）")
+            pitch = command.get('pitch')
+            pitch = None if pitch is None else float(pitch)
+            duration_ms = int(command.get('duration_ms', 1000))
+            # 逆解在启动时以当时的目标位置为起点计算，不可达时确认为失败
+            return (lambda on_done: arm.move_linear(
+                xyz, pitch, duration_ms, wait=False, on_done=on_done)), True
+        if cmd == 'arm_gripper':
+            percent = float(command['percent'])
+            duration_ms = int(command.get('duration_ms', 300))
+            return (lambda on_done: arm.set_joint_angle(
+                6, percent, duration_ms, wait=False, on_done=on_done)), True
+        if cmd == 'arm_home':
+            duration_ms = int(command.get('duration_ms', 1000))
+            return (lambda on_done: arm.go_home(duration_ms, wait=False, on_done=on_done)), True
+        if cmd == 'arm_stop':
+            return (lambda on_done: arm.stop_motion(wait=False)), False
+        raise ValueError(f"未知机械臂命令: {cmd}")
+
+    # ---------- 工作线程 ---------- #
+    def _on_done(self, entry, report, error):
+        """轨迹线程回调：只记录结果，确认由工作线程发送"""
+        with self._cond:
+            entry.finished = True
+            self._finished.append((entry, report, error))
+            if self._active is entry:
+                self._active = None
+            self._cond.notify()
+
+    def _ready(self):
+        return self._queue and (self._active is None or self._queue[0].preempt)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._finished and not self._ready():
+                    self._cond.wait()
+                if not self._running:
+                    return
+                finished = list(self._finished)
+                self._finished.clear()
+                entry = self._queue.popleft() if self._ready() else None
+                previous = self._active
+                if entry is not None:
+                    self._active = entry
+
+            for done, report, error in finished:
+                self._complete(done, report, error)
+
+            if entry is not None:
+                error = None
+                try:
+                    entry.start(lambda report, error, entry=entry:
+                                self._on_done(entry, report, error))
+                except Exception as e:
+                    error = e
+                if error is not None or not entry.is_motion:
+                    # 没有启动异步动作：立即确认。启动失败时（例如直线运动目标不可达）
+                    # 上一个动作没有被抢占，仍在执行，恢复为当前动作，排队的命令继续等它结束
+                    with self._cond:
+                        if self._active is entry:
+                            keep = error is not None and previous is not None and not previous.finished
+                            self._active = previous if keep else None
+                    self._complete(entry, {}, error)
+
+    def _complete(self, entry, report, error):
+        if error is not None:
+            self.failed += 1
+            message = {'ok': False, 'error': str(error)}
+        elif report.get('interrupted'):
+            self.preempted += 1
+            message = {'ok': False, 'error': 'preempted'}
+        else:
+            self.completed += 1
+            message = {'ok': True}
+        timing = {key: report[key] for key in ('planned_s', 'actual_s', 'ticks', 'missed')
+                  if key in report}
+        if timing:
+            message['report'] = timing
+        self._reply(entry, message)
+
+    @staticmethod
+    def _reply(entry, message):
+        if entry.reply is None or 'id' not in entry.command:
+            return
+        message['ack'] = entry.command['id']
+        try:
+            entry.reply(message)
+        except Exception as e:
+            print(f"发送机械臂命令确认失败: {e}")
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._queue)
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'preempted': self.preempted,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'pending': pending,
+        }
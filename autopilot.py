@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+目标跟随自动驾驶（闭环）
+
+按固定频率读取最新检测结果，根据目标检测框的水平偏移和大小计算差速驱动命令：
+- 水平偏移 -> 转向（左右轮速度差）
+- 检测框面积与期望面积之差 -> 前进/后退速度
+- 延迟补偿：用最近两次检测估计目标运动，从帧时间戳外推到命令生效时刻（结果到达时的帧龄
+  + 到达后经过的时间 + 执行延迟）。本地推理的帧龄为 time.time() - ts（同一时钟）；
+  车端检测的时间戳来自小车时钟，帧龄取消息中的推理耗时（不含网络传输）
+- 检测结果过期（超过 stale_timeout 秒没有新检测）立即停车；是否过期按控制循环本地收到新结果的
+  时刻（time.monotonic()）判断，不与检测结果的时间戳比较（车端检测的时间戳来自小车时钟）
+
+电机后端：
+- NetworkMotor：通过控制端口发送 {'command': 'drive', 'left': .., 'right': ..}
+- SimulatedMotor：只记录命令，用于回放视频离线调试
+
+统计感知到执行的延迟：每个含目标的新结果只统计一次，为第一条基于它的电机命令发出时刻减去帧时间戳
+（到达时的帧龄 + 到达后到发出命令的时间）。本地推理时帧时间戳是客户端收到帧、写入 LatestFrameSlot
+的时刻，不含摄像头采集、编码和网络传输；车端检测时帧龄取小车的推理耗时，不含网络传输。
+
+回放录像离线运行（模拟电机）：
+    python autopilot.py replay --source recordings/follow.mp4 --backend onnxruntime --target person
+连接小车实际运行：
+    python autopilot.py live --host 192.168.1.100 --target person
+"""
+
+import argparse
+import socket
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from car_sdk import CarClient
+from inference_worker import InferenceWorker, LatestFrameSlot
+from tracker import select_target
+
+
+class FollowController:
+    """目标跟随控制律
+
+    参数:
+        target_class: 跟随的目标类别
+        target_area: 期望的检测框面积占画面比例（越大停得越近）
+        max_speed: 最大轮速（0-100）
+        turn_gain: 水平偏移（-1~1）到轮速差的增益
+        forward_gain: 面积误差（相对值）到前进速度的增益
+        deadband: 水平偏移死区（-1~1），避免目标在中心附近时来回摆动
+        stale_timeout: 检测结果超过该时间（秒）未更新则停车
+        actuation_delay: 命令发出到车轮响应的估计延迟（秒），用于延迟补偿
+        latency_compensation: 是否外推目标位置补偿延迟
+    """
+
+    def __init__(self, target_class='person', target_area=0.12, max_speed=60,
+                 turn_gain=60.0, forward_gain=50.0, deadband=0.08, stale_timeout=0.5,
+                 actuation_delay=0.05, latency_compensation=True):
+        self.target_class = target_class
+        self.target_area = target_area
+        self.max_speed = max_speed
+        self.turn_gain = turn_gain
+        self.forward_gain = forward_gain
+        self.deadband = deadband
+        self.stale_timeout = stale_timeout
+        self.actuation_delay = actuation_delay
+        self.latency_compensation = latency_compensation
+        self.reset()
+
+    def reset(self):
+        """清空目标状态"""
+        self.track_id = None
+        self.last_state = None  # (ts, 水平偏移, 面积比例)
+        self.velocity = (0.0, 0.0)
+        self.last_seen = None   # 最近一次看到目标的本地时刻（time.monotonic()）
+        self.result_age = 0.0   # 该结果到达时距帧时间戳已经过的时间（秒）
+
+    def select_target(self, detections):
+        """选择跟随目标：优先沿用上次的轨迹ID，否则取面积最大的目标类别框"""
+        target = select_target(detections, self.target_class, self.track_id)
+        if target is not None:
+            self.track_id = target.get('track_id')
+        return target
+
+    def observe(self, detections, ts, frame_size, now=None, age=0.0):
+        """输入一次新的检测结果
+
+        ts 为结果自带的时间戳，只用于相邻两次结果之间的时间差（估计目标运动）；
+        now 为本地收到该结果的时刻（time.monotonic()），用于过期判断；
+        age 为收到时该结果距帧时间戳已经过的时间（秒），计入延迟补偿。
+        返回结果中是否有目标。
+        """
+        now = time.monotonic() if now is None else now
+        target = self.select_target(detections)
+        if target is None:
+            return False
+        width, height = frame_size
+        x1, y1, x2, y2 = target['bbox']
+        offset = ((x1 + x2) / 2 - width / 2) / (width / 2)   # -1（最左）~ 1（最右）
+        area = (x2 - x1) * (y2 - y1) / (width * height)
+        if self.last_state is not None and ts > self.last_state[0]:
+            dt = ts - self.last_state[0]
+            self.velocity = ((offset - self.last_state[1]) / dt,
+                             (area - self.last_state[2]) / dt)
+        self.last_state = (ts, offset, area)
+        self.last_seen = now
+        self.result_age = max(0.0, age)
+        return True
+
+    def is_stale(self, now):
+        """目标是否丢失或检测结果已过期（now 为 time.monotonic()）"""
+        return self.last_seen is None or now - self.last_seen > self.stale_timeout
+
+    def command(self, now):
+        """计算当前时刻（time.monotonic()）的左右轮速度 (left, right)，目标丢失或过期时返回 (0, 0)"""
+        if self.is_stale(now):
+            return 0, 0
+        _, offset, area = self.last_state
+        if self.latency_compensation:
+            # 从帧时间戳外推到命令生效时刻：到达时的帧龄 + 到达后经过的时间 + 执行延迟
+            horizon = min(self.result_age + now - self.last_seen + self.actuation_delay,
+                          self.stale_timeout)
+            offset += self.velocity[0] * horizon
+            area = max(area + self.velocity[1] * horizon, 0.0)
+
+        turn = 0.0 if abs(offset) < self.deadband else self.turn_gain * offset
+        forward = self.forward_gain * (self.target_area - area) / self.target_area
+        left = np.clip(forward + turn, -self.max_speed, self.max_speed)
+        right = np.clip(forward - turn, -self.max_speed, self.max_speed)
+        return int(left), int(right)
+
+
+class SimulatedMotor:
+    """模拟电机：只记录命令"""
+
+    def __init__(self):
+        self.commands = []  # (时间, 左轮, 右轮)
+
+    def drive(self, left, right):
+        self.commands.append((time.time(), left, right))
+
+    def stop(self):
+        self.drive(0, 0)
+
+    def close(self):
+        pass
+
+
+class NetworkMotor:
+    """通过控制端口发送差速驱动命令"""
+
+    def __init__(self, host, port=5000):
+        self.client = CarClient(host, port, connect_timeout=2.0)
+        self.client.connect()
+
+    def drive(self, left, right):
+        self.client.drive(int(left), int(right))
+
+    def stop(self):
+        self.drive(0, 0)
+
+    def close(self):
+        try:
+            self.stop()
+        except Exception:
+            pass
+        self.client.close()
+
+
+class Autopilot:
+    """固定频率的控制循环
+
+    参数:
+        source: 检测结果来源，提供 latest() -> (检测列表, 帧序号, 帧时间戳)，
+            如 InferenceWorker、共享检测服务的 StreamHandle、EdgeDetectionReceiver
+        motor: 电机后端，提供 drive(left, right) / stop()
+        controller: FollowController
+        frame_size: 检测坐标对应的帧尺寸 (宽, 高)
+        rate_hz: 控制频率
+    """
+
+    def __init__(self, source, motor, controller, frame_size=(640, 480), rate_hz=20):
+        self.source = source
+        self.motor = motor
+        self.controller = controller
+        self.frame_size = frame_size
+        self.period = 1.0 / rate_hz
+        self._running = False
+        self._thread = None
+        self._observed_seq = 0
+        self._pending_latency = None  # (到达时刻, 帧龄)：含目标、还没有发出过命令的新结果
+
+        # 统计
+        self.ticks = 0
+        self.missed_ticks = 0
+        self.stale_stops = 0
+        self.latencies = []  # 感知到执行延迟（秒）：帧时间戳 -> 第一条基于该结果的命令发出
+        self.last_command = (0, 0)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="Autopilot")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self.motor.stop()
+
+    def _run(self):
+        next_tick = time.perf_counter()
+        while self._running:
+            self.step()
+            next_tick += self.period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # 错过的周期不补发，从当前时刻重新计时
+                self.missed_ticks += int(-delay / self.period) + 1
+                next_tick = time.perf_counter()
+
+    def result_age(self, ts):
+        """新结果到达时距帧时间戳已经过的时间（秒）
+
+        时间戳来自小车时钟的来源（remote_clock 为 True，如 EdgeDetectionReceiver）不能与本地时间相减，
+        取结果自带的推理耗时 last_infer_time。
+        """
+        if getattr(self.source, 'remote_clock', False):
+            return getattr(self.source, 'last_infer_time', 0.0)
+        return max(0.0, time.time() - ts)
+
+    def step(self):
+        """执行一个控制周期"""
+        detections, seq, ts = self.source.latest()
+        if seq != self._observed_seq:
+            self._observed_seq = seq
+            arrival, age = time.monotonic(), self.result_age(ts)
+            if self.controller.observe(detections, ts, self.frame_size, arrival, age):
+                self._pending_latency = (arrival, age)
+
+        now = time.monotonic()
+        left, right = self.controller.command(now)
+        stale = self.controller.is_stale(now)
+        if stale and self.last_command != (0, 0):
+            self.stale_stops += 1
+        self.motor.drive(left, right)
+        if not stale and self._pending_latency is not None:
+            arrival, age = self._pending_latency
+            self.latencies.append(age + time.monotonic() - arrival)
+            self._pending_latency = None
+        self.last_command = (left, right)
+        self.ticks += 1
+
+    def stats(self):
+        """控制循环统计"""
+        report = {'ticks': self.ticks, 'missed_ticks': self.missed_ticks,
+                  'stale_stops': self.stale_stops}
+        if self.latencies:
+            ms = np.asarray(self.latencies) * 1000
+            report['perception_to_actuation_ms'] = {
+                'mean': float(ms.mean()),
+                'p50': float(np.percentile(ms, 50)),
+                'p95': float(np.percentile(ms, 95)),
+                'max': float(ms.max()),
+            }
+        return report
+
+
+def replay_video(path, slot, realtime=True, stop_event=None):
+    """按原始帧率把视频帧写入 LatestFrameSlot（写入时刻作为采集时间）"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"无法打开视频: {path}")
+    interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30)
+    next_frame = time.perf_counter()
+    try:
+        while stop_event is None or not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            slot.put(frame)
+            if realtime:
+                next_frame += interval
+                time.sleep(max(0.0, next_frame - time.perf_counter()))
+    finally:
+        cap.release()
+
+
+def receive_video(host, port, slot, stop_event):
+    """接收小车视频流写入 LatestFrameSlot"""
+    sock = socket.create_connection((host, port), timeout=5.0)
+
+    def recv_all(size):
+        data = bytearray()
+        while len(data) < size:
+            packet = sock.recv(size - len(data))
+            if not packet:
+                return None
+            data.extend(packet)
+        return data
+
+    try:
+        while not stop_event.is_set():
+            header = recv_all(4)
+            if header is None:
+                break
+            data = recv_all(struct.unpack('>L', header)[0])
+            if data is None:
+                break
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None:
+                slot.put(frame)
+    finally:
+        sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="目标跟随自动驾驶")
+    sub = parser.add_subparsers(dest='mode', required=True)
+    for name, help_text in (('replay', "回放录像，模拟电机"), ('live', "连接小车运行")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument('--backend', default='onnxruntime')
+        p.add_argument('--weights', default='yolov8n.pt')
+        p.add_argument('--imgsz', type=int, default=320)
+        p.add_argument('--target', default='person', help="跟随的目标类别")
+        p.add_argument('--target-area', type=float, default=0.12, help="期望的目标面积占比")
+        p.add_argument('--max-speed', type=int, default=60)
+        p.add_argument('--rate', type=float, default=20, help="控制频率（Hz）")
+        p.add_argument('--stale-timeout', type=float, default=0.5)
+        p.add_argument('--no-compensation', action='store_true', help="关闭延迟补偿")
+    sub.choices['replay'].add_argument('--source', required=True, help="录制的视频文件")
+    sub.choices['live'].add_argument('--host', default='192.168.1.100')
+    sub.choices['live'].add_argument('--duration', type=float, default=0, help="运行时长（秒），0 表示直到 Ctrl+C")
+    args = parser.parse_args()
+
+    from detectors import create_detector
+    detector = create_detector(args.backend, args.weights, imgsz=args.imgsz)
+    slot = LatestFrameSlot()
+    worker = InferenceWorker(detector.detect, slot, name="AutopilotInference")
+    controller = FollowController(args.target, args.target_area, args.max_speed,
+                                  stale_timeout=args.stale_timeout,
+                                  latency_compensation=not args.no_compensation)
+    stop_event = threading.Event()
+
+    if args.mode == 'replay':
+        motor = SimulatedMotor()
+        cap = cv2.VideoCapture(args.source)
+        frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        cap.release()
+    else:
+        motor = NetworkMotor(args.host)
+        frame_size = (640, 480)
+
+    autopilot = Autopilot(worker, motor, controller, frame_size, args.rate)
+    worker.start()
+    autopilot.start()
+    try:
+        if args.mode == 'replay':
+            replay_video(args.source, slot, stop_event=stop_event)
+        else:
+            thread = threading.Thread(target=receive_video,
+                                      args=(args.host, 5001, slot, stop_event), daemon=True)
+            thread.start()
+            start = time.time()
+            while thread.is_alive() and (not args.duration or time.time() - start < args.duration):
+                time.sleep(0.2)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        autopilot.stop()
+        worker.stop()
+        motor.close()
+
+    stats = autopilot.stats()
+    print(f"控制周期 {stats['ticks']}, 错过 {stats['missed_ticks']}, 过期停车 {stats['stale_stops']} 次")
+    print(f"推理 {worker.inference_count} 次, 跳过帧 {worker.skipped_frames}")
+    latency = stats.get('perception_to_actuation_ms')
+    if latency:
+        print(f"感知到执行延迟: 平均 {latency['mean']:.1f}ms, P50 {latency['p50']:.1f}ms, "
+              f"P95 {latency['p95']:.1f}ms, 最大 {latency['max']:.1f}ms")
+    else:
+        print("未跟随到目标")
+    if isinstance(motor, SimulatedMotor):
+        moving = sum(1 for _, left, right in motor.commands if (left, right) != (0, 0))
+        print(f"电机命令 {len(motor.commands)} 条，其中非停车 {moving} 条")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+检测流水线无界面基准测试（替代原 test_yolo.py）
+
+支持任意检测后端，输入可以是单张图片、图片目录、视频文件或录制的视频会话：
+    python benchmark.py run --source test.jpeg --repeat 100
+    python benchmark.py run --source recordings/drive.mp4 --backend onnxruntime --int8
+    python benchmark.py run --source session.bin --backend openvino --output bench.json
+
+录制视频会话（保存小车视频端口的原始数据流：4字节大端长度 + JPEG）：
+    python benchmark.py record --host 192.168.1.100 --duration 30 --output session.bin
+
+报告内容：环境信息、模型加载与预热耗时、首帧延迟、各阶段（解码/预处理/推理/后处理/绘制）
+延迟分位数、吞吐量、峰值内存（RSS）和 CPU 利用率。--output 保存 JSON 报告。
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import struct
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from detectors import DETECTOR_BACKENDS, THREADED_BACKENDS, create_detector
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.bmp')
+SESSION_SUFFIXES = ('.bin', '.session', '.mjpeg')
+STAGES = ('decode', 'preprocess', 'infer', 'postprocess', 'draw', 'total')
+
+
+# ===================== 输入源 ===================== #
+
+def iter_session(path):
+    """读取录制的视频会话，逐帧返回 JPEG 字节"""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(4)
+            if len(header) < 4:
+                return
+            size = struct.unpack('>L', header)[0]
+            data = f.read(size)
+            if len(data) < size:
+                return
+            yield data
+
+
+def iter_source(source, max_frames, repeat=1):
+    """按输入类型逐帧读取并解码，返回 BGR 帧（解码耗时计入 decode 阶段）"""
+    path = Path(source)
+    count = 0
+    if path.is_dir():
+        paths = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        for image_path in paths:
+            frame = cv2.imread(str(image_path))
+            if frame is not None:
+                yield frame
+                count += 1
+                if count >= max_frames:
+                    return
+    elif path.suffix.lower() in IMAGE_SUFFIXES:
+        # 单张图片：解码一次，重复推理
+        frame = cv2.imread(str(path))
+        if frame is None:
+            raise ValueError(f"无法读取图片: {source}")
+        for _ in range(min(repeat, max_frames)):
+            yield frame
+    elif path.suffix.lower() in SESSION_SUFFIXES:
+        for data in iter_session(path):
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None:
+                yield frame
+                count += 1
+                if count >= max_frames:
+                    return
+    else:
+        cap = cv2.VideoCapture(str(path))
+        if not cap.isOpened():
+            raise ValueError(f"无法打开视频: {source}")
+        try:
+            while count < max_frames:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield frame
+                count += 1
+        finally:
+            cap.release()
+
+
+# ===================== 资源统计 ===================== #
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB），无法获取时返回 None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def cpu_seconds():
+    """进程累计 CPU 时间（用户态 + 内核态，秒）"""
+    times = os.times()
+    return times.user + times.system
+
+
+def percentiles(samples):
+    """延迟分位数统计（毫秒）"""
+    if not samples:
+        return {}
+    ms = np.asarray(samples) * 1000
+    return {
+        'mean': float(ms.mean()),
+        'p50': float(np.percentile(ms, 50)),
+        'p90': float(np.percentile(ms, 90)),
+        'p95': float(np.percentile(ms, 95)),
+        'p99': float(np.percentile(ms, 99)),
+        'max': float(ms.max()),
+    }
+
+
+def environment(backend):
+    """环境信息"""
+    info = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+    }
+    module = {'ultralytics': 'ultralytics', 'onnxruntime': 'onnxruntime',
+              'openvino': 'openvino'}.get(backend)
+    if module:
+        try:
+            info[module] = __import__(module).__version__
+        except Exception:
+            pass
+    return info
+
+
+# ===================== 基准测试 ===================== #
+
+def draw_detections(frame, detections):
+    """与视频窗口相同的绘制流程：画框后转换为 RGB"""
+    for det in detections:
+        x1, y1, x2, y2 = det['bbox']
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def run_benchmark(source, backend='ultralytics', weights='yolov8n.pt', imgsz=640,
+                  max_frames=300, repeat=100, warmup_runs=2, **detector_options):
+    """运行基准测试，返回报告字典"""
+    report = {'source': str(source), 'backend': backend, 'weights': weights,
+              'imgsz': imgsz, 'options': detector_options, 'env': environment(backend)}
+
+    start = time.perf_counter()
+    detector = create_detector(backend, weights, warmup=False, imgsz=imgsz, **detector_options)
+    report['load_s'] = time.perf_counter() - start
+    report['rss_after_load_mb'] = peak_rss_mb()
+    report['warmup_ms'] = detector.warmup(runs=warmup_runs) * 1000 if warmup_runs else 0.0
+
+    timings = {stage: [] for stage in STAGES}
+    detections_total = 0
+    frames = iter_source(source, max_frames, repeat)
+
+    wall_start = time.perf_counter()
+    cpu_start = cpu_seconds()
+    while True:
+        t0 = time.perf_counter()
+        frame = next(frames, None)
+        if frame is None:
+            break
+        t1 = time.perf_counter()
+        detections, stages = detector.detect_timed(frame)
+        t2 = time.perf_counter()
+        draw_detections(frame.copy(), detections)
+        t3 = time.perf_counter()
+
+        timings['decode'].append(t1 - t0)
+        for stage, seconds in stages.items():
+            timings[stage].append(seconds)
+        timings['draw'].append(t3 - t2)
+        timings['total'].append(t3 - t0)
+        detections_total += len(detections)
+    wall = time.perf_counter() - wall_start
+    cpu = cpu_seconds() - cpu_start
+
+    count = len(timings['total'])
+    if count == 0:
+        raise ValueError(f"没有读取到任何帧: {source}")
+    report.update({
+        'frames': count,
+        'detections': detections_total,
+        'first_frame_ms': timings['total'][0] * 1000,
+        'latency_ms': {stage: percentiles(values) for stage, values in timings.items()},
+        'throughput_fps': count / wall if wall > 0 else 0.0,
+        'wall_s': wall,
+        'cpu_s': cpu,
+        # 占用的 CPU 核数，以及相对全部核心的利用率
+        'cpu_cores_used': cpu / wall if wall > 0 else 0.0,
+        'cpu_utilization': cpu / wall / (os.cpu_count() or 1) if wall > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    })
+    return report
+
+
+def print_report(report):
+    """打印可读的报告"""
+    print(f"后端: {report['backend']}  模型: {report['weights']}  输入: {report['source']}")
+    print(f"模型加载 {report['load_s']:.2f}s, 预热 {report['warmup_ms']:.1f}ms/次, "
+          f"首帧 {report['first_frame_ms']:.1f}ms")
+    print(f"{'阶段':<12}{'平均':>8}{'P50':>8}{'P95':>8}{'P99':>8}{'最大':>8}  (ms)")
+    for stage, stats in report['latency_ms'].items():
+        if stats:
+            print(f"{stage:<12}{stats['mean']:>8.2f}{stats['p50']:>8.2f}{stats['p95']:>8.2f}"
+                  f"{stats['p99']:>8.2f}{stats['max']:>8.2f}")
+    rss = report['peak_rss_mb']
+    rss_text = f"{rss:.0f}MB" if rss is not None else "未知"
+    print(f"帧数 {report['frames']}, 吞吐 {report['throughput_fps']:.1f} FPS, "
+          f"CPU {report['cpu_cores_used']:.2f} 核 ({report['cpu_utilization']:.0%}), "
+          f"峰值内存 {rss_text}")
+
+
+# ===================== 录制 ===================== #
+
+def record_session(host, port, duration, output):
+    """连接小车视频端口，把原始数据流（长度 + JPEG）保存到文件"""
+    sock = socket.create_connection((host, port), timeout=5.0)
+    frames = 0
+    deadline = time.time() + duration
+    try:
+        with open(output, 'wb') as f:
+            while time.time() < deadline:
+                header = recv_all(sock, 4)
+                if header is None:
+                    break
+                size = struct.unpack('>L', header)[0]
+                data = recv_all(sock, size)
+                if data is None:
+                    break
+                f.write(header)
+                f.write(data)
+                frames += 1
+    finally:
+        sock.close()
+    return frames
+
+
+def recv_all(sock, size):
+    """接收指定大小的数据，连接断开时返回 None"""
+    data = bytearray()
+    while len(data) < size:
+        packet = sock.recv(size - len(data))
+        if not packet:
+            return None
+        data.extend(packet)
+    return bytes(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检测流水线基准测试")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help="运行基准测试")
+    run.add_argument('--source', default='test.jpeg',
+                     help="图片、图片目录、视频文件或录制的会话(.bin)")
+    run.add_argument('--backend', default='ultralytics', choices=list(DETECTOR_BACKENDS))
+    run.add_argument('--weights', default='yolov8n.pt')
+    run.add_argument('--imgsz', type=int, default=640)
+    run.add_argument('--int8', action='store_true', help="使用 INT8 量化模型（onnxruntime/openvino）")
+    run.add_argument('--threads', type=int, default=0, help="推理线程数（onnxruntime/openvino）")
+    run.add_argument('--max-frames', type=int, default=300)
+    run.add_argument('--repeat', type=int, default=100, help="单张图片时的重复次数")
+    run.add_argument('--warmup', type=int, default=2, help="预热次数")
+    run.add_argument('--output', default=None, help="保存 JSON 报告的路径")
+
+    rec = sub.add_parser('record', help="录制小车视频会话")
+    rec.add_argument('--host', default='192.168.1.100')
+    rec.add_argument('--port', type=int, default=5001)
+    rec.add_argument('--duration', type=float, default=30.0, help="录制时长（秒）")
+    rec.add_argument('--output', default='session.bin')
+
+    args = parser.parse_args()
+    if args.command == 'run' and args.threads and args.backend not in THREADED_BACKENDS:
+        parser.error(f"--threads 只支持 {' / '.join(THREADED_BACKENDS)} 后端")
+    try:
+        if args.command == 'record':
+            frames = record_session(args.host, args.port, args.duration, args.output)
+            print(f"已录制 {frames} 帧: {args.output}")
+            return
+
+        options = {}
+        if args.int8:
+            options['int8'] = True
+        if args.threads:
+            options['num_threads'] = args.threads
+        report = run_benchmark(args.source, args.backend, args.weights, args.imgsz,
+                               args.max_frames, args.repeat, args.warmup, **options)
+        print_report(report)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"报告已保存: {args.output}")
+    except Exception as e:
+        print(f"执行失败: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
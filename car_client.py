@@ -1,86 +1,94 @@
 #!/usr/bin/env python3
-import socket
-import json
-import keyboard
-import time
+"""
+简易小车客户端：视频监控窗口 + 键盘控制，控制命令通过 car_sdk.CarClient 发送
+
+用法：
+    python car_client.py <服务器IP>
+
+按键（视频窗口获得焦点时）：
+    W / S / A / D   前进 / 后退 / 左转 / 右转（松开即停车）
+    空格            停车
+    + / -           速度加减 10%
+"""
+
 import sys
 import tkinter as tk
-from tkinter import ttk
-import struct
-import cv2
-import numpy as np
-from PIL import Image, ImageTk
-import threading
-import tkinter.messagebox as messagebox
-import logging
+
+from car_sdk import CarClient  # 控制客户端统一由 car_sdk 提供，保留 car_client.CarClient 的导入路径
 from video_monitor import VideoMonitor
-from car_control import CarControl
-
-class CarClient:
-    def __init__(self, host, port):
-        self.host = host
-        self.port = port
-        self.socket = None
-        self.connected = False
-        self.current_speed = 50
-
-    def connect(self):
-        """连接到服务器"""
+
+KEY_DIRECTIONS = {'w': 'forward', 's': 'backward', 'a': 'left', 'd': 'right'}
+SPEED_STEP = 10
+
+
+def bind_keys(root, client):
+    """在窗口上绑定键盘控制"""
+    pressed = set()
+
+    def send(direction, speed=None):
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((self.host, self.port))
-            self.connected = True
-            print(f"已连接到服务器 {self.host}:{self.port}")
-            return True
-        except Exception as e:
-            print(f"连接失败: {e}")
-            return False
-
-    def send_command(self, command):
-        """发送命令到服务器"""
-        if not self.connected:
-            print("未连接到服务器")
-            return False
+            client.move(direction, speed)
+        except ConnectionError as e:
+            print(f"发送命令失败: {e}")
+
+    def on_press(event):
+        if event.widget.winfo_class() in ('Entry', 'TEntry', 'Text'):
+            return  # 在输入框中输入 IP/端口时不控制小车
+        key = event.keysym.lower()
+        if key in KEY_DIRECTIONS:
+            if key not in pressed:  # 忽略按住时的自动重复
+                pressed.add(key)
+                send(KEY_DIRECTIONS[key])
+        elif key == 'space':
+            send('stop')
+        elif key in ('plus', 'equal', 'kp_add'):
+            send_speed(min(100, client.current_speed + SPEED_STEP))
+        elif key in ('minus', 'kp_subtract'):
+            send_speed(max(0, client.current_speed - SPEED_STEP))
 
+    def on_release(event):
+        key = event.keysym.lower()
+        if key in pressed:
+            pressed.discard(key)
+            if not pressed:
+                send('stop')
+
+    def send_speed(speed):
         try:
-            # 发送命令
-            self.socket.send(json.dumps(command).encode('utf-8'))
-            
-            # 接收响应
-            response = self.socket.recv(1024).decode('utf-8')
-            response_data = json.loads(response)
-            
-            # 更新当前速度
-            if 'current_speed' in response_data:
-                self.current_speed = response_data['current_speed']
-            
-            # 打印响应消息
-            print(response_data['message'])
-            return True
-            
-        except Exception as e:
+            client.set_speed(speed)
+            print(f"当前速度: {speed}%")
+        except ConnectionError as e:
             print(f"发送命令失败: {e}")
-            self.connected = False
-            return False
 
-    def close(self):
-        """关闭连接"""
-        if self.socket:
-            self.socket.close()
-        self.connected = False
+    root.bind('<KeyPress>', on_press)
+    root.bind('<KeyRelease>', on_release)
+
 
 def main():
-    # 创建并启动视频监控窗口
-    video_monitor = VideoMonitor()
-    video_thread = threading.Thread(target=video_monitor.run)
-    video_thread.start()
-    
-    # 创建并启动车辆控制窗口
-    car_control = CarControl()
-    car_control.run()
-    
-    # 等待视频监控线程结束
-    video_thread.join()
+    host = sys.argv[1] if len(sys.argv) > 1 else "192.168.1.100"
+
+    client = CarClient(host)
+    try:
+        client.connect()
+    except Exception as e:
+        print(f"连接小车失败: {e}")
+        return
+    print(f"已连接到小车 {host}:{client.port}")
+
+    # 视频监控窗口，键盘控制绑定在同一个窗口上
+    root = tk.Tk()
+    root.title(f"小车客户端 - {host}")
+    video_monitor = VideoMonitor(root, host=host)
+    bind_keys(root, client)
+    try:
+        video_monitor.run()
+    finally:
+        try:
+            client.move('stop')
+        except ConnectionError:
+            pass
+        client.close()
+
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,28 +1,31 @@
 #!/usr/bin/env python3
-import socket
-import json
 import tkinter as tk
 from tkinter import ttk
 import threading
 import time
 import sys
-import struct
-import io
-from PIL import Image, ImageTk
 import cv2
-import numpy as np
+from frame_decode import decode_for_display
+from display_surface import DisplaySurface
+from inference_worker import LatestFrameSlot
+from car_sdk import CarClient
+
+LINK_LABELS = {'control': "控制", 'video': "视频", 'telemetry': "遥测"}
 
 class CarClientGUI:
     def __init__(self, root, host, port):
         self.root = root
         self.host = host
         self.port = port
-        self.socket = None
+        self.client = None  # 控制和视频连接（car_sdk.CarClient）
         self.connected = False
+        self.down_links = []  # 正在重连的连接（'control' / 'video' / 'telemetry'）
         self.current_speed = 50
         self.camera_running = False
         self.camera_thread = None
+        self.video_slot = LatestFrameSlot()  # 视频订阅写入的最新 JPEG
         self.frame_counter = 0  # 添加帧计数器
+        self.video_max_size = 400  # 视频显示区域最长边
         
         # 设置窗口
         self.root.title("小车远程控制系统")
@@ -129,6 +132,7 @@ class CarClientGUI:
         # 视频显示标签
         self.video_label = ttk.Label(self.video_frame)
         self.video_label.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.video_surface = DisplaySurface(self.video_label)
         
         # 键盘控制
         self.root.bind('<Key>', self.on_key_press)
@@ -186,22 +190,57 @@ class CarClientGUI:
     def connect(self):
         """连接到服务器"""
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((self.host, self.port))
+            self.client = CarClient(
+                self.host, self.port,
+                on_disconnect=lambda error: self.root.after(0, self.on_connection_lost, error),
+                on_link_change=lambda name, up, downtime: self.root.after(
+                    0, self.on_link_change, name, up, downtime))
+            self.client.connect()
+            self.client.current_speed = self.current_speed
             self.connected = True
+            self.down_links = []
             self.status_var.set(f"已连接到 {self.host}:{self.port}")
             self.connect_button['text'] = "断开"
             self.set_controls_state(True)
             self.log("已连接到服务器")
         except Exception as e:
+            if self.client:
+                self.client.close()
+                self.client = None
             self.status_var.set("连接失败")
             self.log(f"连接失败: {e}")
 
+    def on_link_change(self, name, up, downtime):
+        """连接中断/恢复（界面线程），控制和视频连接都会自动重连"""
+        label = LINK_LABELS.get(name, name)
+        if not up:
+            if name not in self.down_links:
+                self.down_links.append(name)
+            self.status_var.set(f"{label}连接中断，正在重连...")
+            self.log(f"{label}连接中断，正在重连")
+        else:
+            if name in self.down_links:
+                self.down_links.remove(name)
+            if self.down_links:
+                # 其他连接仍在重连
+                self.status_var.set(f"{LINK_LABELS.get(self.down_links[-1], self.down_links[-1])}"
+                                    f"连接中断，正在重连...")
+            elif self.connected:
+                self.status_var.set(f"已连接到 {self.host}:{self.port}")
+            self.log(f"{label}连接已恢复，耗时 {downtime * 1000:.0f}ms")
+
+    def on_connection_lost(self, error):
+        """控制连接被服务端断开（界面线程）"""
+        if self.connected:
+            self.log(f"服务器断开连接: {error or '连接关闭'}")
+            self.disconnect()
+
     def disconnect(self):
         """断开连接"""
         self.stop_camera()
-        if self.socket:
-            self.socket.close()
+        if self.client:
+            self.client.close()
+            self.client = None
         self.connected = False
         self.status_var.set("未连接")
         self.connect_button['text'] = "连接"
@@ -215,50 +254,13 @@ class CarClientGUI:
             return False
 
         try:
-            command = {'action': action}
-            if value is not None:
-                command['value'] = value
-            
-            # 发送命令
-            self.socket.send(json.dumps(command).encode('utf-8'))
-            
-            # 接收响应
-            try:
-                response = self.socket.recv(1024)
-                if not response:
-                    self.log("服务器断开连接")
-                    self.disconnect()
-                    return False
-                
-                # 尝试解码响应
-                try:
-                    response_text = response.decode('utf-8')
-                    self.log(f"收到响应: {response_text}")  # 添加调试日志
-                    response_data = json.loads(response_text)
-                except UnicodeDecodeError as e:
-                    self.log(f"接收到的数据不是有效的UTF-8编码: {e}")
-                    self.log(f"原始数据: {response}")
-                    return False
-                except json.JSONDecodeError as e:
-                    self.log(f"接收到的数据不是有效的JSON格式: {e}")
-                    self.log(f"原始数据: {response_text}")
-                    return False
-                
-                # 处理响应
-                if 'current_speed' in response_data:
-                    self.current_speed = response_data['current_speed']
-                    self.speed_var.set(self.current_speed)
-                    self.speed_label['text'] = f"{self.current_speed}%"
-                
-                if 'message' in response_data:
-                    self.log(response_data['message'])
-                return True
-                
-            except socket.error as e:
-                self.log(f"接收响应错误: {e}")
-                self.disconnect()
-                return False
-            
+            if action == 'speed':
+                self.client.set_speed(value)
+            elif action in ('servo_h', 'servo_v'):
+                self.client.servo(action[-1], value)
+            else:
+                self.client.move(action, self.current_speed)
+            return True
         except Exception as e:
             self.log(f"发送命令失败: {e}")
             self.disconnect()
@@ -333,10 +335,10 @@ class CarClientGUI:
             self.stop_camera()
 
     def start_camera(self):
-        """启动摄像头"""
+        """启动摄像头（订阅视频端口）"""
         if self.connected and not self.camera_running:
             try:
-                self.send_command('start_camera')
+                self.client.subscribe_video(self.video_slot.put)
                 self.camera_running = True
                 self.camera_button['text'] = "关闭摄像头"
                 self.camera_thread = threading.Thread(target=self.receive_video)
@@ -352,123 +354,55 @@ class CarClientGUI:
         """停止摄像头"""
         if self.connected and self.camera_running:
             try:
-                self.send_command('stop_camera')
+                self.client.unsubscribe('video')
                 self.camera_running = False
                 self.camera_button['text'] = "开启摄像头"
                 if self.camera_thread:
                     self.camera_thread.join(timeout=1.0)
-                self.video_label.configure(image='')
+                self.video_surface.clear()
                 self.log("摄像头已停止")
             except Exception as e:
                 self.log(f"停止摄像头失败: {e}")
 
     def receive_video(self):
-        """接收视频流"""
+        """解码视频订阅收到的最新一帧（解码慢于接收时跳过旧帧）"""
+        seq = self.video_slot.get()[0]
         while self.camera_running:
-            self.log(f"接受到图像")
+            result = self.video_slot.wait_newer(seq, timeout=0.5)
+            if result is None:
+                continue
+            seq, frame_data, _ = result
             try:
-                if not self.connected or self.socket is None:
-                    print("连接已断开")
+                # 按显示区域缩减解码（仅对剩余比例做缩放）
+                frame = decode_for_display(frame_data, self.video_max_size,
+                                           self.video_max_size)
+                if frame is None:
+                    print("图像解码失败")
                     continue
                     
-                # 设置接收超时
-                self.socket.settimeout(1.0)
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 
-                # 接收帧大小
-                try:
-                    size_data = b''
-                    while len(size_data) < 4:
-                        chunk = self.socket.recv(4 - len(size_data))
-                        if not chunk:
-                            print("连接已断开")
-                            continue
-                        size_data += chunk
-                    
-                    if len(size_data) != 4:
-                        print("接收帧大小数据不完整")
-                        continue
-                        
-                    size = struct.unpack('>L', size_data)[0]
-                    if size > 1e8:  # 限制最大帧大小为1e8字节
-                        print(f"帧大小异常: {size}")
-                        continue
-                    
-                except socket.error as e:
-                    print(f"接收数据错误: {e}")
-                    continue
+                # 增加帧计数
+                self.frame_counter += 1
                 
-                # 接收帧数据
-                frame_data = b''
-                remaining = size
-                while remaining > 0:
-                    try:
-                        packet = self.socket.recv(min(remaining, 8192))
-                        if not packet:
-                            print("连接已断开")
-                            break
-                        frame_data += packet
-                        remaining -= len(packet)
-                    except socket.error as e:
-                        print(f"接收数据错误: {e}")
-                        continue
+                # 每15帧打印一次日志
+                if self.frame_counter % 15 == 0:
+                    self.root.after(0, self.log, f"已接收 {self.frame_counter} 帧视频")
                 
-                if len(frame_data) == size:
-                    # 解码图像
-                    frame = cv2.imdecode(np.frombuffer(frame_data, dtype=np.uint8), cv2.IMREAD_COLOR)
-                    if frame is None:
-                        print("图像解码失败")
-                        continue
-                        
-                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    
-                    # 增加帧计数
-                    self.frame_counter += 1
-                    
-                    # 每15帧打印一次日志
-                    if self.frame_counter % 15 == 0:
-                        self.log(f"已接收 {self.frame_counter} 帧视频")
-                    
-                    # 调整大小以适应显示
-                    height, width = frame.shape[:2]
-                    max_size = 400
-                    if width > height:
-                        new_width = max_size
-                        new_height = int(height * (max_size / width))
-                    else:
-                        new_height = max_size
-                        new_width = int(width * (max_size / height))
-                    
-                    frame = cv2.resize(frame, (new_width, new_height))
-                    
-                    # 转换为PhotoImage
-                    image = Image.fromarray(frame)
-                    photo = ImageTk.PhotoImage(image=image)
-                                        
-                    # 使用after方法在主线程中更新UI
-                    self.root.after(0, lambda p=photo: self.update_video_frame(p))
-                    
-                    # 添加短暂延迟，与服务器端帧率同步
-                    time.sleep(0.05)
-                else:
-                    self.log(f"解析图像失败，已接收 {self.frame_counter} 帧视频")
-            except socket.timeout:
-                continue
+                # 使用after方法在主线程中更新UI（PhotoImage在主线程中复用）
+                self.root.after(0, lambda f=frame: self.update_video_frame(f))
             except Exception as e:
                 print(f"接收视频错误: {e}")
-                continue
-        self.log(f"跳出不接受了")
 
         self.camera_running = False
         self.frame_counter = 0  # 重置帧计数器
         self.root.after(0, lambda: self.camera_button.configure(text="开启摄像头"))
         self.root.after(0, lambda: self.log("视频流已停止"))
 
-    def update_video_frame(self, photo):
+    def update_video_frame(self, frame):
         """在主线程中更新视频帧"""
         if self.camera_running:
-            self.video_label.configure(image=photo)
-            self.video_label.image = photo  # 保持引用
-            self.log(f"完成显示")
+            self.video_surface.show(frame)
 
     def log(self, message):
         """添加日志"""
@@ -478,13 +412,17 @@ class CarClientGUI:
     def update_status(self):
         """更新状态线程"""
         while self.running:
-            if self.connected:
+            client = self.client
+            if self.connected and client and not self.down_links:
                 try:
-                    # 发送心跳包
-                    self.socket.send(json.dumps({'action': 'ping'}).encode('utf-8'))
-                    self.socket.recv(1024)
-                except:
-                    self.root.after(0, self.disconnect)
+                    # 心跳包，同时显示往返时延
+                    rtt = client.ping()
+                    self.root.after(0, self.status_var.set,
+                                    f"已连接到 {self.host}:{self.port}  延迟 {rtt * 1000:.1f}ms")
+                except Exception:
+                    # 开启自动重连时由客户端库检测断线并重连，否则按断开处理
+                    if not client.core.auto_reconnect:
+                        self.root.after(0, self.on_connection_lost, None)
             time.sleep(1)
 
     def on_closing(self):
@@ -1,10 +1,11 @@
 import tkinter as tk
 from tkinter import ttk
 import logging
-import json
-import socket
 import threading
 import time
+from gui_log import BatchedTextHandler
+from command_scheduler import CommandScheduler
+from car_sdk import CarClient
 
 class CarControlGUI:
     def __init__(self, root, host="192.168.1.100", port=5000):
@@ -25,10 +26,14 @@ class CarControlGUI:
         # 初始化变量
         self.connected = False
         self.current_speed = 50  # 默认速度50%
-        self.socket = None
+        self.client = None  # 控制连接（car_sdk.CarClient）
         self.last_command_time = 0
         self.command_interval = 0.1  # 命令发送间隔（秒）
         
+        # 运动、速度和舵机命令由调度器按固定频率合并发送
+        self.scheduler = CommandScheduler(self.root, self.send_scheduled)
+        self.scheduler.set_speed(self.current_speed)
+        
         # 添加键盘状态跟踪
         self.pressed_keys = set()
         self.key_command_active = False  # 当前是否有按键命令在执行
@@ -190,22 +195,11 @@ class CarControlGUI:
         widget.bind('<Leave>', leave)
 
     def setup_logging(self):
-        class TextHandler(logging.Handler):
-            def __init__(self, text_widget):
-                super().__init__()
-                self.text_widget = text_widget
-
-            def emit(self, record):
-                msg = self.format(record)
-                def append():
-                    self.text_widget.insert(tk.END, msg + '\n')
-                    self.text_widget.see(tk.END)
-                self.text_widget.after(0, append)
-
+        # 日志先进入队列，由界面线程定时批量写入，避免频繁命令日志塞满事件队列
         formatter = logging.Formatter('%(asctime)s - %(message)s', 
                                    datefmt='%H:%M:%S')
         
-        text_handler = TextHandler(self.log_text)
+        text_handler = BatchedTextHandler(self.log_text)
         text_handler.setFormatter(formatter)
         
         self.logger = logging.getLogger('CarControl')
@@ -368,6 +362,7 @@ class CarControlGUI:
         """处理速度变化"""
         try:
             self.current_speed = int(float(value))
+            self.scheduler.set_speed(self.current_speed)
             self.speed_label.configure(text=f"当前速度: {self.current_speed}%")
         except Exception as e:
             self.logger.error(f"更新速度显示失败: {e}")
@@ -385,35 +380,39 @@ class CarControlGUI:
             host = self.ip_entry.get()
             port = int(self.port_entry.get())
             
-            # 创建socket连接
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.settimeout(5)  # 设置超时时间
+            # 创建控制连接，连接断开时回到界面线程处理
+            self.client = CarClient(
+                host, port,
+                on_disconnect=lambda error: self.root.after(0, self.on_connection_lost, error),
+                on_link_change=lambda name, up, downtime: self.root.after(
+                    0, self.on_link_change, name, up, downtime))
             
             self.logger.info(f"正在连接到 {host}:{port}")
-            self.socket.connect((host, port))
+            self.client.connect()
             
             # 连接成功
             self.connected = True
             self.connect_button.configure(text="断开")
             self.logger.info(f"已连接到 {host}:{port}")
             
-            # 启动心跳检测
+            # 启动心跳检测和命令调度
             self.start_heartbeat()
+            self.scheduler.start()
             
             # 初始化相机位置
             self.init_camera_position()
             
         except Exception as e:
             self.logger.error(f"连接失败: {e}")
-            if self.socket:
-                self.socket.close()
-                self.socket = None
+            if self.client:
+                self.client.close()
+                self.client = None
             self.connected = False
 
     def start_heartbeat(self):
         """启动心跳检测"""
         def heartbeat():
-            if self.connected and hasattr(self, 'socket') and self.socket:
+            if self.connected and self.client:
                 try:
                     # 发送心跳包
                     self.send_command('heartbeat')
@@ -427,7 +426,7 @@ class CarControlGUI:
 
     def send_command(self, command):
         """发送控制命令"""
-        if not self.connected or not self.socket:
+        if not self.connected or not self.client:
             self.logger.error("未连接到服务器")
             return
             
@@ -437,66 +436,89 @@ class CarControlGUI:
                 'command': command,
                 'speed': self.current_speed
             }
-            
-            # 转换为JSON并发送
-            json_data = json.dumps(data)
-            self.logger.info(f"发送命令: {json_data}")
-            
-            # 确保发送完整的数据
-            self.socket.sendall(json_data.encode('utf-8'))
+            self.logger.info(f"发送命令: {data}")
+            self.client.send_command(data)
             
         except Exception as e:
             self.logger.error(f"发送命令失败: {e}")
             self.disconnect()
 
+    def send_scheduled(self, commands):
+        """发送调度器合并后的一个周期的命令"""
+        if not self.connected or not self.client:
+            return
+        try:
+            self.logger.debug(f"发送命令: {commands}")  # 每个周期都会调用，汇总见断开时的调度统计
+            self.client.send_commands(commands)
+        except Exception as e:
+            self.logger.error(f"发送命令失败: {e}")
+            self.disconnect()
+
     def move_forward(self):
         """前进"""
         if self.connected:
             self.logger.info("前进")
-            self.send_command('forward')
+            self.scheduler.set_drive('forward')
 
     def move_backward(self):
         """后退"""
         if self.connected:
             self.logger.info("后退")
-            self.send_command('backward')
+            self.scheduler.set_drive('backward')
 
     def turn_left(self):
         """左转"""
         if self.connected:
             self.logger.info("左转")
-            self.send_command('left')
+            self.scheduler.set_drive('left')
 
     def turn_right(self):
         """右转"""
         if self.connected:
             self.logger.info("右转")
-            self.send_command('right')
+            self.scheduler.set_drive('right')
 
     def stop(self):
         """停止"""
         if self.connected:
             self.logger.info("停止")
-            self.send_command('stop')
+            self.scheduler.set_drive('stop')
+
+    def on_link_change(self, name, up, downtime):
+        """连接中断/恢复（界面线程），客户端库会自动重连并重放运动、速度和舵机状态"""
+        if not up:
+            self.logger.warning("连接中断，正在重连...")
+        else:
+            self.logger.info(f"已重连（{downtime * 1000:.0f}ms），已恢复运动、速度和舵机状态")
+
+    def on_connection_lost(self, error):
+        """控制连接被服务端断开（界面线程）"""
+        if self.connected:
+            self.logger.error(f"连接已断开: {error or '服务端关闭连接'}")
+            self.disconnect()
 
     def disconnect(self):
         """断开连接"""
         if self.connected:
+            self.scheduler.stop()
+            self.logger.info(f"命令调度统计: {self.scheduler.stats()}")
+            if self.client:
+                self.logger.info(f"连接统计: {self.client.stats()}")
             try:
                 # 发送停止命令
-                if self.socket:
+                if self.client and self.client.connected:
                     try:
                         self.send_command('stop')
                     except:
                         pass
                 
-                # 关闭socket
-                if self.socket:
+                # 关闭连接
+                if self.client:
                     try:
-                        self.socket.close()
+                        self.client.close()
                     except:
                         pass
-                    self.socket = None
+                    self.client = None
                 
                 self.connected = False
                 self.connect_button.configure(text="连接")
@@ -561,13 +583,13 @@ class CarControlGUI:
                 except:
                     pass
             
-            # 关闭socket连接
-            if hasattr(self, 'socket') and self.socket:
+            # 关闭控制连接
+            if self.client:
                 try:
-                    self.socket.close()
+                    self.client.close()
                 except:
                     pass
-                self.socket = None
+                self.client = None
             
             print("资源清理完成")
             
@@ -587,16 +609,16 @@ class CarControlGUI:
         if not self.connected:
             return
         
-        try:
-            data = {
-                'command': 'servo',
-                'type': servo_type,
-                'angle': angle
-            }
-            self.logger.info(f"发送舵机命令: {data}")
-            self.send_command_raw(data)
-        except Exception as e:
-            self.logger.error(f"发送舵机命令失败: {e}")
+        self.scheduler.set_servo(servo_type, angle)
+
+    def set_camera_angle(self, servo_type, angle):
+        """云台自动跟踪设置摄像头角度（须在界面线程调用）"""
+        if servo_type == 'h':
+            self.horizontal_angle = angle
+        else:
+            self.vertical_angle = angle
+        self.update_servo_labels()
+        self.scheduler.set_servo(servo_type, angle)
 
     def reset_camera(self):
         """复位摄像头位置"""
@@ -612,13 +634,11 @@ class CarControlGUI:
 
     def send_command_raw(self, data):
         """发送原始命令数据"""
-        if not self.connected or not self.socket:
+        if not self.connected or not self.client:
             return
             
         try:
-            # 转换为JSON并发送
-            json_data = json.dumps(data)
-            self.socket.sendall(json_data.encode('utf-8'))
+            self.client.send_command(data)
         except Exception as e:
             self.logger.error(f"发送命令失败: {e}")
             self.disconnect()
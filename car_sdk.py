@@ -0,0 +1,647 @@
+#!/usr/bin/env python3
+"""
+小车客户端库：统一的控制、视频和遥测连接
+
+协议（与 car_server.py 一致）：
+    控制端口 5000  客户端发送 JSON 对象 {'command': ..., ...}，可连续发送（每条以换行结尾）；
+                   带 'id' 字段的命令执行完成后服务端回复一行 JSON {'ack': id, 'ok': true/false}
+                   （机械臂命令 arm_* 在动作结束后才确认，期间其他命令照常处理）
+    视频端口 5001  4字节大端长度 + JPEG
+    遥测端口 5002  每行一条 JSON
+
+结构：
+    AsyncCarClient  asyncio 核心：连接、分帧、流水线发送（不等上一条确认就发下一条）、
+                    确认匹配、视频订阅和遥测订阅
+    CarClient       同步接口：在后台线程运行事件循环，供 Tk 界面和脚本直接调用；
+                    回调（视频帧、遥测、断开）在后台线程中执行，界面需要自行切回主线程
+
+断线重连（auto_reconnect=True，默认开启）：
+    控制连接读到 EOF、出错或心跳超时，以及视频连接中断或长时间收不到数据时，按 Backoff
+    自动重连：第一次立即重试，之后指数退避并加随机抖动。控制连接恢复后重放最后的运动、速度和
+    舵机状态；每次重连耗时记录在 reconnect_times 中。重连期间发送的控制命令只更新状态，
+    连接恢复后以最新状态重放。
+
+基准测试（流水线 ping，统计每秒命令数和往返时延）：
+    python car_sdk.py bench --host 192.168.1.100 --count 1000 --window 16
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from telemetry import TELEMETRY_PORT
+
+CONTROL_PORT = 5000
+VIDEO_PORT = 5001
+MOTION_COMMANDS = ('forward', 'backward', 'left', 'right', 'stop', 'drive')
+
+
+class CommandError(Exception):
+    """服务端确认命令执行失败"""
+
+
+def encode_command(command):
+    """命令 -> 发送的字节（每条一行）"""
+    return (json.dumps(command) + '\n').encode('utf-8')
+
+
+class Backoff:
+    """带抖动的指数退避
+
+    第一次失败立即重试（短暂丢包时毫秒级恢复），之后延迟为 base * factor^(n-1)，
+    乘以 [1 - jitter, 1 + jitter] 的随机系数（避免多个客户端同时重连），最长 max_delay 秒。
+
+    参数:
+        base: 第二次重试的延迟（秒）
+        factor: 每次失败延迟的倍数
+        max_delay: 最长延迟（秒）
+        jitter: 随机抖动比例
+    """
+
+    def __init__(self, base=0.05, factor=2.0, max_delay=2.0, jitter=0.5):
+        self.base = base
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.attempts = 0
+
+    def next_delay(self):
+        """下一次重试前等待的秒数"""
+        self.attempts += 1
+        if self.attempts == 1:
+            return 0.0
+        delay = min(self.max_delay, self.base * self.factor ** (self.attempts - 2))
+        return delay * (1 + self.jitter * (2 * random.random() - 1))
+
+    def reset(self):
+        self.attempts = 0
+
+
+def connect_with_backoff(host, port, keep_trying, backoff=None, timeout=2.0):
+    """按退避策略反复尝试建立 TCP 连接（阻塞），keep_trying() 返回 False 时放弃
+
+    返回 (socket, 重连耗时秒) ，放弃时返回 (None, 耗时)。
+    """
+    backoff = backoff or Backoff()
+    start = time.monotonic()
+    while keep_trying():
+        time.sleep(backoff.next_delay())
+        if not keep_trying():
+            break
+        try:
+            sock = socket.create_connection((host, port), timeout=timeout)
+        except OSError:
+            continue
+        return sock, time.monotonic() - start
+    return None, time.monotonic() - start
+
+
+class AsyncCarClient:
+    """asyncio 客户端核心（所有方法须在同一个事件循环中调用）
+
+    参数:
+        host: 小车IP
+        port / video_port / telemetry_port: 控制、视频、遥测端口
+        connect_timeout: 连接超时（秒）
+        on_disconnect: 控制连接断开且不再重连时的回调 on_disconnect(error)
+        auto_reconnect: 断线后自动重连
+        on_link_change: 连接状态变化回调 on_link_change(name, up, downtime)，
+            name 为 'control' / 'video' / 'telemetry'，恢复时 downtime 为重连耗时（秒）
+        keepalive_interval: 控制连接心跳间隔（秒），0 表示不发心跳
+        keepalive_timeout: 心跳确认超时（秒），超时视为断线
+        stall_timeout: 视频连接超过该时间收不到数据视为断线（秒）
+    """
+
+    def __init__(self, host, port=CONTROL_PORT, video_port=VIDEO_PORT,
+                 telemetry_port=TELEMETRY_PORT, connect_timeout=5.0, on_disconnect=None,
+                 auto_reconnect=True, on_link_change=None, keepalive_interval=1.0,
+                 keepalive_timeout=3.0, stall_timeout=3.0):
+        self.host = host
+        self.port = port
+        self.video_port = video_port
+        self.telemetry_port = telemetry_port
+        self.connect_timeout = connect_timeout
+        self.on_disconnect = on_disconnect
+        self.auto_reconnect = auto_reconnect
+        self.on_link_change = on_link_change
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_timeout = keepalive_timeout
+        self.stall_timeout = stall_timeout
+
+        self._reader = None
+        self._writer = None
+        self._ack_task = None
+        self._keepalive_task = None
+        self._reconnect_task = None
+        self._closing = False
+        self._pending = {}  # 命令ID -> Future
+        self._ids = itertools.count(1)
+        self._subscriptions = {}  # 'video' / 'telemetry' -> (task, [writer])
+
+        # 最后的控制状态，重连后重放：motion（运动命令）、speed、servo_h、servo_v
+        self.last_state = {}
+        self.last_rtt = None  # 最近一次 ping（含心跳）的往返时延（秒），断线时清空
+
+        # 统计
+        self.commands_sent = 0
+        self.acks_received = 0
+        self.video_frames = 0
+        self.video_bytes = 0
+        self.telemetry_messages = 0
+        self.reconnect_times = {'control': [], 'video': [], 'telemetry': []}
+
+    @property
+    def connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    @property
+    def reconnecting(self):
+        return self._reconnect_task is not None and not self._reconnect_task.done()
+
+    async def _open(self, port):
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, port), self.connect_timeout)
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            # 控制命令很小，关闭 Nagle 算法避免合并延迟
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return reader, writer
+
+    async def connect(self):
+        """连接控制端口"""
+        self._closing = False
+        self._reader, self._writer = await self._open(self.port)
+        self._start_control_tasks()
+
+    def _start_control_tasks(self):
+        self._ack_task = asyncio.ensure_future(self._read_acks())
+        if self.auto_reconnect and self.keepalive_interval > 0:
+            self._keepalive_task = asyncio.ensure_future(self._keepalive())
+
+    async def close(self):
+        """关闭所有连接，未确认的命令以 ConnectionError 结束"""
+        self._closing = True
+        for name in list(self._subscriptions):
+            await self.unsubscribe(name)
+        for task in (self._ack_task, self._keepalive_task, self._reconnect_task):
+            if task is not None:
+                task.cancel()
+        self._ack_task = self._keepalive_task = self._reconnect_task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._fail_pending(ConnectionError("连接已关闭"))
+
+    def _fail_pending(self, error):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    def _notify_link(self, name, up, downtime=None):
+        if self.on_link_change is not None:
+            self.on_link_change(name, up, downtime)
+
+    async def _read_acks(self):
+        """读取服务端确认，按命令ID唤醒等待的调用"""
+        error = None
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                future = self._pending.pop(message.get('ack'), None)
+                if future is None or future.done():
+                    continue
+                self.acks_received += 1
+                if message.get('ok', True):
+                    future.set_result(message)
+                else:
+                    future.set_exception(CommandError(message.get('error', '命令执行失败')))
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            error = e
+        self._ack_task = None
+        self._link_lost(error)
+
+    async def _keepalive(self):
+        """定时 ping，超时视为断线（Wi-Fi 中断时 TCP 可能很久都不报错）"""
+        try:
+            while True:
+                await asyncio.sleep(self.keepalive_interval)
+                try:
+                    await self.ping(self.keepalive_timeout)
+                except asyncio.TimeoutError as e:
+                    self._keepalive_task = None
+                    self._link_lost(e)
+                    return
+                except (ConnectionError, CommandError):
+                    pass
+        except asyncio.CancelledError:
+            pass
+
+    def _link_lost(self, error):
+        """控制连接断开：关闭旧连接，自动重连或通知调用方"""
+        if self._closing or self.reconnecting:
+            return
+        for task in (self._ack_task, self._keepalive_task):
+            if task is not None:
+                task.cancel()
+        self._ack_task = self._keepalive_task = None
+        self.last_rtt = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._fail_pending(ConnectionError("控制连接已断开"))
+        if self.auto_reconnect:
+            self._notify_link('control', False)
+            self._reconnect_task = asyncio.ensure_future(self._reconnect_control())
+        elif self.on_disconnect is not None:
+            self.on_disconnect(error)
+
+    async def _reconnect_control(self):
+        """按退避策略重连控制端口，成功后重放最后的控制状态"""
+        backoff = Backoff()
+        start = time.monotonic()
+        while not self._closing:
+            await asyncio.sleep(backoff.next_delay())
+            try:
+                self._reader, self._writer = await self._open(self.port)
+            except (OSError, asyncio.TimeoutError):
+                continue
+            self._writer.write(b''.join(encode_command(c) for c in self.replay_commands()))
+            downtime = time.monotonic() - start
+            self.reconnect_times['control'].append(downtime)
+            self._start_control_tasks()
+            self._notify_link('control', True, downtime)
+            return
+
+    # ---------- 控制状态 ---------- #
+
+    def record(self, command):
+        """记录命令对应的控制状态（用于重连后重放）"""
+        cmd = command.get('command')
+        if cmd in MOTION_COMMANDS:
+            self.last_state['motion'] = {k: v for k, v in command.items() if k != 'id'}
+        if 'speed' in command:
+            self.last_state['speed'] = command['speed']
+        if cmd == 'servo':
+            self.last_state[f"servo_{command.get('type')}"] = {
+                'command': 'servo', 'type': command.get('type'), 'angle': command.get('angle')}
+
+    def replay_commands(self):
+        """重放最后控制状态的命令列表：先舵机，再带速度的运动命令"""
+        state = self.last_state
+        commands = [state[key] for key in ('servo_h', 'servo_v') if key in state]
+        motion = state.get('motion')
+        if motion is not None:
+            motion = dict(motion)
+            if motion['command'] != 'drive' and 'speed' in state:
+                motion['speed'] = state['speed']
+            commands.append(motion)
+        elif 'speed' in state:
+            commands.append({'command': 'speed', 'speed': state['speed']})
+        return commands
+
+    # ---------- 发送 ---------- #
+
+    def send_nowait(self, command, ack=False):
+        """立即写入一条命令，不等待发送完成；ack=True 时返回等待确认的 Future"""
+        if not self.connected:
+            raise ConnectionError("未连接到小车")
+        future = None
+        if ack:
+            if 'id' not in command:
+                command = dict(command, id=next(self._ids))
+            future = asyncio.get_event_loop().create_future()
+            self._pending[command['id']] = future
+        self.record(command)
+        self._writer.write(encode_command(command))
+        self.commands_sent += 1
+        return future
+
+    def submit(self, commands):
+        """记录状态并一次写入多条命令（不要求确认）；重连期间只更新状态，恢复后重放"""
+        for command in commands:
+            self.record(command)
+        if not self.connected:
+            return
+        self._writer.write(b''.join(encode_command(command) for command in commands))
+        self.commands_sent += len(commands)
+
+    async def send(self, command, timeout=2.0):
+        """发送命令并等待服务端确认，返回确认消息"""
+        command = dict(command, id=next(self._ids))
+        future = self.send_nowait(command, ack=True)
+        await self._writer.drain()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(command['id'], None)
+
+    async def ping(self, timeout=2.0):
+        """往返时延（秒）"""
+        start = time.perf_counter()
+        await self.send({'command': 'ping'}, timeout)
+        self.last_rtt = time.perf_counter() - start
+        return self.last_rtt
+
+    async def benchmark(self, count=1000, window=16, timeout=5.0):
+        """流水线发送 count 条 ping，最多 window 条未确认，统计每秒命令数和往返时延"""
+        rtts = []
+        semaphore = asyncio.Semaphore(window)
+
+        async def one():
+            async with semaphore:
+                rtts.append(await self.ping(timeout))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(count)))
+        elapsed = time.perf_counter() - start
+        rtt_ms = np.asarray(rtts) * 1000
+        return {
+            'commands': count,
+            'window': window,
+            'elapsed_s': elapsed,
+            'commands_per_s': count / elapsed if elapsed > 0 else 0.0,
+            'rtt_ms': {
+                'mean': float(rtt_ms.mean()),
+                'p50': float(np.percentile(rtt_ms, 50)),
+                'p95': float(np.percentile(rtt_ms, 95)),
+                'p99': float(np.percentile(rtt_ms, 99)),
+                'max': float(rtt_ms.max()),
+            },
+        }
+
+    # ---------- 订阅 ---------- #
+
+    async def subscribe_video(self, callback):
+        """订阅视频流，每帧调用 callback(jpeg_bytes)"""
+        async def session(reader):
+            while True:
+                header = await asyncio.wait_for(reader.readexactly(4), self.stall_timeout)
+                size = struct.unpack('>L', header)[0]
+                data = await asyncio.wait_for(reader.readexactly(size), self.stall_timeout)
+                self.video_frames += 1
+                self.video_bytes += size + 4
+                callback(data)
+
+        await self._subscribe('video', self.video_port, session)
+
+    async def subscribe_telemetry(self, callback):
+        """订阅遥测通道，每条消息调用 callback(message_dict)"""
+        async def session(reader):
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.telemetry_messages += 1
+                callback(message)
+
+        await self._subscribe('telemetry', self.telemetry_port, session)
+
+    async def _subscribe(self, name, port, session):
+        """建立订阅连接（首次连接失败直接抛出），断开后按退避策略重连"""
+        reader, writer = await self._open(port)
+        writers = [writer]
+
+        async def run():
+            nonlocal reader
+            try:
+                while True:
+                    try:
+                        await session(reader)
+                    except (asyncio.IncompleteReadError, asyncio.TimeoutError, OSError):
+                        pass  # 连接中断或长时间无数据
+                    except Exception as e:
+                        print(f"{name} 订阅出错: {e}")
+                    writers[0].close()
+                    if not self.auto_reconnect or self._closing:
+                        return
+                    self._notify_link(name, False)
+                    backoff = Backoff()
+                    start = time.monotonic()
+                    while True:
+                        await asyncio.sleep(backoff.next_delay())
+                        try:
+                            reader, writers[0] = await self._open(port)
+                            break
+                        except (OSError, asyncio.TimeoutError):
+                            continue
+                    downtime = time.monotonic() - start
+                    self.reconnect_times[name].append(downtime)
+                    self._notify_link(name, True, downtime)
+            except asyncio.CancelledError:
+                pass
+            finally:
+                writers[0].close()
+
+        self._subscriptions[name] = (asyncio.ensure_future(run()), writers)
+
+    async def unsubscribe(self, name):
+        """取消订阅（'video' 或 'telemetry'）"""
+        subscription = self._subscriptions.pop(name, None)
+        if subscription is None:
+            return
+        task, writers = subscription
+        task.cancel()
+        writers[0].close()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+class CarClient:
+    """同步客户端：在后台线程运行 AsyncCarClient 的事件循环
+
+    控制命令默认只写入不等待（不阻塞界面），需要确认时用 wait_ack=True 或 ping()。
+    参数与 AsyncCarClient 相同，回调在后台线程调用。
+    """
+
+    def __init__(self, host, port=CONTROL_PORT, video_port=VIDEO_PORT,
+                 telemetry_port=TELEMETRY_PORT, connect_timeout=5.0, on_disconnect=None,
+                 auto_reconnect=True, on_link_change=None, **options):
+        self.host = host
+        self.port = port
+        self.current_speed = 50
+        self.core = AsyncCarClient(host, port, video_port, telemetry_port, connect_timeout,
+                                   on_disconnect, auto_reconnect, on_link_change, **options)
+        self._loop = None
+        self._thread = None
+
+    @property
+    def connected(self):
+        return self._loop is not None and self.core.connected
+
+    @property
+    def reconnecting(self):
+        return self._loop is not None and self.core.reconnecting
+
+    @property
+    def last_rtt(self):
+        """最近一次心跳/ping 的往返时延（秒），未连接时为 None"""
+        return self.core.last_rtt if self.connected else None
+
+    def _run(self, coro, timeout=None):
+        """在后台事件循环中执行协程并等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def connect(self):
+        """连接控制端口，失败时抛出异常"""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever,
+                                            name=f"CarClient-{self.host}")
+            self._thread.daemon = True
+            self._thread.start()
+        self._run(self.core.connect(), self.core.connect_timeout + 1.0)
+
+    def close(self):
+        """关闭所有连接并停止后台线程"""
+        if self._loop is None:
+            return
+        try:
+            self._run(self.core.close(), 2.0)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=1.0)
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+
+    # ---------- 控制命令 ---------- #
+
+    def send_command(self, command, wait_ack=False, timeout=2.0):
+        """发送一条命令（dict）；wait_ack=True 时等待服务端确认并返回确认消息
+
+        重连期间不等待确认的命令只更新控制状态，连接恢复后重放。
+        """
+        if wait_ack:
+            if not self.connected:
+                raise ConnectionError("未连接到小车")
+            return self._run(self.core.send(command, timeout), timeout + 1.0)
+        self.send_commands([command])
+        return None
+
+    def send_commands(self, commands):
+        """一次写入多条命令（例如命令调度器一个周期内的全部命令）"""
+        if not self.connected and not self.reconnecting:
+            raise ConnectionError("未连接到小车")
+        self._loop.call_soon_threadsafe(self.core.submit, list(commands))
+
+    def move(self, direction, speed=None):
+        """运动命令：forward / backward / left / right / stop"""
+        if speed is not None:
+            self.current_speed = speed
+        self.send_command({'command': direction, 'speed': self.current_speed})
+
+    def set_speed(self, speed):
+        self.current_speed = speed
+        self.send_command({'command': 'speed', 'speed': speed})
+
+    def servo(self, servo_type, angle):
+        """舵机命令：servo_type 为 'h'（水平）或 'v'（垂直）"""
+        self.send_command({'command': 'servo', 'type': servo_type, 'angle': angle})
+
+    def drive(self, left, right):
+        """差速驱动：左右轮速度 -100..100"""
+        self.send_command({'command': 'drive', 'left': left, 'right': right})
+
+    def arm(self, action, wait=True, timeout=10.0, **params):
+        """机械臂命令：action 为 joint / pose / trajectory / linear / gripper / home / stop，参数见 arm_worker.py
+
+        wait=True 时等待动作完成并返回确认消息（含时序报告），被新动作抢占时抛出 CommandError；
+        timeout 需大于动作时长。
+        """
+        command = dict(params, command=f'arm_{action}')
+        return self.send_command(command, wait_ack=wait, timeout=timeout)
+
+    def ping(self, timeout=2.0):
+        """往返时延（秒）"""
+        return self._run(self.core.ping(timeout), timeout + 1.0)
+
+    def benchmark(self, count=1000, window=16):
+        return self._run(self.core.benchmark(count, window))
+
+    # ---------- 订阅 ---------- #
+
+    def subscribe_video(self, callback):
+        """订阅视频流，callback(jpeg_bytes) 在后台线程调用"""
+        self._ensure_loop()
+        self._run(self.core.subscribe_video(callback), self.core.connect_timeout + 1.0)
+
+    def subscribe_telemetry(self, callback):
+        """订阅遥测，callback(message_dict) 在后台线程调用"""
+        self._ensure_loop()
+        self._run(self.core.subscribe_telemetry(callback), self.core.connect_timeout + 1.0)
+
+    def unsubscribe(self, name):
+        if self._loop is not None:
+            self._run(self.core.unsubscribe(name), 2.0)
+
+    def _ensure_loop(self):
+        if self._loop is None:
+            raise ConnectionError("请先调用 connect()")
+
+    def stats(self):
+        core = self.core
+        report = {
+            'commands_sent': core.commands_sent,
+            'acks_received': core.acks_received,
+            'video_frames': core.video_frames,
+            'video_bytes': core.video_bytes,
+            'telemetry_messages': core.telemetry_messages,
+        }
+        for name, times in core.reconnect_times.items():
+            if times:
+                report[f'{name}_reconnects'] = len(times)
+                report[f'{name}_reconnect_ms'] = {'last': times[-1] * 1000,
+                                                  'mean': sum(times) / len(times) * 1000,
+                                                  'max': max(times) * 1000}
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="小车客户端库")
+    sub = parser.add_subparsers(dest='command', required=True)
+    bench = sub.add_parser('bench', help="控制通道基准测试（每秒命令数和往返时延）")
+    bench.add_argument('--host', default='192.168.1.100')
+    bench.add_argument('--port', type=int, default=CONTROL_PORT)
+    bench.add_argument('--count', type=int, default=1000, help="发送的命令数")
+    bench.add_argument('--window', type=int, default=16, help="最多未确认的命令数（1 为逐条等待）")
+    args = parser.parse_args()
+
+    client = CarClient(args.host, args.port, auto_reconnect=False)
+    try:
+        client.connect()
+        report = client.benchmark(args.count, args.window)
+    finally:
+        client.close()
+    rtt = report['rtt_ms']
+    print(f"命令 {report['commands']} 条，窗口 {report['window']}，耗时 {report['elapsed_s']:.2f}s，"
+          f"{report['commands_per_s']:.0f} 条/秒")
+    print(f"往返时延 (ms): 平均 {rtt['mean']:.2f}  P50 {rtt['p50']:.2f}  P95 {rtt['p95']:.2f}  "
+          f"P99 {rtt['p99']:.2f}  最大 {rtt['max']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import RPi.GPIO as GPIO
+import argparse
 import socket
 import json
 import threading
@@ -38,7 +39,10 @@ camera_running = False  # 添加摄像头运行状态标志
 camera_thread = None  # 添加摄像头线程变量
 
 class CarServer:
-    def __init__(self, control_port=5000, video_port=5001):
+    def __init__(self, control_port=5000, video_port=5001, edge_detection=False,
+                 detector_backend='onnxruntime', detector_weights='yolov8n.pt',
+                 detector_imgsz=320, telemetry_port=5002, preview_fps=5,
+                 arm_port=None, arm_id='my_follower_arm'):
         # 舵机相关引脚和参数
         self.PIN_SERVO_HORIZONTAL = SERVO_H  # 水平舵机
         self.PIN_SERVO_VERTICAL = SERVO_V    # 垂直舵机
@@ -61,6 +65,25 @@ class CarServer:
         self.frame_interval = 1/30  # 30 FPS
         self.video_running = False
         self.video_thread = None
+        
+        # 车端检测配置：开启后在小车上推理，检测结果经遥测通道发送，视频降为低帧率预览
+        self.edge_detection = edge_detection
+        self.detector_backend = detector_backend
+        self.detector_weights = detector_weights
+        self.detector_imgsz = detector_imgsz
+        self.telemetry_port = telemetry_port
+        self.preview_interval = 1.0 / preview_fps if preview_fps > 0 else self.frame_interval
+        self.detector = None
+        self.frame_slot = None
+        self.inference_worker = None
+        self.telemetry = None
+        
+        # 机械臂（可选）：命令由独立的工作线程执行，不阻塞控制连接
+        self.arm_port = arm_port
+        self.arm_id = arm_id
+        self.arm = None
+        self.arm_worker = None
+        
         # 初始化GPIO和电机控制
         self.setup_gpio()
 
@@ -85,6 +108,59 @@ class CarServer:
             print(f"相机初始化失败: {e}")
             self.camera = None
 
+    def setup_edge_detection(self):
+        """加载车端检测模型并启动推理线程和遥测服务"""
+        try:
+            from detectors import create_detector
+            from inference_worker import InferenceWorker, LatestFrameSlot
+            from telemetry import TelemetryServer
+            
+            print(f"正在加载车端检测模型: {self.detector_backend} {self.detector_weights}")
+            self.detector = create_detector(self.detector_backend, self.detector_weights,
+                                            imgsz=self.detector_imgsz)
+            self.class_ids = {name: class_id
+                              for class_id, name in self.detector.class_names.items()}
+            
+            self.telemetry = TelemetryServer(self.telemetry_port)
+            self.telemetry.start(hello={'t': 'classes', 'names': self.detector.class_names})
+            
+            # 采集线程只写入最新帧，推理线程总是取最新帧
+            self.frame_slot = LatestFrameSlot()
+            self.inference_worker = InferenceWorker(self.detector.detect, self.frame_slot,
+                                                    name="EdgeDetection",
+                                                    on_result=self.publish_detections)
+            self.inference_worker.start()
+            print("车端检测已启动")
+        except Exception as e:
+            print(f"车端检测启动失败，回退为普通视频流: {e}")
+            self.edge_detection = False
+
+    def setup_arm(self):
+        """连接机械臂并启动机械臂命令工作线程"""
+        try:
+            from arm import ArmController
+            from arm_worker import ArmCommandWorker
+            
+            self.arm = ArmController(port=self.arm_port, robot_id=self.arm_id)
+            self.arm_worker = ArmCommandWorker(self.arm)
+            self.arm_worker.start()
+            print(f"机械臂已连接: {self.arm_port}")
+        except Exception as e:
+            print(f"机械臂初始化失败，机械臂命令不可用: {e}")
+            self.arm = None
+            self.arm_worker = None
+
+    def publish_detections(self, detections, seq, ts, infer_time):
+        """把一次推理结果编码为紧凑消息并发送到遥测通道"""
+        from telemetry import encode_detections
+        
+        frame = self.frame_slot.get()[1]
+        if frame is None:
+            return
+        frame_size = (frame.shape[1], frame.shape[0])
+        self.telemetry.broadcast(encode_detections(detections, seq, ts, frame_size,
+                                                   self.class_ids, infer_time))
+
     def start(self):
         """启动服务器"""
         try:
@@ -104,6 +180,14 @@ class CarServer:
             
             self.running = True
             
+            # 车端检测
+            if self.edge_detection:
+                self.setup_edge_detection()
+            
+            # 机械臂
+            if self.arm_port:
+                self.setup_arm()
+            
             # 启动事件循环
             self.event_thread = threading.Thread(target=self.event_loop)
             self.event_thread.daemon = True
@@ -162,6 +246,7 @@ class CarServer:
         video_accept_thread.start()
         
         last_frame_time = 0
+        last_preview_time = 0
         
         while self.video_running:
             try:
@@ -176,9 +261,21 @@ class CarServer:
                 if not ret:
                     print("读取视频帧失败")
                     continue
+                last_frame_time = current_time
+                
+                if self.edge_detection:
+                    # 每一帧都送入推理，视频只按预览帧率发送低分辨率画面
+                    self.frame_slot.put(frame, ts=current_time)
+                    if current_time - last_preview_time < self.preview_interval:
+                        continue
+                    last_preview_time = current_time
+                    frame = cv2.resize(frame, (320, 240))
+                    quality = 60
+                else:
+                    quality = 80
                 
                 # 压缩图像
-                _, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
+                _, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
                 frame_data = jpeg.tobytes()
                 
                 # 构建帧头
@@ -206,8 +303,6 @@ class CarServer:
                     if client in self.video_clients:
                         self.video_clients.remove(client)
                 
-                last_frame_time = current_time
-                
             except Exception as e:
                 print(f"视频流循环错误: {e}")
                 time.sleep(0.1)
@@ -217,6 +312,21 @@ class CarServer:
         self.running = False
         self.video_running = False
         
+        # 停止车端检测
+        if self.inference_worker is not None:
+            self.inference_worker.stop()
+        if self.telemetry is not None:
+            self.telemetry.stop()
+        
+        # 停止机械臂
+        if self.arm_worker is not None:
+            self.arm_worker.stop()
+        if self.arm is not None:
+            try:
+                self.arm.close()
+            except Exception as e:
+                print(f"关闭机械臂失败: {e}")
+        
         # 关闭所有客户端连接
         for client in self.clients + self.video_clients:
             try:
@@ -533,6 +643,21 @@ class CarServer:
             self.stop()
         return "右转"
 
+    def set_wheels(self, left, right):
+        """差速驱动：分别设置左右轮速度（-100~100，负数为反转）
+
+        电机A（IN1/IN2, ENA）为左轮，电机B（IN3/IN4, ENB）为右轮（与 turn_left/turn_right 一致）。
+        """
+        left = max(-100, min(100, left))
+        right = max(-100, min(100, right))
+        GPIO.output(IN1, GPIO.HIGH if left > 0 else GPIO.LOW)
+        GPIO.output(IN2, GPIO.HIGH if left < 0 else GPIO.LOW)
+        GPIO.output(IN3, GPIO.HIGH if right > 0 else GPIO.LOW)
+        GPIO.output(IN4, GPIO.HIGH if right < 0 else GPIO.LOW)
+        self.pwm_a.ChangeDutyCycle(abs(left))
+        self.pwm_b.ChangeDutyCycle(abs(right))
+        return f"左轮 {left}%, 右轮 {right}%"
+
     def stop(self):
         """小车停止"""
         GPIO.output(IN1, GPIO.LOW)
@@ -580,6 +705,15 @@ class CarServer:
     def handle_client(self, client_socket, address):
         """处理客户端连接"""
         print(f"新的控制连接：{address}")
+        decoder = json.JSONDecoder()
+        buffer = ''
+        # 确认可能来自本线程，也可能来自机械臂工作线程，发送时加锁
+        send_lock = threading.Lock()
+        
+        def reply(message):
+            with send_lock:
+                client_socket.sendall((json.dumps(message) + '\n').encode('utf-8'))
+        
         while self.running:
             try:
                 # 接收数据
@@ -587,48 +721,32 @@ class CarServer:
                 if not data:
                     break
                 
-                # 解析命令
-                try:
-                    command = json.loads(data.decode())
-                    print(f"收到命令: {command}")
-                    
-                    # 提取命令和参数
-                    cmd = command.get('command', '')
-                    speed = command.get('speed', current_speed)
-                    self.set_speed(speed)
-                    
-                    # 舵机控制命令
-                    if cmd == 'servo':
-                        servo_type = command.get('type', '')  # 'h' 或 'v'
-                        angle = command.get('angle', 90)      # 角度值
-                        print(f"舵机控制: 类型={servo_type}, 角度={angle}")
-                        self.set_servo_angle(servo_type, angle)
-                    
-                    # 其他命令处理
-                    elif cmd == 'forward':
-                        print(f"执行前进命令，速度：{current_speed}")
-                        self.forward()
-                    elif cmd == 'backward':
-                        print(f"执行后退命令，速度：{current_speed}")
-                        self.backward()
-                    elif cmd == 'left':
-                        print(f"执行左转命令，速度：{current_speed}")
-                        self.turn_left()
-                    elif cmd == 'right':
-                        print(f"执行右转命令，速度：{current_speed}")
-                        self.turn_right()
-                    elif cmd == 'stop':
-                        print("执行停止命令")
-                        self.stop_motors()
-                    elif cmd == 'heartbeat':
-                        pass  # 忽略心跳包
-                    else:
-                        print(f"未知命令: {cmd}")
-                    
-                except json.JSONDecodeError as e:
-                    print(f"JSON解析错误: {e}")
-                except Exception as e:
-                    print(f"处理命令时出错: {e}")
+                # 解析命令：一次接收可能包含多条（连续发送时粘包）或半条命令
+                buffer += data.decode(errors='ignore')
+                while buffer:
+                    buffer = buffer.lstrip()
+                    if not buffer:
+                        break
+                    try:
+                        command, end = decoder.raw_decode(buffer)
+                    except json.JSONDecodeError as e:
+                        if len(buffer) > 4096:
+                            print(f"JSON解析错误: {e}")
+                            buffer = ''
+                        break  # 等待剩余数据
+                    buffer = buffer[end:]
+                    ack = {'ok': True}
+                    try:
+                        if self.submit_arm_command(command, reply):
+                            continue  # 机械臂命令完成后由工作线程回复确认
+                        self.handle_command(command)
+                    except Exception as e:
+                        print(f"处理命令时出错: {e}")
+                        ack = {'ok': False, 'error': str(e)}
+                    # 带 id 的命令执行完成后回复确认（一行 JSON）
+                    if isinstance(command, dict) and 'id' in command:
+                        ack['ack'] = command['id']
+                        reply(ack)
                     
             except Exception as e:
                 print(f"接收数据时出错: {e}")
@@ -643,6 +761,62 @@ class CarServer:
             self.clients.remove(client_socket)
         print(f"控制连接断开：{address}")
 
+    def submit_arm_command(self, command, reply):
+        """机械臂命令放入工作线程队列（不等待执行），返回是否为机械臂命令"""
+        cmd = command.get('command', '')
+        if not cmd.startswith('arm_'):
+            return False
+        if self.arm_worker is None:
+            raise RuntimeError("机械臂未启用（启动时使用 --arm-port）")
+        self.arm_worker.submit(command, reply)
+        return True
+
+    def handle_command(self, command):
+        """执行一条控制命令"""
+        # 提取命令和参数
+        cmd = command.get('command', '')
+        
+        # 差速驱动命令直接指定左右轮速度，不改变全局速度（高频发送，不打印）
+        if cmd == 'drive':
+            self.set_wheels(command.get('left', 0), command.get('right', 0))
+            return
+        if cmd == 'ping':
+            return  # 只用于测量往返时延
+        
+        print(f"收到命令: {command}")
+        speed = command.get('speed', current_speed)
+        self.set_speed(speed)
+        
+        # 舵机控制命令
+        if cmd == 'servo':
+            servo_type = command.get('type', '')  # 'h' 或 'v'
+            angle = command.get('angle', 90)      # 角度值
+            print(f"舵机控制: 类型={servo_type}, 角度={angle}")
+            self.set_servo_angle(servo_type, angle)
+        
+        # 其他命令处理
+        elif cmd == 'forward':
+            print(f"执行前进命令，速度：{current_speed}")
+            self.forward()
+        elif cmd == 'backward':
+            print(f"执行后退命令，速度：{current_speed}")
+            self.backward()
+        elif cmd == 'left':
+            print(f"执行左转命令，速度：{current_speed}")
+            self.turn_left()
+        elif cmd == 'right':
+            print(f"执行右转命令，速度：{current_speed}")
+            self.turn_right()
+        elif cmd == 'stop':
+            print("执行停止命令")
+            self.stop_motors()
+        elif cmd == 'speed':
+            pass  # 只设置速度（上面已处理）
+        elif cmd == 'heartbeat':
+            pass  # 忽略心跳包
+        else:
+            print(f"未知命令: {cmd}")
+
     def event_loop(self):
         """事件循环"""
         while self.running:
@@ -713,7 +887,28 @@ class CarServer:
             print(f"设置舵机角度失败: {e}")
 
 def main():
-    server = CarServer()
+    parser = argparse.ArgumentParser(description="智能小车服务端")
+    parser.add_argument('--edge-detect', action='store_true',
+                        help="在小车上运行目标检测，检测结果经遥测通道发送")
+    parser.add_argument('--backend', default='onnxruntime', help="车端检测后端")
+    parser.add_argument('--weights', default='yolov8n.pt')
+    parser.add_argument('--imgsz', type=int, default=320, help="车端推理输入尺寸")
+    parser.add_argument('--telemetry-port', type=int, default=5002)
+    parser.add_argument('--preview-fps', type=float, default=5,
+                        help="车端检测模式下的视频预览帧率")
+    parser.add_argument('--arm-port', default=None,
+                        help="SO101 机械臂串口（例如 /dev/ttyACM0），不指定则不启用机械臂")
+    parser.add_argument('--arm-id', default='my_follower_arm', help="机械臂标定时使用的 robot.id")
+    args = parser.parse_args()
+    
+    server = CarServer(edge_detection=args.edge_detect,
+                       detector_backend=args.backend,
+                       detector_weights=args.weights,
+                       detector_imgsz=args.imgsz,
+                       telemetry_port=args.telemetry_port,
+                       preview_fps=args.preview_fps,
+                       arm_port=args.arm_port,
+                       arm_id=args.arm_id)
     try:
         server.start()
         # 保持主线程运行
@@ -0,0 +1,125 @@
+"""
+控制命令调度：界面事件只修改期望的控制状态，按固定频率（默认 50Hz）采样，只发送变化的部分
+
+拖动滑块时每移动一个像素都会触发回调，键盘自动重复会产生成对的松开/按下事件，
+原来每个事件都单独 sendall 一次。这里改为：
+- set_drive / set_speed / set_servo 只记录期望状态（界面线程调用）
+- 界面线程每个周期比较期望状态和已发送状态，只发送有变化的命令
+- 同一周期内的运动、速度、舵机命令合并为一次发送（car_sdk 一次写入多条命令，服务端按顺序解析）
+- 统计被合并或无变化而未发送的事件数
+"""
+
+class CommandScheduler:
+    """固定频率的控制命令调度器（运行在 Tk 界面线程）
+
+    参数:
+        root: Tk 窗口，用于 after 定时
+        send: 发送函数 send(commands)，commands 为本周期的命令列表
+        rate_hz: 采样频率
+    """
+
+    def __init__(self, root, send, rate_hz=50):
+        self.root = root
+        self.send = send
+        self.interval_ms = max(1, int(1000 / rate_hz))
+        self._after_id = None
+        self._running = False
+
+        # 期望状态和已发送状态：drive 为运动命令，speed 为速度，servo_h/servo_v 为舵机角度
+        self.desired = {}
+        self.sent = {}
+        self._dirty = set()
+
+        # 统计
+        self.ticks = 0
+        self.events = 0
+        self.messages = 0
+        self.commands = 0
+        self.suppressed = 0
+
+    def start(self):
+        """开始调度（连接成功后调用），已发送状态清空，当前的速度和舵机状态会重新发送"""
+        self.stop()
+        self.sent = {}
+        self.desired.pop('drive', None)  # 重新连接后保持停止，不恢复之前的运动
+        self._dirty = set(self.desired)
+        self._running = True
+        self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        self._running = False
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _set(self, field, value):
+        self.events += 1
+        if field in self._dirty:
+            # 上一个事件还没发送就被覆盖
+            self.suppressed += 1
+        self.desired[field] = value
+        self._dirty.add(field)
+
+    def set_drive(self, command):
+        """运动命令：forward / backward / left / right / stop"""
+        self._set('drive', command)
+
+    def set_speed(self, speed):
+        self._set('speed', speed)
+
+    def set_servo(self, servo_type, angle):
+        self._set(f'servo_{servo_type}', angle)
+
+    def pending_commands(self):
+        """比较期望状态和已发送状态，返回需要发送的命令列表"""
+        commands = []
+        dirty, self._dirty = self._dirty, set()
+        changed = {field for field in dirty if self.desired.get(field) != self.sent.get(field)}
+        self.suppressed += len(dirty) - len(changed)
+
+        drive = self.desired.get('drive')
+        speed = self.desired.get('speed')
+        # 速度随运动命令一起发送；运动中调整速度时重发当前运动命令
+        if 'drive' in changed or ('speed' in changed and drive not in (None, 'stop')):
+            if drive is not None:
+                command = {'command': drive}
+                if speed is not None:
+                    command['speed'] = speed
+                commands.append(command)
+                self.sent['drive'] = drive
+                self.sent['speed'] = speed
+        elif 'speed' in changed:
+            # 未运动时只记录，下次运动命令带上
+            self.suppressed += 1
+
+        for servo_type in ('h', 'v'):
+            field = f'servo_{servo_type}'
+            if field in changed:
+                commands.append({'command': 'servo', 'type': servo_type,
+                                 'angle': self.desired[field]})
+                self.sent[field] = self.desired[field]
+        return commands
+
+    def _tick(self):
+        self._after_id = None
+        self.ticks += 1
+        commands = self.pending_commands()
+        if commands:
+            self.messages += 1
+            self.commands += len(commands)
+            self.send(commands)
+        # 发送失败时 send 可能已经断开连接并停止调度
+        if self._running:
+            self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def stats(self):
+        return {
+            'ticks': self.ticks,
+            'events': self.events,
+            'messages': self.messages,
+            'commands': self.commands,
+            'suppressed': self.suppressed,
+        }
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+检测后端对比脚本：在 test.jpeg 和一段录制视频上比较各后端的延迟与检测一致性
+
+使用方法：
+    python compare_backends.py                         # 只用 test.jpeg
+    python compare_backends.py --video drive.mp4       # 额外回放一段视频
+    python compare_backends.py --backends ultralytics onnxruntime openvino
+
+第一个后端作为参考，其余后端按类别 + IoU>=0.5 与参考结果匹配，
+输出匹配率（召回/精确）和单帧延迟。
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from detectors import DETECTOR_BACKENDS, create_detector
+
+
+def box_iou(box, boxes):
+    """单个框与一组框的 IoU，框格式 [x1, y1, x2, y2]"""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.float32)
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / (area + areas - inter + 1e-9)
+
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """按置信度从高到低贪心匹配，返回匹配上的数量"""
+    used = np.zeros(len(candidate), dtype=bool)
+    matched = 0
+    for ref in sorted(reference, key=lambda d: -d['confidence']):
+        same_class = np.array([c['class'] == ref['class'] for c in candidate], dtype=bool)
+        ious = box_iou(ref['bbox'], [c['bbox'] for c in candidate])
+        if len(ious) == 0:
+            continue
+        ious[~same_class | used] = 0
+        best = int(ious.argmax())
+        if ious[best] >= iou_threshold:
+            used[best] = True
+            matched += 1
+    return matched
+
+
+def load_frames(image_path, video_path=None, max_frames=300):
+    """读取测试图像和（可选）视频帧"""
+    frames = []
+    image = cv2.imread(image_path)
+    if image is None:
+        print(f"无法读取图片: {image_path}")
+    else:
+        frames.append(image)
+
+    if video_path:
+        cap = cv2.VideoCapture(video_path)
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    return frames
+
+
+def run_backend(name, weights, frames):
+    """运行一个后端，返回 (每帧检测结果, 每帧耗时, 预热耗时)"""
+    start = time.perf_counter()
+    detector = create_detector(name, weights, warmup=False)
+    load_time = time.perf_counter() - start
+    warmup_time = detector.warmup()
+
+    results, latencies = [], []
+    for frame in frames:
+        t0 = time.perf_counter()
+        results.append(detector.detect(frame))
+        latencies.append(time.perf_counter() - t0)
+    return results, latencies, load_time, warmup_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检测后端对比")
+    parser.add_argument('--weights', default='yolov8n.pt')
+    parser.add_argument('--image', default='test.jpeg')
+    parser.add_argument('--video', default=None, help="回放的视频文件")
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--backends', nargs='+', default=['ultralytics', 'onnxruntime'],
+                        choices=list(DETECTOR_BACKENDS))
+    args = parser.parse_args()
+
+    frames = load_frames(args.image, args.video, args.max_frames)
+    if not frames:
+        sys.exit(1)
+    print(f"共 {len(frames)} 帧")
+
+    reference = None
+    for name in args.backends:
+        try:
+            results, latencies, load_time, warmup_time = run_backend(name, args.weights, frames)
+        except Exception as e:
+            print(f"[{name}] 运行失败: {e}")
+            continue
+
+        ms = sorted(t * 1000 for t in latencies)
+        p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+        print(f"[{name}] 加载 {load_time:.2f}s, 预热 {warmup_time * 1000:.1f}ms, "
+              f"平均 {statistics.mean(ms):.1f}ms, 中位 {statistics.median(ms):.1f}ms, "
+              f"P95 {p95:.1f}ms, 检测数 {sum(len(r) for r in results)}")
+
+        if reference is None:
+            reference = (name, results)
+            continue
+
+        ref_total = sum(len(r) for r in reference[1])
+        cand_total = sum(len(r) for r in results)
+        matched = sum(match_detections(ref, cand) for ref, cand in zip(reference[1], results))
+        recall = matched / ref_total if ref_total else 1.0
+        precision = matched / cand_total if cand_total else 1.0
+        print(f"[{name}] 与 {reference[0]} 一致性: 召回 {recall:.1%}, 精确 {precision:.1%}")
+
+
+if __name__ == "__main__":
+    main()
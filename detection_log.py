@@ -0,0 +1,268 @@
+"""
+列式检测日志：按块保存检测结果，支持按时间范围、类别和置信度查询
+
+存储结构（一个目录）：
+    index.json          块索引：每块的行数、时间/帧序号范围、包含的类别、最大置信度，以及类别表
+    chunk_000000.npz    每列单独保存（np.savez 不压缩），读取时可只加载需要的列
+        seq (int64)  ts (float64)  class_id (int16)  conf (float32)
+        bbox (int16, N x 4)  track_id (int32，无跟踪时为 -1)
+
+写入先缓存在内存中，满 chunk_rows 行或超过 flush_interval 秒才落盘一块；
+background=True 时落盘（np.savez 和索引）交给后台写出线程，append 的调用线程（如推理线程）不等待磁盘；
+查询时先用索引跳过不相关的块，再在块内按列过滤，不需要加载全部数据。
+
+用法：
+    writer = DetectionLogWriter('logs/run1', class_names=detector.class_names)
+    writer.append(seq, ts, detections)
+    writer.close()
+
+    reader = DetectionLogReader('logs/run1')
+    rows = reader.query(start_ts=t0, end_ts=t1, classes=['person'], min_conf=0.5)
+"""
+
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+INDEX_FILE = 'index.json'
+COLUMNS = {
+    'seq': np.int64,
+    'ts': np.float64,
+    'class_id': np.int16,
+    'conf': np.float32,
+    'bbox': np.int16,
+    'track_id': np.int32,
+}
+
+
+def empty_columns():
+    """空结果"""
+    columns = {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+    columns['bbox'] = np.zeros((0, 4), dtype=COLUMNS['bbox'])
+    return columns
+
+
+class DetectionLogWriter:
+    """检测日志写入器
+
+    参数:
+        path: 日志目录（不存在时自动创建，已存在时在原有块之后追加）
+        class_names: {类别ID: 类别名}，遇到未知类别名时自动分配新ID
+        chunk_rows: 每块的行数
+        flush_interval: 缓存超过该时间（秒）也会写出一块，避免异常退出丢失过多数据
+        background: 在后台线程写出块，append 只做内存缓存（close 时等待全部写完）
+    """
+
+    def __init__(self, path, class_names=None, chunk_rows=4096, flush_interval=10.0,
+                 background=False):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+
+        self.index = {'version': 1, 'class_names': {}, 'chunks': []}
+        index_path = self.path / INDEX_FILE
+        if index_path.exists():
+            with open(index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        self.class_ids = {name: int(class_id)
+                          for class_id, name in self.index['class_names'].items()}
+        for class_id, name in (class_names or {}).items():
+            self._class_id(name, int(class_id))
+
+        self._buffer = {name: [] for name in COLUMNS}
+        self._rows = 0
+        self._last_flush = time.time()
+        self._closed = False
+        self._buffer_lock = threading.Lock()  # append / flush / close 可能来自不同线程
+        self._index_lock = threading.Lock()  # 类别表由 append 更新，块记录由写出线程更新
+        self.rows_written = 0
+
+        self._queue = None
+        if background:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._writer_loop, name="DetectionLogWriter")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _class_id(self, name, preferred=None):
+        """类别名 -> 类别ID，新类别登记到类别表"""
+        class_id = self.class_ids.get(name)
+        if class_id is None:
+            used = set(self.class_ids.values())
+            class_id = preferred if preferred is not None and preferred not in used \
+                else max(used, default=-1) + 1
+            self.class_ids[name] = class_id
+            with self._index_lock:
+                self.index['class_names'][str(class_id)] = name
+        return class_id
+
+    def append(self, seq, ts, detections):
+        """追加一帧的检测结果（可带 'track_id'）；close 之后的调用被忽略"""
+        with self._buffer_lock:
+            if self._closed:
+                return
+            buffer = self._buffer
+            for det in detections:
+                buffer['seq'].append(seq)
+                buffer['ts'].append(ts)
+                buffer['class_id'].append(self._class_id(det['class']))
+                buffer['conf'].append(det['confidence'])
+                buffer['bbox'].append(det['bbox'])
+                buffer['track_id'].append(det.get('track_id', -1))
+            self._rows += len(detections)
+            if self._rows >= self.chunk_rows or (
+                    self._rows and time.time() - self._last_flush >= self.flush_interval):
+                self._flush()
+
+    def flush(self):
+        """把缓存写成一个新块并更新索引（后台模式下只提交给写出线程）"""
+        with self._buffer_lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.time()
+        if not self._rows:
+            return
+        buffer, rows = self._buffer, self._rows
+        self._buffer = {name: [] for name in COLUMNS}
+        self._rows = 0
+        if self._queue is not None:
+            self._queue.put((buffer, rows))
+        else:
+            self._write_chunk(buffer, rows)
+
+    def _writer_loop(self):
+        """后台写出线程：依次把提交的缓存写成块，收到 None 时退出"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._write_chunk(*item)
+            except Exception as e:
+                print(f"写入检测日志失败 {self.path}: {e}")
+
+    def _write_chunk(self, buffer, rows):
+        columns = {name: np.asarray(values, dtype=COLUMNS[name])
+                   for name, values in buffer.items()}
+        columns['bbox'] = columns['bbox'].reshape(-1, 4)
+
+        filename = f"chunk_{len(self.index['chunks']):06d}.npz"
+        np.savez(self.path / filename, **columns)
+        with self._index_lock:
+            self.index['chunks'].append({
+                'file': filename,
+                'rows': int(rows),
+                'ts_min': float(columns['ts'].min()),
+                'ts_max': float(columns['ts'].max()),
+                'seq_min': int(columns['seq'].min()),
+                'seq_max': int(columns['seq'].max()),
+                'classes': sorted(int(c) for c in np.unique(columns['class_id'])),
+                'conf_max': float(columns['conf'].max()),
+            })
+            self._write_index()
+
+        self.rows_written += rows
+
+    def _write_index(self):
+        # 先写临时文件再替换，避免中途退出损坏索引
+        tmp_path = self.path / (INDEX_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False)
+        tmp_path.replace(self.path / INDEX_FILE)
+
+    def close(self):
+        """写出剩余缓存（后台模式下等待写出线程完成）"""
+        with self._buffer_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._flush()
+        if self._queue is not None:
+            self._queue.put(None)
+            self._thread.join()
+
+
+class DetectionLogReader:
+    """检测日志查询
+
+    参数:
+        path: 日志目录
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / INDEX_FILE, 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        self.class_names = {int(k): v for k, v in self.index['class_names'].items()}
+        self.chunks = self.index['chunks']
+
+    def __len__(self):
+        return sum(chunk['rows'] for chunk in self.chunks)
+
+    def time_range(self):
+        """日志覆盖的时间范围 (ts_min, ts_max)"""
+        if not self.chunks:
+            return None
+        return (min(c['ts_min'] for c in self.chunks), max(c['ts_max'] for c in self.chunks))
+
+    def _class_ids(self, classes):
+        """类别名或类别ID -> 类别ID集合"""
+        if classes is None:
+            return None
+        ids = {name: class_id for class_id, name in self.class_names.items()}
+        return {c if isinstance(c, (int, np.integer)) else ids.get(c, -1) for c in classes}
+
+    def iter_query(self, start_ts=None, end_ts=None, classes=None, min_conf=None, columns=None):
+        """逐块返回满足条件的行（dict: 列名 -> 数组），索引不匹配的块不会被读取"""
+        class_ids = self._class_ids(classes)
+        columns = list(columns or COLUMNS)
+        for chunk in self.chunks:
+            if start_ts is not None and chunk['ts_max'] < start_ts:
+                continue
+            if end_ts is not None and chunk['ts_min'] > end_ts:
+                continue
+            if class_ids is not None and not class_ids.intersection(chunk['classes']):
+                continue
+            if min_conf is not None and chunk['conf_max'] < min_conf:
+                continue
+
+            with np.load(self.path / chunk['file']) as data:
+                # 先只加载过滤需要的列
+                mask = np.ones(chunk['rows'], dtype=bool)
+                if start_ts is not None or end_ts is not None:
+                    ts = data['ts']
+                    if start_ts is not None:
+                        mask &= ts >= start_ts
+                    if end_ts is not None:
+                        mask &= ts <= end_ts
+                if class_ids is not None:
+                    mask &= np.isin(data['class_id'], list(class_ids))
+                if min_conf is not None:
+                    mask &= data['conf'] >= min_conf
+                if not mask.any():
+                    continue
+                yield {name: data[name][mask] for name in columns}
+
+    def query(self, start_ts=None, end_ts=None, classes=None, min_conf=None, columns=None):
+        """返回满足条件的所有行（dict: 列名 -> 数组）"""
+        parts = list(self.iter_query(start_ts, end_ts, classes, min_conf, columns))
+        if not parts:
+            empty = empty_columns()
+            return {name: empty[name] for name in (columns or COLUMNS)}
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    def count_by_class(self, **filters):
+        """按类别统计行数，filters 同 query"""
+        counts = {}
+        for part in self.iter_query(columns=['class_id'], **filters):
+            ids, n = np.unique(part['class_id'], return_counts=True)
+            for class_id, count in zip(ids, n):
+                name = self.class_names.get(int(class_id), f"class_{class_id}")
+                counts[name] = counts.get(name, 0) + int(count)
+        return counts
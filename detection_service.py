@@ -0,0 +1,249 @@
+"""
+进程内共享检测服务：多辆小车共用一个模型实例，按批推理
+
+每个视频窗口把自己的 LatestFrameSlot 注册到服务，得到一个 StreamHandle。
+服务线程收集每路流的最新帧，凑成一批（最多等待 max_batch_delay 秒），
+一次推理后把结果分发回各自的 StreamHandle。StreamHandle 与 InferenceWorker
+接口一致（start/stop/reset/latest/fps），可直接替换。
+"""
+
+import threading
+import time
+
+from inference_worker import InferenceWorker
+
+
+class StreamHandle(InferenceWorker):
+    """检测服务中的一路视频流"""
+
+    def __init__(self, service, slot, name="stream", min_interval=0.0, gate=None, on_result=None):
+        super().__init__(None, slot, name=name, min_interval=min_interval, gate=gate,
+                         on_result=on_result)
+        self.service = service
+        self.consumed_seq = slot.seq  # 已送入推理的帧序号
+
+    def start(self):
+        """开始参与批量推理"""
+        self.consumed_seq = self.slot.seq
+        self.service.activate(self)
+
+    def stop(self, timeout=1.0):
+        """退出批量推理"""
+        self.service.deactivate(self)
+
+    def has_pending(self):
+        """是否有尚未推理的新帧（且已到下一次推理时间）"""
+        if self.slot.seq <= self.consumed_seq:
+            return False
+        return time.perf_counter() >= self._last_start + self.min_interval
+
+
+class DetectionService:
+    """共享检测服务
+
+    参数:
+        detector: 检测器后端，提供 detect_batch(frames)（见 detectors.py）
+        max_batch_delay: 凑批时最多等待的时间（秒），限制额外延迟
+        max_batch_size: 单批最多包含的帧数
+    """
+
+    def __init__(self, detector, max_batch_delay=0.015, max_batch_size=8):
+        self.detector = detector
+        self.max_batch_delay = max_batch_delay
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self._streams = []
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._next_index = 0  # 超过批大小时轮转起点，保证公平
+
+        # 统计计数
+        self.batch_count = 0
+        self.frames_processed = 0
+        self.last_batch_size = 0
+        self.last_batch_time = 0.0
+
+    @property
+    def class_names(self):
+        return self.detector.class_names
+
+    def register(self, slot, name="stream", min_interval=0.0, gate=None, on_result=None):
+        """注册一路视频流，返回 StreamHandle（调用 start() 后生效）
+
+        min_interval 为该路流两次推理之间的最小间隔（秒），0 表示不限速；
+        gate 为可选的 MotionGate；on_result 与 InferenceWorker 相同，在批量推理线程中调用。
+        """
+        return StreamHandle(self, slot, name=name, min_interval=min_interval, gate=gate,
+                            on_result=on_result)
+
+    def activate(self, handle):
+        """开始处理某路视频流"""
+        with self._lock:
+            if handle not in self._streams:
+                self._streams.append(handle)
+                handle.slot.add_listener(self._wakeup.set)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="DetectionService")
+                self._thread.daemon = True
+                self._thread.start()
+        self._wakeup.set()
+
+    def deactivate(self, handle):
+        """停止处理某路视频流"""
+        with self._lock:
+            if handle in self._streams:
+                self._streams.remove(handle)
+                handle.slot.remove_listener(self._wakeup.set)
+
+    def stats(self):
+        """返回批处理统计"""
+        avg_batch = self.frames_processed / self.batch_count if self.batch_count else 0.0
+        return {
+            'streams': len(self._streams),
+            'batches': self.batch_count,
+            'frames': self.frames_processed,
+            'avg_batch_size': avg_batch,
+            'last_batch_size': self.last_batch_size,
+            'last_batch_time': self.last_batch_time,
+        }
+
+    def _pending(self):
+        with self._lock:
+            streams = list(self._streams)
+        return streams, [h for h in streams if h.has_pending()]
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(timeout=0.5)
+            self._wakeup.clear()
+
+            streams, pending = self._pending()
+            if not pending:
+                continue
+
+            # 等待其他流的新帧凑成一批，最多等待 max_batch_delay
+            deadline = time.perf_counter() + self.max_batch_delay
+            while len(pending) < min(len(streams), self.max_batch_size):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._wakeup.wait(timeout=remaining)
+                self._wakeup.clear()
+                streams, pending = self._pending()
+
+            if len(pending) > self.max_batch_size:
+                start = self._next_index % len(pending)
+                pending = (pending[start:] + pending[:start])[:self.max_batch_size]
+                self._next_index += self.max_batch_size
+
+            # 取每路流的最新帧
+            batch = []
+            now = time.perf_counter()
+            for handle in pending:
+                handle._last_start = now
+                seq, frame, ts = handle.slot.get()
+                handle.skipped_frames += max(0, seq - handle.consumed_seq - 1)
+                handle.consumed_seq = seq
+                if frame is None:
+                    continue
+                image, roi = handle.prepare(seq, frame, ts)
+                if image is not None:
+                    batch.append((handle, seq, image, ts, roi, frame.shape))
+            if not batch:
+                continue
+
+            start_time = time.perf_counter()
+            try:
+                results = self.detector.detect_batch([item[2] for item in batch])
+            except Exception as e:
+                print(f"批量推理出错: {e}")
+                continue
+            elapsed = time.perf_counter() - start_time
+
+            # 分发结果
+            for (handle, seq, _, ts, roi, shape), detections in zip(batch, results):
+                handle.finish(detections, roi, seq, ts, elapsed / len(batch), shape)
+
+            self.batch_count += 1
+            self.frames_processed += len(batch)
+            self.last_batch_size = len(batch)
+            self.last_batch_time = elapsed
+
+            # 推理期间可能已有新帧到达
+            if any(h.has_pending() for h in self._pending()[0]):
+                self._wakeup.set()
+
+
+_shared_service = None
+_shared_lock = threading.Lock()
+_load_thread = None
+_load_callbacks = []
+
+
+def get_detection_service(weights='yolov8n.pt', backend='ultralytics', **detector_options):
+    """获取进程内共享的检测服务（首次调用时加载并预热模型）
+
+    detector_options 透传给检测后端，例如 int8=True。
+    """
+    global _shared_service
+    with _shared_lock:
+        if _shared_service is None:
+            from detectors import create_detector
+            _shared_service = DetectionService(
+                create_detector(backend, weights, **detector_options))
+        return _shared_service
+
+
+def _load_shared_service(weights, backend, detector_options):
+    """后台线程：导入推理库、加载并预热模型，完成后通知所有等待者"""
+    global _shared_service, _load_thread
+    from startup_timer import STARTUP
+
+    service, error = None, None
+    try:
+        start = time.perf_counter()
+        from detectors import create_detector
+        STARTUP.record('model_import', time.perf_counter() - start)
+
+        start = time.perf_counter()
+        detector = create_detector(backend, weights, warmup=False, **detector_options)
+        STARTUP.record('model_load', time.perf_counter() - start)
+
+        start = time.perf_counter()
+        detector.warmup()
+        STARTUP.record('warmup', time.perf_counter() - start)
+
+        service = DetectionService(detector)
+    except Exception as e:
+        error = e
+
+    with _shared_lock:
+        if service is not None:
+            _shared_service = service
+        callbacks = list(_load_callbacks)
+        _load_callbacks.clear()
+        _load_thread = None  # 失败后允许重试
+    for callback in callbacks:
+        callback(service, error)
+
+
+def load_detection_service_async(callback, weights='yolov8n.pt', backend='ultralytics',
+                                 **detector_options):
+    """在后台线程加载共享检测服务，完成后调用 callback(service, error)
+
+    已加载时立即回调；正在加载时只登记回调，不会重复加载。
+    回调在加载线程中执行，界面代码需要自行切回主线程。
+    """
+    global _load_thread
+    with _shared_lock:
+        service = _shared_service
+        if service is None:
+            _load_callbacks.append(callback)
+            if _load_thread is None:
+                _load_thread = threading.Thread(
+                    target=_load_shared_service, args=(weights, backend, detector_options),
+                    name="DetectionServiceLoader")
+                _load_thread.daemon = True
+                _load_thread.start()
+    if service is not None:
+        callback(service, None)
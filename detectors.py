@@ -0,0 +1,391 @@
+"""
+目标检测器后端
+
+所有后端继承 DetectorBackend，统一提供：
+- class_names: {类别ID: 类别名}
+- warmup(): 预热，消除首帧的额外开销
+- detect(frame): 单帧检测，返回检测结果列表
+- detect_batch(frames): 多帧批量检测，返回与输入一一对应的检测结果列表
+
+检测结果格式与 VideoMonitorAI 一致：
+    {'class': 类别名, 'confidence': 置信度, 'bbox': [x1, y1, x2, y2]}
+
+可用后端：
+- ultralytics: ultralytics YOLO（PyTorch），最通用但 CPU 上最慢
+- onnxruntime: ONNX Runtime CPU 推理，预处理/后处理由本模块的 NumPy 实现完成
+- openvino:    OpenVINO CPU 推理（可选，需要 pip install openvino）
+
+ONNX/OpenVINO 后端首次使用时会调用 ultralytics 把 .pt 模型导出为 .onnx 并缓存，
+之后（包括树莓派上）只需要 onnxruntime 或 openvino，不再依赖 torch。
+传入 int8=True 时加载 quantize_detector.py 生成的 INT8 量化模型（仅 onnxruntime / openvino 后端）。
+"""
+
+import ast
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# 模型导出缓存目录
+MODEL_CACHE_DIR = Path('models')
+
+# letterbox 填充颜色（与 ultralytics 一致）
+LETTERBOX_COLOR = 114
+
+
+class DetectorBackend:
+    """检测器后端基类
+
+    子类需要实现 infer(batch) 并设置 class_names / input_size；
+    如推理框架自带前后处理（如 ultralytics），可直接重写 detect_batch。
+    """
+
+    name = 'base'
+
+    def __init__(self, conf_threshold=0.25, iou_threshold=0.7, max_detections=300):
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.max_detections = max_detections
+        self.class_names = {}
+        self.input_size = (640, 640)  # (宽, 高)
+
+    def warmup(self, runs=2):
+        """用空白图像预热，返回平均耗时（秒）"""
+        width, height = self.input_size
+        frame = np.full((height, width, 3), LETTERBOX_COLOR, dtype=np.uint8)
+        start = time.perf_counter()
+        for _ in range(runs):
+            self.detect(frame)
+        return (time.perf_counter() - start) / max(1, runs)
+
+    def detect(self, frame):
+        """单帧检测"""
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        """批量检测，frames 为 BGR 图像列表"""
+        batch, metas = self.preprocess(frames)
+        outputs = self.infer(batch)
+        return self.postprocess(outputs, metas)
+
+    def detect_timed(self, frame):
+        """单帧检测并分阶段计时，返回 (检测结果, {'preprocess'/'infer'/'postprocess': 秒})"""
+        t0 = time.perf_counter()
+        batch, metas = self.preprocess([frame])
+        t1 = time.perf_counter()
+        outputs = self.infer(batch)
+        t2 = time.perf_counter()
+        detections = self.postprocess(outputs, metas)[0]
+        t3 = time.perf_counter()
+        return detections, {'preprocess': t1 - t0, 'infer': t2 - t1, 'postprocess': t3 - t2}
+
+    def preprocess(self, frames):
+        """letterbox 预处理，返回 (NCHW float32 批数据, 每帧的缩放信息)"""
+        return letterbox_batch(frames, self.input_size)
+
+    def infer(self, batch):
+        """运行模型，返回原始输出 (N, 4 + 类别数, 候选框数)"""
+        raise NotImplementedError
+
+    def postprocess(self, outputs, metas):
+        """解码 YOLOv8 输出并做 NMS，返回每帧的检测结果列表"""
+        results = []
+        for pred, meta in zip(outputs, metas):
+            boxes, scores, class_ids = decode_yolov8(
+                pred, self.conf_threshold, self.iou_threshold, self.max_detections)
+            boxes = scale_boxes(boxes, meta)
+            results.append(self.to_detections(boxes, scores, class_ids))
+        return results
+
+    def to_detections(self, boxes, scores, class_ids):
+        """将数组形式的检测结果转换为检测结果列表"""
+        detections = []
+        for box, conf, class_id in zip(boxes.astype(int), scores, class_ids):
+            class_id = int(class_id)
+            detections.append({
+                'class': self.class_names.get(class_id, f"class_{class_id}"),
+                'confidence': float(conf),
+                'bbox': [int(v) for v in box]
+            })
+        return detections
+
+
+# ===================== 预处理 / 后处理 ===================== #
+
+def letterbox_batch(frames, input_size):
+    """批量 letterbox：等比例缩放到 input_size 并居中填充
+
+    缩放需要逐帧进行，颜色通道转换、归一化和 HWC->CHW 对整批一次完成。
+
+    Returns:
+        batch: (N, 3, H, W) float32，RGB，取值 [0, 1]
+        metas: 每帧的 (缩放比例, 左侧填充, 顶部填充, 原始宽, 原始高)
+    """
+    width, height = input_size
+    canvas = np.full((len(frames), height, width, 3), LETTERBOX_COLOR, dtype=np.uint8)
+    metas = []
+    for i, frame in enumerate(frames):
+        src_h, src_w = frame.shape[:2]
+        ratio = min(width / src_w, height / src_h)
+        new_w, new_h = int(round(src_w * ratio)), int(round(src_h * ratio))
+        pad_x, pad_y = (width - new_w) // 2, (height - new_h) // 2
+        if (new_w, new_h) != (src_w, src_h):
+            frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        canvas[i, pad_y:pad_y + new_h, pad_x:pad_x + new_w] = frame
+        metas.append((ratio, pad_x, pad_y, src_w, src_h))
+
+    # BGR -> RGB，NHWC -> NCHW，归一化
+    batch = canvas[..., ::-1].transpose(0, 3, 1, 2).astype(np.float32)
+    batch *= 1.0 / 255.0
+    return np.ascontiguousarray(batch), metas
+
+
+def nms(boxes, scores, iou_threshold):
+    """贪心 NMS，boxes 为 (N, 4) xyxy，返回保留的索引"""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(x1[i], x1[rest])
+        yy1 = np.maximum(y1[i], y1[rest])
+        xx2 = np.minimum(x2[i], x2[rest])
+        yy2 = np.minimum(y2[i], y2[rest])
+        inter = (xx2 - xx1).clip(0) * (yy2 - yy1).clip(0)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_yolov8(pred, conf_threshold, iou_threshold, max_detections=300):
+    """解码单帧 YOLOv8 输出 (4 + 类别数, 候选框数)
+
+    Returns:
+        boxes: (K, 4) xyxy（模型输入坐标系）
+        scores: (K,)
+        class_ids: (K,)
+    """
+    pred = pred.T  # (候选框数, 4 + 类别数)
+    class_scores = pred[:, 4:]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(class_ids)), class_ids]
+
+    mask = scores > conf_threshold
+    if not mask.any():
+        empty = np.zeros((0, 4), dtype=np.float32)
+        return empty, np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    xywh = pred[mask, :4]
+    scores = scores[mask]
+    class_ids = class_ids[mask]
+
+    boxes = np.empty_like(xywh)
+    boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+
+    # 按类别偏移坐标，一次 NMS 完成分类别抑制
+    offsets = class_ids[:, None].astype(np.float32) * 4096.0
+    keep = nms(boxes + offsets, scores, iou_threshold)[:max_detections]
+    return boxes[keep], scores[keep], class_ids[keep]
+
+
+def scale_boxes(boxes, meta):
+    """把模型输入坐标系下的框映射回原图"""
+    ratio, pad_x, pad_y, src_w, src_h = meta
+    boxes = boxes.copy()
+    boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad_x) / ratio).clip(0, src_w)
+    boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad_y) / ratio).clip(0, src_h)
+    return boxes
+
+
+# ===================== 模型导出 ===================== #
+
+def export_onnx(weights='yolov8n.pt', imgsz=640, cache_dir=MODEL_CACHE_DIR):
+    """把 ultralytics .pt 模型导出为 ONNX（已缓存时直接返回缓存路径）"""
+    weights = Path(weights)
+    if weights.suffix == '.onnx':
+        return weights
+
+    cache_dir = Path(cache_dir)
+    onnx_path = cache_dir / f"{weights.stem}_{imgsz}.onnx"
+    if onnx_path.exists():
+        return onnx_path
+
+    from ultralytics import YOLO
+    print(f"正在导出 ONNX 模型: {weights} -> {onnx_path}")
+    exported = YOLO(str(weights)).export(format='onnx', imgsz=imgsz, dynamic=True,
+                                          simplify=True)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    Path(exported).replace(onnx_path)
+    return onnx_path
+
+
+def quantized_model_path(weights='yolov8n.pt', imgsz=640, cache_dir=MODEL_CACHE_DIR):
+    """INT8 量化模型的缓存路径（由 quantize_detector.py 生成）"""
+    return Path(cache_dir) / f"{Path(weights).stem}_{imgsz}_int8.onnx"
+
+
+def resolve_model_path(weights, imgsz, int8=False):
+    """返回 ONNX/OpenVINO 后端实际加载的模型路径"""
+    if not int8:
+        return export_onnx(weights, imgsz)
+    path = Path(weights) if str(weights).endswith('_int8.onnx') else quantized_model_path(weights, imgsz)
+    if not path.exists():
+        raise FileNotFoundError(
+            f"找不到 INT8 模型: {path}\n"
+            f"请先运行 python quantize_detector.py calibrate --data <图片目录或视频> 生成量化模型。")
+    return path
+
+
+def parse_class_names(metadata):
+    """解析 ultralytics 导出时写入模型元数据的类别名（'names' 字段）"""
+    try:
+        if 'names' in metadata:
+            return {int(k): v for k, v in ast.literal_eval(metadata['names']).items()}
+    except Exception as e:
+        print(f"读取类别名失败: {e}")
+    return {}
+
+
+def read_onnx_class_names(onnx_path):
+    """从 ONNX 文件读取类别名（需要 onnx 包）"""
+    try:
+        import onnx
+        model = onnx.load(str(onnx_path), load_external_data=False)
+        return parse_class_names({prop.key: prop.value for prop in model.metadata_props})
+    except Exception as e:
+        print(f"读取类别名失败: {e}")
+    return {}
+
+
+# ===================== 后端实现 ===================== #
+
+class UltralyticsDetector(DetectorBackend):
+    """基于 ultralytics YOLO（PyTorch）的检测器"""
+
+    name = 'ultralytics'
+
+    def __init__(self, weights='yolov8n.pt', imgsz=640, **kwargs):
+        super().__init__(**kwargs)
+        from ultralytics import YOLO
+        self.weights = weights
+        self.model = YOLO(weights)
+        self.class_names = self.model.model.names
+        self.input_size = (imgsz, imgsz)
+
+    def detect_batch(self, frames):
+        """批量检测，frames 为 BGR 图像列表"""
+        results = self.model(list(frames), verbose=False, imgsz=self.input_size[0],
+                             conf=self.conf_threshold, iou=self.iou_threshold)
+        return [self._to_detections(result) for result in results]
+
+    def detect_timed(self, frame):
+        """单帧检测，分阶段耗时取自 ultralytics 结果中的 speed（毫秒）"""
+        result = self.model(frame, verbose=False, imgsz=self.input_size[0],
+                            conf=self.conf_threshold, iou=self.iou_threshold)[0]
+        speed = result.speed
+        stages = {
+            'preprocess': speed.get('preprocess', 0.0) / 1000,
+            'infer': speed.get('inference', 0.0) / 1000,
+            'postprocess': speed.get('postprocess', 0.0) / 1000,
+        }
+        return self._to_detections(result), stages
+
+    def _to_detections(self, result):
+        """将 ultralytics 结果转换为检测结果列表"""
+        boxes = result.boxes.xyxy.cpu().numpy()
+        confs = result.boxes.conf.cpu().numpy()
+        cls = result.boxes.cls.cpu().numpy()
+        return self.to_detections(boxes, confs, cls)
+
+
+class OnnxRuntimeDetector(DetectorBackend):
+    """基于 ONNX Runtime（CPU）的检测器
+
+    参数:
+        weights: .pt（首次自动导出并缓存）或 .onnx 模型路径
+        imgsz: 输入尺寸（动态输入模型使用该尺寸）
+        num_threads: 推理线程数，0 表示由 ONNX Runtime 决定
+        int8: 加载 quantize_detector.py 生成的 INT8 量化模型
+    """
+
+    name = 'onnxruntime'
+
+    def __init__(self, weights='yolov8n.pt', imgsz=640, num_threads=0, int8=False, **kwargs):
+        super().__init__(**kwargs)
+        import onnxruntime as ort
+
+        self.model_path = resolve_model_path(weights, imgsz, int8)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(self.model_path), options,
+                                            providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        height, width = model_input.shape[2:4]
+        self.input_size = (width if isinstance(width, int) else imgsz,
+                           height if isinstance(height, int) else imgsz)
+        self.class_names = parse_class_names(
+            self.session.get_modelmeta().custom_metadata_map)
+
+    def infer(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVINODetector(DetectorBackend):
+    """基于 OpenVINO（CPU）的检测器，直接加载导出的 ONNX 模型（int8=True 时加载量化模型）"""
+
+    name = 'openvino'
+
+    def __init__(self, weights='yolov8n.pt', imgsz=640, num_threads=0, int8=False, **kwargs):
+        super().__init__(**kwargs)
+        import openvino as ov
+
+        self.model_path = resolve_model_path(weights, imgsz, int8)
+        core = ov.Core()
+        config = {'PERFORMANCE_HINT': 'LATENCY'}
+        if num_threads:
+            config['INFERENCE_NUM_THREADS'] = num_threads
+        model = core.read_model(str(self.model_path))
+        self.compiled = core.compile_model(model, 'CPU', config)
+        self.output = self.compiled.output(0)
+        self.input_size = (imgsz, imgsz)
+        self.class_names = read_onnx_class_names(self.model_path)
+
+    def infer(self, batch):
+        return self.compiled(batch)[self.output]
+
+
+DETECTOR_BACKENDS = {
+    UltralyticsDetector.name: UltralyticsDetector,
+    OnnxRuntimeDetector.name: OnnxRuntimeDetector,
+    OpenVINODetector.name: OpenVINODetector,
+}
+
+# 支持加载 INT8 量化模型（int8=True）的后端
+INT8_BACKENDS = (OnnxRuntimeDetector.name, OpenVINODetector.name)
+# 支持设置推理线程数（num_threads）的后端
+THREADED_BACKENDS = (OnnxRuntimeDetector.name, OpenVINODetector.name)
+
+
+def create_detector(backend='ultralytics', weights='yolov8n.pt', warmup=True, **kwargs):
+    """按名称创建检测器后端"""
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"未知检测后端: {backend}，可选: {', '.join(DETECTOR_BACKENDS)}")
+    if backend not in INT8_BACKENDS:
+        if kwargs.pop('int8', False):
+            raise ValueError(f"检测后端 {backend} 不支持 INT8 量化模型，"
+                             f"请使用 {' / '.join(INT8_BACKENDS)}")
+    if backend not in THREADED_BACKENDS:
+        if kwargs.pop('num_threads', 0):
+            raise ValueError(f"检测后端 {backend} 不支持设置推理线程数，"
+                             f"请使用 {' / '.join(THREADED_BACKENDS)}")
+    detector = DETECTOR_BACKENDS[backend](weights=weights, **kwargs)
+    if warmup:
+        detector.warmup()
+    return detector
@@ -0,0 +1,103 @@
+"""
+视频显示表面：复用 PhotoImage，避免每帧新建图像对象
+
+每种分辨率只保留一个 ImageTk.PhotoImage，新帧通过 PhotoImage.paste 原地更新，
+不再依赖垃圾回收释放旧图像。所有方法都必须在 Tk 主线程中调用。
+
+可以绑定到 Label，也可以绑定到 Canvas（图像作为居中的 image 项，便于在上面叠加 HUD 等文字项）。
+"""
+
+from collections import OrderedDict
+
+import tkinter as tk
+from PIL import Image, ImageTk
+
+
+class DisplaySurface:
+    """绑定到 Label 或 Canvas 的视频显示表面
+
+    参数:
+        widget: 用于显示图像的 tk/ttk Label 或 tk.Canvas
+        max_cached: 最多缓存的分辨率数量（窗口缩放时会产生新的分辨率）
+    """
+
+    def __init__(self, widget, max_cached=2):
+        self.widget = widget
+        self.max_cached = max_cached
+        self._photos = OrderedDict()  # (宽, 高) -> PhotoImage
+        self.current = None
+        self._item = None
+        if isinstance(widget, tk.Canvas):
+            self._item = widget.create_image(0, 0, anchor=tk.CENTER)
+            widget.bind('<Configure>', self._center, add='+')
+
+        # 统计计数
+        self.allocations = 0  # 新建 PhotoImage 次数
+        self.updates = 0      # 原地 paste 次数
+        self.evictions = 0    # 因分辨率变化被释放的 PhotoImage 数量
+
+    def show(self, frame_rgb):
+        """显示一帧 RGB 图像（numpy 数组或 PIL.Image）"""
+        if isinstance(frame_rgb, Image.Image):
+            image = frame_rgb
+        else:
+            image = Image.fromarray(frame_rgb)
+
+        key = image.size
+        photo = self._photos.get(key)
+        if photo is None:
+            photo = ImageTk.PhotoImage(image=image)
+            self._photos[key] = photo
+            self.allocations += 1
+            self._evict()
+        else:
+            photo.paste(image)
+            self._photos.move_to_end(key)
+            self.updates += 1
+
+        if photo is not self.current:
+            if self._item is not None:
+                self.widget.itemconfigure(self._item, image=photo)
+            else:
+                self.widget.configure(image=photo)
+            self.widget.image = photo  # 保持引用，兼容截图等旧逻辑
+            self.current = photo
+
+    def _center(self, event):
+        """Canvas 大小变化时保持图像居中"""
+        self.widget.coords(self._item, event.width // 2, event.height // 2)
+
+    def _evict(self):
+        """释放最久未使用的分辨率对应的 PhotoImage"""
+        # 当前显示的图像仍被 widget.image 引用，切换到新图像后才会真正释放
+        while len(self._photos) > self.max_cached:
+            self._photos.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """清空显示并释放所有缓存的 PhotoImage"""
+        if self._item is not None:
+            self.widget.itemconfigure(self._item, image='')
+        else:
+            self.widget.configure(image='')
+        if hasattr(self.widget, 'image'):
+            del self.widget.image
+        self.current = None
+        self._photos.clear()
+
+    def snapshot(self):
+        """返回当前显示内容的 PIL 图像副本，无图像时返回 None"""
+        if self.current is None:
+            return None
+        return ImageTk.getimage(self.current).copy()
+
+    def stats(self):
+        """返回内存与分配计数"""
+        return {
+            'allocations': self.allocations,
+            'updates': self.updates,
+            'evictions': self.evictions,
+            'cached_surfaces': len(self._photos),
+            # PhotoImage 内部按 RGBA 存储
+            'cached_bytes': sum(w * h * 4 for w, h in self._photos),
+        }
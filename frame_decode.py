@@ -0,0 +1,114 @@
+"""
+视频帧解码工具：按显示区域大小进行 JPEG 缩减解码
+
+当显示区域明显小于原始帧时，使用 OpenCV 的 IMREAD_REDUCED_COLOR_2/4/8
+（libjpeg 在 DCT 域直接按 1/2、1/4、1/8 缩放）解码，只对剩余的比例差
+做一次 cv2.resize，避免“先全尺寸解码、再缩小”的浪费。
+"""
+
+import cv2
+import numpy as np
+
+# 缩减倍数 -> 解码标志，按倍数从大到小排列
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# 允许缩减解码后再放大的最大比例（例如 640x480 -> 320x240 -> 400x300）
+DEFAULT_MAX_UPSCALE = 1.3
+
+
+def read_jpeg_size(data):
+    """解析 JPEG 的 SOF 段获取 (宽, 高)，无需解码，失败返回 None"""
+    size = len(data)
+    if size < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+
+    i = 2
+    while i + 4 <= size:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        # 跳过填充字节
+        if marker == 0xFF:
+            i += 1
+            continue
+        # 无长度字段的独立标记
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            return None
+        seg_len = (data[i + 2] << 8) | data[i + 3]
+        # SOF0~SOF15（排除 DHT/JPG/DAC）
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if i + 9 > size:
+                return None
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return width, height
+        i += 2 + seg_len
+    return None
+
+
+def fit_size(width, height, max_width, max_height):
+    """按比例缩放到不超过 (max_width, max_height) 的最大尺寸"""
+    scale = min(max_width / width, max_height / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def choose_reduction(width, height, target_width, target_height,
+                     max_upscale=DEFAULT_MAX_UPSCALE):
+    """选择缩减解码倍数，返回 (倍数, 解码标志)
+
+    选取满足“缩减后再放大不超过 max_upscale 倍”的最大倍数，
+    不满足时返回 (1, cv2.IMREAD_COLOR)。
+    """
+    for factor, flag in REDUCED_DECODE_FLAGS:
+        reduced_w = width // factor
+        reduced_h = height // factor
+        if (reduced_w * max_upscale >= target_width and
+                reduced_h * max_upscale >= target_height):
+            return factor, flag
+    return 1, cv2.IMREAD_COLOR
+
+
+def decode_for_display(data, max_width, max_height,
+                       max_upscale=DEFAULT_MAX_UPSCALE):
+    """按显示区域解码 JPEG 数据，返回 BGR 图像（解码失败返回 None）
+
+    Args:
+        data: JPEG 字节数据（bytes/bytearray）
+        max_width, max_height: 显示区域大小，<=0 时按原始尺寸解码
+        max_upscale: 缩减解码后允许的最大放大比例
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if max_width <= 0 or max_height <= 0:
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+    src_size = read_jpeg_size(data)
+    if src_size is None:
+        frame = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+        src_size = (frame.shape[1], frame.shape[0])
+    else:
+        frame = None
+
+    target_w, target_h = fit_size(src_size[0], src_size[1], max_width, max_height)
+
+    if frame is None:
+        _, flag = choose_reduction(src_size[0], src_size[1], target_w, target_h,
+                                   max_upscale)
+        frame = cv2.imdecode(buffer, flag)
+        if frame is None:
+            return None
+
+    # 只对剩余的比例差做一次缩放
+    height, width = frame.shape[:2]
+    if (width, height) != (target_w, target_h):
+        interpolation = cv2.INTER_AREA if width > target_w else cv2.INTER_LINEAR
+        frame = cv2.resize(frame, (target_w, target_h), interpolation=interpolation)
+    return frame
@@ -0,0 +1,156 @@
+"""
+界面日志输出：日志记录先进入队列，由界面线程按固定间隔批量写入 Text 控件
+
+原来每条日志都通过 after(0, ...) 插入一次 Text 并滚动，拖动滑块或心跳频繁时会塞满 Tk 事件队列。
+这里改为：
+- emit 只把格式化后的文本放入有界队列（任意线程调用，不碰 Tk），队列满时丢弃并计数
+- 界面线程每 interval_ms 取出全部记录，一次 insert 写入控件
+- 连续重复的消息合并为一行，末尾显示重复次数
+- 控件最多保留 max_lines 行，超出时删除最早的行
+- 有丢弃时在控件中提示丢弃条数，stats() 返回各项计数
+"""
+
+import logging
+import threading
+from collections import deque
+
+import tkinter as tk
+
+
+class BatchedTextHandler(logging.Handler):
+    """批量写入 Tk Text 控件的日志处理器
+
+    参数:
+        text_widget: 日志显示的 Text 控件
+        interval_ms: 界面线程刷新间隔（毫秒）
+        max_lines: 控件最多保留的行数
+        max_pending: 队列中最多等待的记录数，超出的记录被丢弃
+    """
+
+    def __init__(self, text_widget, interval_ms=100, max_lines=1000, max_pending=2000):
+        super().__init__()
+        self.text_widget = text_widget
+        self.interval_ms = interval_ms
+        self.max_lines = max_lines
+        self.max_pending = max_pending
+
+        self._pending = deque()
+        self._pending_lock = threading.Lock()
+        self._closed = False
+        self._after_id = None
+
+        # 控件中最后一行的内容，用于合并重复消息
+        self._last_key = None
+        self._last_text = ''
+        self._last_count = 0
+        self._lines = 0  # 控件当前行数
+
+        # 统计
+        self.records = 0
+        self.dropped = 0
+        self.collapsed = 0
+        self.batches = 0
+        self._reported_dropped = 0
+
+        self._schedule()
+
+    def emit(self, record):
+        if self._closed:
+            return
+        try:
+            entry = ((record.levelno, record.getMessage()), self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        with self._pending_lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(entry)
+            self.records += 1
+
+    def _schedule(self):
+        try:
+            self._after_id = self.text_widget.after(self.interval_ms, self._drain)
+        except tk.TclError:
+            # 控件已销毁
+            self._closed = True
+
+    def _drain(self):
+        """界面线程：取出全部记录，合并后一次写入控件"""
+        self._after_id = None
+        with self._pending_lock:
+            entries = list(self._pending)
+            self._pending.clear()
+            dropped = self.dropped
+
+        if dropped > self._reported_dropped:
+            entries.append((None, f"日志过多，已丢弃 {dropped - self._reported_dropped} 条"))
+            self._reported_dropped = dropped
+
+        try:
+            if entries:
+                self._write(entries)
+        except tk.TclError:
+            self._closed = True
+            return
+        if not self._closed:
+            self._schedule()
+
+    def _write(self, entries):
+        # 连续相同的消息合并为一组；第一组是控件当前的最后一行，重复次数变化时需要重写
+        groups = [[self._last_key, self._last_text, self._last_count]] if self._lines else []
+        existing = len(groups)
+        last_count = self._last_count
+        for key, text in entries:
+            if groups and key is not None and key == groups[-1][0]:
+                groups[-1][1] = text
+                groups[-1][2] += 1
+                self.collapsed += 1
+            else:
+                groups.append([key, text, 1])
+
+        widget = self.text_widget
+        if existing and groups[0][2] != last_count:
+            widget.delete(f'{self._lines}.0', f'{self._lines + 1}.0')
+            self._lines -= 1
+            existing = 0
+        new_groups = groups[existing:]
+        if not new_groups:
+            return
+
+        widget.insert(tk.END, ''.join(self._display(text, count) + '\n'
+                                      for _, text, count in new_groups))
+        self._lines += len(new_groups)
+        if self._lines > self.max_lines:
+            excess = self._lines - self.max_lines
+            widget.delete('1.0', f'{excess + 1}.0')
+            self._lines = self.max_lines
+        widget.see(tk.END)
+        self._last_key, self._last_text, self._last_count = groups[-1]
+        self.batches += 1
+
+    @staticmethod
+    def _display(text, count):
+        return text if count <= 1 else f"{text} (x{count})"
+
+    def stats(self):
+        """记录数、丢弃数、合并的重复数和批量写入次数"""
+        with self._pending_lock:
+            return {
+                'records': self.records,
+                'dropped': self.dropped,
+                'collapsed': self.collapsed,
+                'batches': self.batches,
+                'pending': len(self._pending),
+            }
+
+    def close(self):
+        self._closed = True
+        if self._after_id is not None:
+            try:
+                self.text_widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        super().close()
@@ -0,0 +1,113 @@
+"""
+视频窗口 HUD：在视频画面左上角叠加接收/显示帧率、帧龄、控制往返时延、码率和丢帧数
+
+- HudCounters 只做累加和赋值，每个字段只由一个线程写入（接收线程写接收计数，
+  界面线程写显示计数），读取方不加锁，接收线程不会因统计而阻塞
+- HudOverlay 是 Canvas 上的一个文字项（带半透明底色的矩形），界面线程每 interval_ms
+  对计数器取差值计算速率后更新文字，不再用 cv2.putText 把文字画进每一帧像素
+"""
+
+import time
+
+import tkinter as tk
+
+
+class HudCounters:
+    """视频统计计数器（单写者，读取不加锁）"""
+
+    def __init__(self):
+        # 接收线程写入
+        self.received_frames = 0
+        self.received_bytes = 0
+        # 界面线程写入
+        self.rendered_frames = 0
+        self.dropped_frames = 0  # 到达后未显示就被新帧覆盖的帧数
+        self.frame_age = 0.0     # 帧到达 -> 显示的平滑延迟（秒）
+
+    def frame_received(self, nbytes):
+        """接收线程：收到一帧"""
+        self.received_frames += 1
+        self.received_bytes += nbytes
+
+    def frame_rendered(self, arrival_ts, now=None):
+        """界面线程：显示一帧，arrival_ts 为该帧到达时间"""
+        now = time.time() if now is None else now
+        self.rendered_frames += 1
+        self.frame_age += (now - arrival_ts - self.frame_age) * 0.2
+
+    def reset(self):
+        self.__init__()
+
+
+class HudOverlay:
+    """Canvas 上的 HUD 文字
+
+    参数:
+        canvas: 显示视频的 tk.Canvas
+        counters: HudCounters
+        rtt_source: 返回控制往返时延（秒）的函数，未连接时返回 None
+        interval_ms: 刷新间隔（毫秒）
+    """
+
+    def __init__(self, canvas, counters, rtt_source=None, interval_ms=500):
+        self.canvas = canvas
+        self.counters = counters
+        self.rtt_source = rtt_source
+        self.interval_ms = interval_ms
+        self.visible = True
+
+        self._background = canvas.create_rectangle(0, 0, 0, 0, fill='black', outline='',
+                                                   stipple='gray50', tags=('hud',))
+        self._text = canvas.create_text(10, 8, anchor=tk.NW, fill='#00ff00',
+                                        font='TkFixedFont', tags=('hud',))
+        self._last = None
+        self._after_id = None
+        self._tick()
+
+    def _snapshot(self):
+        c = self.counters
+        return time.monotonic(), c.received_frames, c.received_bytes, c.rendered_frames
+
+    def _tick(self):
+        try:
+            now, received, nbytes, rendered = snapshot = self._snapshot()
+            if self._last is not None and self.visible:
+                elapsed = max(now - self._last[0], 1e-6)
+                received_fps = (received - self._last[1]) / elapsed
+                bitrate = (nbytes - self._last[2]) * 8 / elapsed / 1e6
+                rendered_fps = (rendered - self._last[3]) / elapsed
+                self.update_text(received_fps, rendered_fps, bitrate)
+            self._last = snapshot
+        finally:
+            # 更新出错也要继续定时刷新，否则 HUD 会一直停在旧数据上
+            try:
+                self._after_id = self.canvas.after(self.interval_ms, self._tick)
+            except tk.TclError:
+                self._after_id = None  # 窗口已关闭
+
+    def update_text(self, received_fps, rendered_fps, bitrate):
+        rtt = self.rtt_source() if self.rtt_source is not None else None
+        rtt_text = f"{rtt * 1000:.1f}ms" if rtt is not None else "--"
+        text = (f"接收 {received_fps:5.1f} FPS  显示 {rendered_fps:5.1f} FPS\n"
+                f"帧龄 {self.counters.frame_age * 1000:4.0f}ms  控制RTT {rtt_text}\n"
+                f"码率 {bitrate:5.2f} Mbps  丢帧 {self.counters.dropped_frames}")
+        self.canvas.itemconfigure(self._text, text=text)
+        # 隐藏的图元不计入 bbox（返回 None）
+        bbox = self.canvas.bbox(self._text)
+        if bbox is not None:
+            x1, y1, x2, y2 = bbox
+            self.canvas.coords(self._background, x1 - 4, y1 - 2, x2 + 4, y2 + 2)
+        self.canvas.tag_raise('hud')
+
+    def toggle(self):
+        """显示/隐藏 HUD"""
+        self.visible = not self.visible
+        self.canvas.itemconfigure('hud', state=tk.NORMAL if self.visible else tk.HIDDEN)
+
+    def stop(self):
+        if self._after_id is not None:
+            try:
+                self.canvas.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
@@ -0,0 +1,215 @@
+"""
+推理流水线：接收线程只写入最新帧，推理线程总是取最新帧，过期帧直接跳过
+
+- LatestFrameSlot：单槽“最新帧”容器，带递增序号，写入永不阻塞
+- InferenceWorker：独立推理线程，推理期间到达的帧只保留最后一帧
+"""
+
+import threading
+import time
+
+from motion_gate import merge_roi_detections
+
+
+class LatestFrameSlot:
+    """只保存最新一帧的线程安全容器"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._ts = 0.0
+        self.seq = 0  # 已写入的帧序号
+        self._listeners = []  # 新帧写入后的回调（如共享检测服务的唤醒）
+
+    def put(self, frame, ts=None):
+        """写入新帧（覆盖旧帧），返回该帧序号"""
+        with self._cond:
+            self._frame = frame
+            self._ts = time.time() if ts is None else ts
+            self.seq += 1
+            seq = self.seq
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+        return seq
+
+    def add_listener(self, callback):
+        """注册新帧回调（在写入线程中调用，应尽量轻量）"""
+        with self._cond:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """移除新帧回调"""
+        with self._cond:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def get(self):
+        """立即返回 (seq, frame, ts)，无帧时 frame 为 None"""
+        with self._cond:
+            return self.seq, self._frame, self._ts
+
+    def wait_newer(self, seq, timeout=None):
+        """等待序号大于 seq 的帧，超时返回 None，否则返回 (seq, frame, ts)"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > seq, timeout):
+                return None
+            return self.seq, self._frame, self._ts
+
+    def clear(self):
+        """清空帧（序号保持递增）"""
+        with self._cond:
+            self._frame = None
+
+
+class InferenceWorker:
+    """独立推理线程
+
+    参数:
+        detect_fn: 推理函数，输入 BGR 帧，返回检测结果列表
+        slot: LatestFrameSlot，推理线程从中取最新帧
+        name: 线程名
+        min_interval: 两次推理之间的最小间隔（秒），0 表示不限速；
+            配合跟踪器使用时可降低推理频率（如 0.2 即 5Hz）
+        gate: 可选的 MotionGate，画面无变化时跳过推理并沿用上次结果
+        on_result: 可选回调 on_result(detections, seq, ts, infer_time)，每次推理完成后
+            在推理线程中调用（如发布到遥测通道）
+    """
+
+    def __init__(self, detect_fn, slot, name="InferenceWorker", min_interval=0.0,
+                 gate=None, on_result=None):
+        self.detect_fn = detect_fn
+        self.slot = slot
+        self.name = name
+        self.min_interval = min_interval
+        self.gate = gate
+        self.on_result = on_result
+        self._last_start = 0.0
+        self._lock = threading.Lock()
+        self._detections = []
+        self._result_seq = 0
+        self._result_ts = 0.0
+        self._running = False
+        self._thread = None
+
+        # 统计计数
+        self.inference_count = 0
+        self.skipped_frames = 0   # 推理期间被覆盖、未推理的帧数
+        self.last_infer_time = 0.0
+        self.fps = 0.0
+        self._fps_count = 0
+        self._fps_start = time.time()
+
+    def start(self):
+        """启动推理线程"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """停止推理线程"""
+        self._running = False
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def latest(self):
+        """返回最近一次推理结果 (检测列表, 对应帧序号, 帧时间戳)"""
+        with self._lock:
+            return self._detections, self._result_seq, self._result_ts
+
+    def reset(self):
+        """清空推理结果和统计"""
+        with self._lock:
+            self._detections = []
+            self._result_seq = 0
+            self._result_ts = 0.0
+        self.fps = 0.0
+        self._fps_count = 0
+        self._fps_start = time.time()
+        if self.gate is not None:
+            self.gate.reset()
+
+    def prepare(self, seq, frame, ts):
+        """经过运动门控，返回送入检测器的图像和 ROI
+
+        画面无变化时返回 (None, None) 并沿用上次的检测结果；
+        只需推理局部区域时返回裁剪后的图像和 ROI。
+        """
+        if self.gate is None:
+            return frame, None
+        decision = self.gate.check(frame)
+        if not decision.infer:
+            with self._lock:
+                self._result_seq = seq
+                self._result_ts = ts
+            return None, None
+        if decision.roi is not None:
+            x1, y1, x2, y2 = decision.roi
+            return frame[y1:y2, x1:x2], decision.roi
+        return frame, None
+
+    def finish(self, detections, roi, seq, ts, infer_time, frame_shape=None):
+        """合并 ROI 推理结果并发布"""
+        if self.gate is not None:
+            self.gate.record(infer_time, roi, frame_shape)
+        if roi is not None:
+            detections = merge_roi_detections(self.latest()[0], detections, roi)
+        self.publish(detections, seq, ts, infer_time)
+
+    def _run(self):
+        last_seq = self.slot.seq
+        while self._running:
+            # 限速：未到下一次推理时间则等待，之后再取最新帧
+            remaining = self._last_start + self.min_interval - time.perf_counter()
+            if remaining > 0:
+                time.sleep(min(remaining, 0.2))
+                continue
+            item = self.slot.wait_newer(last_seq, timeout=0.2)
+            if item is None:
+                continue
+            seq, frame, ts = item
+            if frame is None:
+                last_seq = seq
+                continue
+            # 上次推理之后到达但未被处理的帧
+            self.skipped_frames += max(0, seq - last_seq - 1)
+            last_seq = seq
+
+            start = time.perf_counter()
+            self._last_start = start
+            image, roi = self.prepare(seq, frame, ts)
+            if image is None:
+                continue
+            try:
+                detections = self.detect_fn(image)
+            except Exception as e:
+                print(f"推理出错: {e}")
+                continue
+            self.finish(detections, roi, seq, ts, time.perf_counter() - start, frame.shape)
+
+    def publish(self, detections, seq, ts, infer_time):
+        """发布一次推理结果并更新统计"""
+        with self._lock:
+            self._detections = detections
+            self._result_seq = seq
+            self._result_ts = ts
+        self.last_infer_time = infer_time
+        self.inference_count += 1
+        if self.on_result is not None:
+            try:
+                self.on_result(detections, seq, ts, infer_time)
+            except Exception as e:
+                print(f"推理结果回调出错: {e}")
+
+        # 推理FPS
+        self._fps_count += 1
+        elapsed = time.time() - self._fps_start
+        if elapsed >= 1.0:
+            self.fps = self._fps_count / elapsed
+            self._fps_count = 0
+            self._fps_start = time.time()
@@ -94,6 +94,7 @@ class SmartCarApp:
         
         # 创建控制面板窗口
         self.control_window = self.create_control_window()
+        self.video_window.hud.rtt_source = self.control_rtt
         
         # 隐藏配置窗口
         self.root.withdraw()
@@ -102,6 +103,11 @@ class SmartCarApp:
         self.video_window.root.protocol("WM_DELETE_WINDOW", self.on_video_window_close)
         self.control_window.root.protocol("WM_DELETE_WINDOW", self.on_control_window_close)
 
+    def control_rtt(self):
+        """控制连接最近的往返时延（秒），供视频窗口 HUD 显示"""
+        client = self.control_window.client if self.control_window else None
+        return client.last_rtt if client is not None else None
+
     def on_video_window_close(self):
         """处理视频窗口关闭"""
         if self.video_window:
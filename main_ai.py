@@ -1,10 +1,14 @@
+from startup_timer import STARTUP  # 最先导入，从这里开始计时
 from video_monitor_ai import VideoMonitorAI
 from car_control_gui import CarControlGUI
+from pan_tilt import PanTiltTracker, PanTiltAutoTrack
 import tkinter as tk
 from tkinter import ttk
 import json
 import os
 
+STARTUP.mark('import')
+
 class SmartCarAppAI:
     def __init__(self):
         # 创建主窗口
@@ -29,6 +33,9 @@ class SmartCarAppAI:
         # 存储窗口实例
         self.video_window = None
         self.control_window = None
+        self.extra_video_windows = []  # 其他小车的视频窗口（共享同一个检测服务）
+        self.pan_tilt = None  # 云台自动跟踪
+        self.pan_tilt_report_id = None  # 跟踪统计定期显示的 after 任务
 
     def create_widgets(self):
         # 创建主框架
@@ -36,7 +43,7 @@ class SmartCarAppAI:
         main_frame.pack(fill=tk.BOTH, expand=True)
         
         # IP配置
-        ttk.Label(main_frame, text="小车IP地址:").pack(pady=(0, 5))
+        ttk.Label(main_frame, text="小车IP地址（多辆小车用逗号分隔）:").pack(pady=(0, 5))
         self.ip_entry = ttk.Entry(main_frame)
         self.ip_entry.pack(fill=tk.X, pady=(0, 10))
         self.ip_entry.insert(0, self.config.get('host', '192.168.1.100'))
@@ -63,26 +70,39 @@ class SmartCarAppAI:
     def save_config(self):
         """保存配置文件"""
         if self.save_config_var.get():
-            config = {
-                'host': self.ip_entry.get()
-            }
+            config = dict(self.config)
+            config['host'] = self.ip_entry.get()
             try:
                 with open('config.json', 'w') as f:
                     json.dump(config, f)
             except Exception as e:
                 print(f"保存配置文件失败: {e}")
 
-    def create_video_window(self):
+    def get_hosts(self):
+        """解析IP输入框，第一个为主控小车"""
+        hosts = [h.strip() for h in self.ip_entry.get().split(',') if h.strip()]
+        return hosts or ['192.168.1.100']
+
+    def create_video_window(self, host=None):
         """创建视频监控窗口"""
+        host = host or self.get_hosts()[0]
         video_root = tk.Toplevel(self.root)
-        video_root.title("视频监控 - AI版")
-        return VideoMonitorAI(video_root, host=self.ip_entry.get(), port=5001)
+        video_root.title(f"视频监控 - AI版 ({host})")
+        return VideoMonitorAI(video_root, host=host, port=5001,
+                              backend=self.config.get('detector_backend', 'ultralytics'),
+                              int8=self.config.get('detector_int8', False),
+                              detect_rate=self.config.get('detector_rate', 0),
+                              tracking=self.config.get('tracking', True),
+                              motion_gate=self.config.get('motion_gate', False),
+                              motion_roi=self.config.get('motion_roi', False),
+                              edge_detection=self.config.get('edge_detection', False),
+                              detection_log=self.config.get('detection_log'))
 
     def create_control_window(self):
         """创建控制面板窗口"""
         control_root = tk.Toplevel(self.root)
         control_root.title("控制面板")
-        return CarControlGUI(control_root, host=self.ip_entry.get(), port=5000)
+        return CarControlGUI(control_root, host=self.get_hosts()[0], port=5000)
 
     def start_program(self):
         """启动主程序"""
@@ -94,20 +114,84 @@ class SmartCarAppAI:
         
         # 创建控制面板窗口
         self.control_window = self.create_control_window()
+        self.video_window.hud.rtt_source = self.control_rtt
+        
+        # 其他小车只创建视频窗口
+        for host in self.get_hosts()[1:]:
+            window = self.create_video_window(host)
+            window.root.protocol("WM_DELETE_WINDOW",
+                                 lambda w=window: self.on_extra_video_window_close(w))
+            self.extra_video_windows.append(window)
         
         # 隐藏配置窗口
         self.root.withdraw()
+        STARTUP.mark('ui')
+        
+        # 云台自动跟踪（配置 pan_tilt_track 为目标类别，如 "person"）
+        if self.config.get('pan_tilt_track'):
+            self.start_pan_tilt(self.config['pan_tilt_track'])
         
         # 设置窗口关闭处理
         self.video_window.root.protocol("WM_DELETE_WINDOW", self.on_video_window_close)
         self.control_window.root.protocol("WM_DELETE_WINDOW", self.on_control_window_close)
 
+    def start_pan_tilt(self, target_class):
+        """启动云台自动跟踪：读取视频窗口的检测结果，通过控制面板发送舵机命令"""
+        control = self.control_window
+        tracker = PanTiltTracker(target_class,
+                                 max_rate=self.config.get('pan_tilt_rate', 5.0),
+                                 deadband=self.config.get('pan_tilt_deadband', 2.0),
+                                 h_angle=control.horizontal_angle,
+                                 v_angle=max(1, control.vertical_angle))
+        
+        def send(servo_type, angle):
+            # 舵机命令交给界面线程发送，与手动控制共用同一个连接
+            self.root.after(0, lambda: self.control_window
+                            and self.control_window.set_camera_angle(servo_type, angle))
+        
+        def read_angles():
+            # 方向键等手动调整会改变控制面板的角度，每次更新前同步
+            window = self.control_window
+            if window is None:
+                return None
+            return {'h': window.horizontal_angle, 'v': window.vertical_angle}
+        
+        self.pan_tilt = PanTiltAutoTrack(self.video_window, send, tracker,
+                                         read_angles=read_angles)
+        self.pan_tilt.start()
+        self.pan_tilt_report_ms = int(self.config.get('pan_tilt_report_s', 5.0) * 1000)
+        self.pan_tilt_report_id = self.root.after(self.pan_tilt_report_ms, self.report_pan_tilt)
+
+    def report_pan_tilt(self):
+        """跟踪期间定期在视频窗口日志中显示命令频率和跟踪误差"""
+        self.pan_tilt_report_id = None
+        if not self.pan_tilt:
+            return
+        if self.video_window:
+            self.video_window.logger.info(f"云台跟踪: {self.pan_tilt.tracker.summary()}")
+        self.pan_tilt_report_id = self.root.after(self.pan_tilt_report_ms, self.report_pan_tilt)
+
+    def stop_pan_tilt(self):
+        """停止云台自动跟踪并输出统计"""
+        if self.pan_tilt_report_id is not None:
+            self.root.after_cancel(self.pan_tilt_report_id)
+            self.pan_tilt_report_id = None
+        if self.pan_tilt:
+            self.pan_tilt.stop()
+            print(f"云台自动跟踪统计: {self.pan_tilt.tracker.stats()}")
+            self.pan_tilt = None
+
+    def control_rtt(self):
+        """控制连接最近的往返时延（秒），供视频窗口 HUD 显示"""
+        client = self.control_window.client if self.control_window else None
+        return client.last_rtt if client is not None else None
+
     def on_video_window_close(self):
         """处理视频窗口关闭"""
+        self.stop_pan_tilt()
         if self.video_window:
             try:
-                if hasattr(self.video_window, 'cleanup'):
-                    self.video_window.cleanup()
+                self.video_window.stop_monitor()
                 self.video_window.root.destroy()
                 self.video_window = None
             except Exception as e:
@@ -116,15 +200,27 @@ class SmartCarAppAI:
 
     def on_control_window_close(self):
         """处理控制窗口关闭"""
+        self.stop_pan_tilt()
         if self.control_window:
             self.control_window.cleanup()
             self.control_window.root.destroy()
             self.control_window = None
         self.check_windows_status()
 
+    def on_extra_video_window_close(self, window):
+        """处理其他小车视频窗口关闭"""
+        try:
+            window.stop_monitor()
+            window.root.destroy()
+        except Exception as e:
+            print(f"关闭视频窗口时出错: {e}")
+        if window in self.extra_video_windows:
+            self.extra_video_windows.remove(window)
+        self.check_windows_status()
+
     def check_windows_status(self):
         """检查窗口状态"""
-        if not self.video_window and not self.control_window:
+        if not self.video_window and not self.control_window and not self.extra_video_windows:
             # 所有窗口都关闭时，显示配置窗口
             self.root.deiconify()
 
@@ -0,0 +1,182 @@
+"""
+运动门控：画面没有明显变化时跳过检测，沿用上一次的检测结果
+
+- 在缩小的灰度图上做帧差（与上一次推理的参考帧比较）或 MOG2 背景减除
+- 变化像素比例低于阈值时不推理；超过 max_skip_interval 秒仍强制推理一次
+- 可选 ROI 模式：变化只集中在局部时，只对变化区域（外扩 roi_padding）推理，
+  区域外沿用上一次的检测结果
+- 统计门控命中率和估算节省的推理时间
+"""
+
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+GateDecision = namedtuple('GateDecision', ['infer', 'roi'])  # roi: (x1, y1, x2, y2) 或 None
+
+GATE_METHODS = ('diff', 'mog2')
+
+
+def merge_roi_detections(previous, roi_detections, roi):
+    """把 ROI 内的新检测结果平移回原图坐标，并保留 ROI 外的旧检测结果"""
+    x1, y1, x2, y2 = roi
+    merged = []
+    for det in previous:
+        bx1, by1, bx2, by2 = det['bbox']
+        if bx2 <= x1 or bx1 >= x2 or by2 <= y1 or by1 >= y2:
+            merged.append(det)
+    for det in roi_detections:
+        bx1, by1, bx2, by2 = det['bbox']
+        shifted = dict(det)
+        shifted['bbox'] = [bx1 + x1, by1 + y1, bx2 + x1, by2 + y1]
+        merged.append(shifted)
+    return merged
+
+
+class MotionGate:
+    """基于帧差/背景减除的推理门控
+
+    参数:
+        method: 'diff'（与上次推理帧做差）或 'mog2'（背景减除）
+        width: 缩小后的宽度（高度按比例）
+        pixel_threshold: 灰度差超过该值视为变化像素（仅 diff）
+        min_changed_fraction: 变化像素比例超过该值才推理
+        max_skip_interval: 最长多久必须推理一次（秒）
+        use_roi: 是否只对变化区域推理
+        roi_padding: ROI 向外扩展的像素（原图尺度）
+        roi_max_fraction: ROI 面积超过整帧的该比例时改为整帧推理
+        min_roi_size: ROI 的最小边长（原图尺度），太小的区域检测器无法识别
+    """
+
+    def __init__(self, method='diff', width=160, pixel_threshold=25,
+                 min_changed_fraction=0.003, max_skip_interval=1.0, use_roi=False,
+                 roi_padding=32, roi_max_fraction=0.5, min_roi_size=160):
+        if method not in GATE_METHODS:
+            raise ValueError(f"未知的门控方法: {method}，可选: {', '.join(GATE_METHODS)}")
+        self.method = method
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.max_skip_interval = max_skip_interval
+        self.use_roi = use_roi
+        self.roi_padding = roi_padding
+        self.roi_max_fraction = roi_max_fraction
+        self.min_roi_size = min_roi_size
+        self._kernel = np.ones((3, 3), np.uint8)
+        self.reset()
+
+    def reset(self):
+        """清空参考帧和统计"""
+        self._reference = None
+        self._last_infer = 0.0
+        self._subtractor = None
+        if self.method == 'mog2':
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(
+                history=100, varThreshold=25, detectShadows=False)
+
+        # 统计计数
+        self.frames = 0
+        self.gated = 0          # 被跳过的帧
+        self.full_inferences = 0
+        self.roi_inferences = 0
+        self.full_infer_time = 0.0
+        self.roi_infer_time = 0.0
+        self.roi_area = 0.0     # ROI 推理的面积比例累计
+        self.last_changed_fraction = 0.0
+
+    def _small_gray(self, frame):
+        h, w = frame.shape[:2]
+        height = max(1, round(h * self.width / w))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _change_mask(self, small):
+        if self._subtractor is not None:
+            mask = self._subtractor.apply(small)
+        else:
+            if self._reference is None or self._reference.shape != small.shape:
+                return None
+            mask = cv2.absdiff(small, self._reference)
+            mask = (mask > self.pixel_threshold).astype(np.uint8)
+        return cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel)
+
+    def check(self, frame):
+        """判断当前帧是否需要推理，返回 GateDecision"""
+        self.frames += 1
+        now = time.perf_counter()
+        small = self._small_gray(frame)
+        mask = self._change_mask(small)
+
+        forced = mask is None or now - self._last_infer >= self.max_skip_interval
+        if mask is not None:
+            changed = cv2.countNonZero(mask)
+            self.last_changed_fraction = changed / mask.size
+        if not forced and self.last_changed_fraction < self.min_changed_fraction:
+            self.gated += 1
+            return GateDecision(False, None)
+
+        roi = None
+        if self.use_roi and not forced:
+            roi = self._changed_roi(mask, frame.shape[1], frame.shape[0])
+        self._reference = small
+        self._last_infer = now
+        return GateDecision(True, roi)
+
+    def _changed_roi(self, mask, frame_w, frame_h):
+        """变化区域的外接框（原图坐标），过大时返回 None 表示整帧推理"""
+        points = cv2.findNonZero(mask)
+        if points is None:
+            return None
+        x, y, w, h = cv2.boundingRect(points)
+        scale = frame_w / mask.shape[1]
+        x1 = int(x * scale) - self.roi_padding
+        y1 = int(y * scale) - self.roi_padding
+        x2 = int((x + w) * scale) + self.roi_padding
+        y2 = int((y + h) * scale) + self.roi_padding
+
+        # 保证最小尺寸
+        if x2 - x1 < self.min_roi_size:
+            cx = (x1 + x2) // 2
+            x1, x2 = cx - self.min_roi_size // 2, cx + self.min_roi_size // 2
+        if y2 - y1 < self.min_roi_size:
+            cy = (y1 + y2) // 2
+            y1, y2 = cy - self.min_roi_size // 2, cy + self.min_roi_size // 2
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(frame_w, x2), min(frame_h, y2)
+
+        if (x2 - x1) * (y2 - y1) > self.roi_max_fraction * frame_w * frame_h:
+            return None
+        return x1, y1, x2, y2
+
+    def record(self, infer_time, roi=None, frame_shape=None):
+        """记录一次推理耗时，用于估算节省的时间"""
+        if roi is None:
+            self.full_inferences += 1
+            self.full_infer_time += infer_time
+        else:
+            self.roi_inferences += 1
+            self.roi_infer_time += infer_time
+            if frame_shape is not None:
+                x1, y1, x2, y2 = roi
+                self.roi_area += (x2 - x1) * (y2 - y1) / (frame_shape[0] * frame_shape[1])
+
+    def stats(self):
+        """返回门控统计：命中率（跳过帧比例）和估算节省的推理时间（秒）"""
+        avg_full = self.full_infer_time / self.full_inferences if self.full_inferences else 0.0
+        saved = self.gated * avg_full
+        if self.roi_inferences:
+            saved += max(0.0, self.roi_inferences * avg_full - self.roi_infer_time)
+        return {
+            'frames': self.frames,
+            'gated': self.gated,
+            'hit_rate': self.gated / self.frames if self.frames else 0.0,
+            'full_inferences': self.full_inferences,
+            'roi_inferences': self.roi_inferences,
+            'avg_roi_area': self.roi_area / self.roi_inferences if self.roi_inferences else 0.0,
+            'avg_infer_ms': avg_full * 1000,
+            'saved_time': saved,
+        }
@@ -0,0 +1,210 @@
+"""
+云台自动跟踪：根据目标在画面中的位置调整水平/垂直舵机，让目标保持在画面中心
+
+- 目标偏离中心的像素误差按视场角换算为角度误差，乘以增益得到舵机角度修正量
+- 死区：角度误差小于 deadband 时不发送命令，避免舵机来回抖动
+- 限速：每个舵机每秒最多 max_rate 条命令，单次最多转动 max_step 度
+  （服务端每条舵机命令会阻塞约 0.1 秒，命令过密反而更慢）
+- 统计每秒命令数和跟踪误差（目标中心偏离画面中心的角度）：误差的均值/RMS 为累计值，
+  P95 和最近命令频率只看最近的观测（有界队列，长时间运行不增长），summary() 生成一行文字供界面定期显示
+
+舵机方向与控制面板一致：水平角度增大向左转，垂直角度增大向上转。
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from tracker import select_target
+
+
+class PanTiltTracker:
+    """云台跟踪控制律
+
+    参数:
+        target_class: 跟踪的目标类别
+        hfov / vfov: 摄像头水平/垂直视场角（度）
+        gain: 角度误差到修正量的比例（1.0 表示一步对准）
+        deadband: 角度误差死区（度）
+        max_rate: 每个舵机每秒最多发送的命令数
+        max_step: 单条命令最大转动角度（度）
+        h_limits / v_limits: 舵机角度范围
+        stats_window: 计算 P95 误差保留的最近观测数
+    """
+
+    def __init__(self, target_class='person', hfov=62.0, vfov=48.0, gain=0.6, deadband=2.0,
+                 max_rate=5.0, max_step=10.0, h_limits=(0, 180), v_limits=(1, 90),
+                 h_angle=90, v_angle=1, stats_window=500):
+        self.target_class = target_class
+        self.hfov = hfov
+        self.vfov = vfov
+        self.gain = gain
+        self.deadband = deadband
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.max_step = max_step
+        self.limits = {'h': h_limits, 'v': v_limits}
+        self.angles = {'h': h_angle, 'v': v_angle}
+        self.external_angles = dict(self.angles)  # 最近一次从控制面板读到的角度
+        self.last_sent = {'h': 0.0, 'v': 0.0}
+        self.track_id = None
+
+        # 统计
+        self.commands = 0
+        self.suppressed = {'deadband': 0, 'rate': 0}
+        self.errors = deque(maxlen=stats_window)  # 最近观测的跟踪误差（度）
+        self.error_count = 0
+        self.error_sum = 0.0
+        self.error_sq_sum = 0.0
+        self.command_times = deque(maxlen=256)  # 最近命令的发送时刻
+        self.start_time = time.time()
+
+    def sync_angles(self, angles):
+        """用控制面板的当前角度更新内部角度（方向键等手动调整后不会跳回旧角度）
+
+        只在面板角度相对上次读取发生变化时采用：自动命令经界面线程发送，
+        尚未生效时面板角度不变，不会覆盖刚发出的命令。
+        """
+        for servo_type, angle in angles.items():
+            if angle == self.external_angles[servo_type]:
+                continue
+            self.external_angles[servo_type] = angle
+            low, high = self.limits[servo_type]
+            self.angles[servo_type] = min(high, max(low, angle))
+
+    def select_target(self, detections):
+        """优先沿用上次的轨迹ID，否则选面积最大的目标"""
+        target = select_target(detections, self.target_class, self.track_id)
+        if target is not None:
+            self.track_id = target.get('track_id')
+        return target
+
+    def update(self, detections, frame_size, now=None, angles=None):
+        """输入一次新的检测结果，返回需要发送的舵机命令列表 [(类型, 角度), ...]
+
+        angles 为控制面板的当前角度 {'h': .., 'v': ..}，提供时先用 sync_angles 同步。
+        """
+        if angles is not None:
+            self.sync_angles(angles)
+        now = time.time() if now is None else now
+        target = self.select_target(detections)
+        if target is None:
+            return []
+        width, height = frame_size
+        x1, y1, x2, y2 = target['bbox']
+        # 目标中心相对画面中心的角度误差（右/下为正）
+        error_h = ((x1 + x2) / 2 - width / 2) / width * self.hfov
+        error_v = ((y1 + y2) / 2 - height / 2) / height * self.vfov
+        error = math.hypot(error_h, error_v)
+        self.errors.append(error)
+        self.error_count += 1
+        self.error_sum += error
+        self.error_sq_sum += error * error
+
+        commands = []
+        # 目标在右侧 -> 水平角度减小（向右转）；目标在下方 -> 垂直角度减小（向下转）
+        for servo_type, error in (('h', -error_h), ('v', -error_v)):
+            if abs(error) < self.deadband:
+                self.suppressed['deadband'] += 1
+                continue
+            if now - self.last_sent[servo_type] < self.min_interval:
+                self.suppressed['rate'] += 1
+                continue
+            step = float(np.clip(error * self.gain, -self.max_step, self.max_step))
+            low, high = self.limits[servo_type]
+            angle = int(round(min(high, max(low, self.angles[servo_type] + step))))
+            if angle == self.angles[servo_type]:
+                continue  # 已到极限
+            self.angles[servo_type] = angle
+            self.last_sent[servo_type] = now
+            self.command_times.append(now)
+            self.commands += 1
+            commands.append((servo_type, angle))
+        return commands
+
+    def stats(self, window=5.0):
+        """每秒命令数和跟踪误差统计（度）；recent_commands_per_s 为最近 window 秒的命令频率"""
+        now = time.time()
+        elapsed = max(now - self.start_time, 1e-6)
+        recent = sum(1 for t in self.command_times if now - t <= window)
+        report = {
+            'commands': self.commands,
+            'commands_per_s': self.commands / elapsed,
+            'recent_commands_per_s': recent / max(min(window, elapsed), 1.0),
+            'suppressed': dict(self.suppressed),
+            'angles': dict(self.angles),
+        }
+        if self.error_count:
+            mean = self.error_sum / self.error_count
+            report['tracking_error_deg'] = {
+                'mean': mean,
+                'rms': math.sqrt(self.error_sq_sum / self.error_count),
+                'p95': float(np.percentile(np.asarray(self.errors), 95)),
+            }
+        return report
+
+    def summary(self):
+        """一行统计文字（界面定期显示）"""
+        report = self.stats()
+        text = (f"命令 {report['recent_commands_per_s']:.1f}/s（累计 {report['commands']}）, "
+                f"角度 水平{report['angles']['h']}° 垂直{report['angles']['v']}°")
+        error = report.get('tracking_error_deg')
+        if error:
+            text += (f", 误差 均值 {error['mean']:.1f}° RMS {error['rms']:.1f}° "
+                     f"P95 {error['p95']:.1f}°")
+        return text
+
+
+class PanTiltAutoTrack:
+    """云台自动跟踪循环：每个新的检测结果驱动一次 PanTiltTracker
+
+    参数:
+        source: 检测结果来源，提供 latest() -> (检测列表, 帧序号, 帧时间戳)；
+            如有 frame_size 属性（宽, 高）则优先使用
+        send: 发送舵机命令的函数 send(servo_type, angle)
+        tracker: PanTiltTracker
+        frame_size: 默认帧尺寸 (宽, 高)
+        poll_hz: 查询新检测结果的频率
+        read_angles: 可选，返回舵机当前角度 {'h': .., 'v': ..}（手动控制后的实际角度）
+    """
+
+    def __init__(self, source, send, tracker, frame_size=(640, 480), poll_hz=30,
+                 read_angles=None):
+        self.source = source
+        self.send = send
+        self.read_angles = read_angles
+        self.tracker = tracker
+        self.frame_size = frame_size
+        self.poll_interval = 1.0 / poll_hz
+        self._running = False
+        self._thread = None
+        self._observed_seq = 0
+
+    def start(self):
+        self._running = True
+        self.tracker.start_time = time.time()
+        self._thread = threading.Thread(target=self._run, name="PanTiltAutoTrack")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _run(self):
+        while self._running:
+            detections, seq, _ = self.source.latest()
+            if seq != self._observed_seq:
+                self._observed_seq = seq
+                frame_size = getattr(self.source, 'frame_size', None) or self.frame_size
+                angles = self.read_angles() if self.read_angles is not None else None
+                for servo_type, angle in self.tracker.update(detections, frame_size,
+                                                             angles=angles):
+                    try:
+                        self.send(servo_type, angle)
+                    except Exception as e:
+                        print(f"发送舵机命令失败: {e}")
+            time.sleep(self.poll_interval)
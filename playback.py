@@ -0,0 +1,159 @@
+"""
+视频播放策略：最低延迟（live） / 平滑播放（smooth）
+
+接收线程调用 push(frame, ts) 写入解码后的帧，Tk 主线程调用 pop(now) 取出
+应当渲染的帧，并通过 next_due(now) 得知下一次需要检查的时间。
+ts 为帧的时间戳（目前为到达时间），单位秒。
+"""
+
+import math
+import threading
+from collections import deque
+
+
+class LivePlayback:
+    """实时模式：只保留最新一帧，到达后立即渲染，旧帧直接丢弃"""
+
+    name = 'live'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest = None
+        self.dropped = 0
+
+    def push(self, frame, ts):
+        """写入一帧（接收线程调用）"""
+        with self._lock:
+            if self._latest is not None:
+                self.dropped += 1
+            self._latest = (frame, ts)
+
+    def pop(self, now):
+        """取出待渲染的帧，返回 (frame, ts) 或 None"""
+        with self._lock:
+            item = self._latest
+            self._latest = None
+            return item
+
+    def next_due(self, now):
+        """距离下一次可渲染还有多少秒，无帧时返回 None"""
+        with self._lock:
+            return 0.0 if self._latest is not None else None
+
+    def reset(self):
+        """清空缓冲"""
+        with self._lock:
+            self._latest = None
+            self.dropped = 0
+
+
+class SmoothPlayback:
+    """平滑模式：根据帧时间戳估计帧间隔和抖动，维持一个小的自适应抖动缓冲
+
+    - 帧间隔与抖动使用 RFC 3550 风格的指数平滑估计
+    - 目标缓冲深度 = 1 + jitter_gain * 抖动 / 帧间隔（向上取整，不超过 max_frames-1）
+    - 按估计的帧间隔匀速出帧，缓冲偏深时略微加快、偏浅时略微放慢
+
+    参数:
+        max_frames: 缓冲最多保留的帧数，超出时丢弃最旧的帧
+        jitter_gain: 抖动放大系数，越大越平滑、延迟越高
+        initial_interval: 初始帧间隔估计（秒）
+    """
+
+    name = 'smooth'
+
+    def __init__(self, max_frames=5, jitter_gain=3.0, initial_interval=1 / 30):
+        self.max_frames = max_frames
+        self.jitter_gain = jitter_gain
+        self.initial_interval = initial_interval
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空缓冲并重置估计值"""
+        with self._lock:
+            self._frames = deque()
+            self._last_ts = None
+            self._next_due = None
+            self.interval = self.initial_interval
+            self.jitter = 0.0
+            self.dropped = 0
+
+    def push(self, frame, ts):
+        """写入一帧（接收线程调用）"""
+        with self._lock:
+            if self._last_ts is not None:
+                delta = ts - self._last_ts
+                if delta > 0:
+                    self.jitter += (abs(delta - self.interval) - self.jitter) / 16
+                    self.interval += (delta - self.interval) / 16
+            self._last_ts = ts
+            self._frames.append((frame, ts))
+            while len(self._frames) > self.max_frames:
+                self._frames.popleft()
+                self.dropped += 1
+
+    def target_depth(self):
+        """当前目标缓冲深度（帧）"""
+        # 至少多缓冲一帧，才能吸收晚到的帧
+        depth = 1 + math.ceil(self.jitter_gain * self.jitter / max(self.interval, 1e-3))
+        return min(self.max_frames - 1, depth)
+
+    def pop(self, now):
+        """取出待渲染的帧，返回 (frame, ts) 或 None"""
+        with self._lock:
+            if not self._frames:
+                # 缓冲耗尽，下一帧到达后重新缓冲
+                self._next_due = None
+                return None
+
+            target = self.target_depth()
+            if self._next_due is None:
+                # 缓冲到目标深度（或最旧帧已等待足够久）后开始出帧
+                waited = now - self._frames[0][1]
+                if len(self._frames) < target and waited < target * self.interval:
+                    return None
+                self._next_due = now
+
+            if now < self._next_due:
+                return None
+
+            item = self._frames.popleft()
+
+            # 根据缓冲深度微调出帧节奏
+            depth = len(self._frames)
+            if depth > target:
+                pace = self.interval * 0.9
+            elif depth < target - 1:
+                pace = self.interval * 1.1
+            else:
+                pace = self.interval
+            # 渲染落后时不累积欠账
+            self._next_due = max(self._next_due + pace, now - self.interval)
+            return item
+
+    def next_due(self, now):
+        """距离下一次可渲染还有多少秒，无帧时返回 None"""
+        with self._lock:
+            if not self._frames:
+                return None
+            if self._next_due is None:
+                target = self.target_depth()
+                if len(self._frames) >= target:
+                    return 0.0
+                waited = now - self._frames[0][1]
+                return max(0.0, target * self.interval - waited)
+            return max(0.0, self._next_due - now)
+
+
+PLAYBACK_MODES = {
+    LivePlayback.name: LivePlayback,
+    SmoothPlayback.name: SmoothPlayback,
+}
+
+
+def create_playback(mode):
+    """按名称创建播放策略（'live' 或 'smooth'）"""
+    if mode not in PLAYBACK_MODES:
+        raise ValueError(f"未知播放模式: {mode}")
+    return PLAYBACK_MODES[mode]()
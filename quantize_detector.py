@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+检测模型 INT8 静态量化与评估
+
+1. 校准并生成量化模型（结果缓存到 models/<模型名>_<尺寸>_int8.onnx）：
+       python quantize_detector.py calibrate --data recordings/drive.mp4
+       python quantize_detector.py calibrate --data calib_images/ --num-frames 200
+2. 对比 FP32 与 INT8 的检测一致性（mAP 替代指标）和单帧延迟：
+       python quantize_detector.py report --data recordings/test.mp4 --output report.json
+3. 在检测后端中使用量化模型：
+       create_detector('onnxruntime', 'yolov8n.pt', int8=True)
+   或在 config.json 中设置 "detector_int8": true
+
+依赖：pip install onnxruntime onnx
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+from compare_backends import match_detections
+from detectors import (OnnxRuntimeDetector, export_onnx, letterbox_batch,
+                       quantized_model_path)
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def iter_frames(source, max_frames, stride=1):
+    """从图片目录或视频文件中按步长读取帧"""
+    source = Path(source)
+    count = 0
+    if source.is_dir():
+        paths = sorted(p for p in source.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        for path in paths[::stride]:
+            frame = cv2.imread(str(path))
+            if frame is None:
+                continue
+            yield frame
+            count += 1
+            if count >= max_frames:
+                return
+    else:
+        cap = cv2.VideoCapture(str(source))
+        index = 0
+        try:
+            while count < max_frames:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if index % stride == 0:
+                    yield frame
+                    count += 1
+                index += 1
+        finally:
+            cap.release()
+
+
+def make_calibration_reader(source, input_name, imgsz, num_frames, stride):
+    """构造 ONNX Runtime 校准数据读取器，按需逐帧 letterbox"""
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class FrameCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self.frames = iter_frames(source, num_frames, stride)
+            self.count = 0
+
+        def get_next(self):
+            frame = next(self.frames, None)
+            if frame is None:
+                return None
+            self.count += 1
+            batch, _ = letterbox_batch([frame], (imgsz, imgsz))
+            return {input_name: batch}
+
+    return FrameCalibrationReader()
+
+
+def calibrate(weights, data, imgsz=640, num_frames=100, stride=5, force=False):
+    """静态 INT8 校准，返回量化模型路径"""
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import (CalibrationMethod, QuantFormat, QuantType,
+                                          quantize_static)
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    output_path = quantized_model_path(weights, imgsz)
+    if output_path.exists() and not force:
+        print(f"已存在量化模型: {output_path}（使用 --force 重新生成）")
+        return output_path
+
+    fp32_path = export_onnx(weights, imgsz)
+    prepared_path = fp32_path.with_name(fp32_path.stem + '_prep.onnx')
+    quant_pre_process(str(fp32_path), str(prepared_path))
+
+    input_name = ort.InferenceSession(
+        str(prepared_path), providers=['CPUExecutionProvider']).get_inputs()[0].name
+    reader = make_calibration_reader(data, input_name, imgsz, num_frames, stride)
+
+    print(f"正在校准: {data}（最多 {num_frames} 帧，步长 {stride}）")
+    start = time.perf_counter()
+    quantize_static(
+        str(prepared_path), str(output_path), reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+    prepared_path.unlink(missing_ok=True)
+
+    # 保留类别名等元数据
+    source_model = onnx.load(str(fp32_path), load_external_data=False)
+    quant_model = onnx.load(str(output_path))
+    existing = {prop.key for prop in quant_model.metadata_props}
+    for prop in source_model.metadata_props:
+        if prop.key not in existing:
+            quant_model.metadata_props.append(prop)
+    onnx.save(quant_model, str(output_path))
+
+    print(f"校准完成，使用 {reader.count} 帧，耗时 {time.perf_counter() - start:.1f}s: {output_path}")
+    return output_path
+
+
+def summarize_latency(latencies):
+    """延迟统计（毫秒）"""
+    ms = sorted(t * 1000 for t in latencies)
+    return {
+        'mean_ms': statistics.mean(ms),
+        'p50_ms': statistics.median(ms),
+        'p95_ms': ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+    }
+
+
+def report(weights, data, imgsz=640, num_frames=200, stride=1, num_threads=0,
+           iou_threshold=0.5):
+    """对比 FP32 与 INT8 模型的检测一致性和延迟"""
+    frames = list(iter_frames(data, num_frames, stride))
+    if not frames:
+        raise ValueError(f"没有读取到评估帧: {data}")
+
+    detectors = {
+        'fp32': OnnxRuntimeDetector(weights, imgsz, num_threads=num_threads),
+        'int8': OnnxRuntimeDetector(weights, imgsz, num_threads=num_threads, int8=True),
+    }
+    outputs, latencies = {}, {}
+    for name, detector in detectors.items():
+        detector.warmup()
+        outputs[name], latencies[name] = [], []
+        for frame in frames:
+            t0 = time.perf_counter()
+            outputs[name].append(detector.detect(frame))
+            latencies[name].append(time.perf_counter() - t0)
+
+    # 以 FP32 结果作为“标注”，计算 INT8 的召回/精确/F1 作为 mAP 替代指标
+    ref_total = sum(len(d) for d in outputs['fp32'])
+    int8_total = sum(len(d) for d in outputs['int8'])
+    matched = sum(match_detections(ref, cand, iou_threshold)
+                  for ref, cand in zip(outputs['fp32'], outputs['int8']))
+    recall = matched / ref_total if ref_total else 1.0
+    precision = matched / int8_total if int8_total else 1.0
+    f1 = 2 * recall * precision / (recall + precision) if recall + precision else 0.0
+
+    fp32_latency = summarize_latency(latencies['fp32'])
+    int8_latency = summarize_latency(latencies['int8'])
+    return {
+        'weights': str(weights),
+        'data': str(data),
+        'frames': len(frames),
+        'iou_threshold': iou_threshold,
+        'agreement': {'recall': recall, 'precision': precision, 'f1': f1,
+                      'fp32_detections': ref_total, 'int8_detections': int8_total},
+        'latency': {'fp32': fp32_latency, 'int8': int8_latency},
+        'speedup': fp32_latency['mean_ms'] / int8_latency['mean_ms'],
+        'model_size_mb': {
+            'fp32': Path(detectors['fp32'].model_path).stat().st_size / 1e6,
+            'int8': Path(detectors['int8'].model_path).stat().st_size / 1e6,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检测模型 INT8 量化")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    cal = sub.add_parser('calibrate', help="静态 INT8 校准")
+    cal.add_argument('--data', required=True, help="校准图片目录或录制视频")
+    cal.add_argument('--weights', default='yolov8n.pt')
+    cal.add_argument('--imgsz', type=int, default=640)
+    cal.add_argument('--num-frames', type=int, default=100)
+    cal.add_argument('--stride', type=int, default=5, help="视频抽帧步长，避免相邻帧重复")
+    cal.add_argument('--force', action='store_true')
+
+    rep = sub.add_parser('report', help="FP32 与 INT8 对比报告")
+    rep.add_argument('--data', required=True, help="评估图片目录或视频")
+    rep.add_argument('--weights', default='yolov8n.pt')
+    rep.add_argument('--imgsz', type=int, default=640)
+    rep.add_argument('--num-frames', type=int, default=200)
+    rep.add_argument('--stride', type=int, default=1)
+    rep.add_argument('--threads', type=int, default=0)
+    rep.add_argument('--output', default=None, help="保存 JSON 报告的路径")
+
+    args = parser.parse_args()
+    try:
+        if args.command == 'calibrate':
+            calibrate(args.weights, args.data, args.imgsz, args.num_frames,
+                      args.stride, args.force)
+        else:
+            result = report(args.weights, args.data, args.imgsz, args.num_frames,
+                            args.stride, args.threads)
+            agreement, latency = result['agreement'], result['latency']
+            print(f"评估帧数: {result['frames']}")
+            print(f"一致性（以FP32为参考）: 召回 {agreement['recall']:.1%}, "
+                  f"精确 {agreement['precision']:.1%}, F1 {agreement['f1']:.3f}")
+            print(f"FP32: 平均 {latency['fp32']['mean_ms']:.1f}ms, P95 {latency['fp32']['p95_ms']:.1f}ms")
+            print(f"INT8: 平均 {latency['int8']['mean_ms']:.1f}ms, P95 {latency['int8']['p95_ms']:.1f}ms")
+            print(f"加速比: {result['speedup']:.2f}x")
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, ensure_ascii=False, indent=2)
+                print(f"报告已保存: {args.output}")
+    except Exception as e:
+        print(f"执行失败: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+启动耗时统计
+
+进程内第一次导入本模块时开始计时（main_ai.py 最先导入它）。
+- mark(name): 记录某个里程碑距离启动的时间（只记录第一次）
+- record(name, seconds): 记录某个阶段自身的耗时（如模型加载、预热）
+- summary(): 生成一行耗时明细，用于日志
+"""
+
+import threading
+import time
+
+STAGE_LABELS = {
+    'import': '模块导入',
+    'ui': '界面就绪',
+    'model_import': '推理库导入',
+    'model_load': '模型加载',
+    'warmup': '预热',
+    'first_frame': '首帧显示',
+    'first_detection': '首次检测',
+}
+
+
+class StartupTimer:
+    """启动阶段计时器"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = {}      # 里程碑 -> 距启动的秒数
+        self.durations = {}  # 阶段 -> 自身耗时（秒）
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        """记录里程碑（重复调用只保留第一次），返回距启动的秒数"""
+        with self._lock:
+            return self.marks.setdefault(name, time.perf_counter() - self.start)
+
+    def record(self, name, seconds):
+        """记录阶段耗时"""
+        with self._lock:
+            self.durations[name] = seconds
+
+    def summary(self):
+        """耗时明细，阶段耗时在前，里程碑（T+秒）在后"""
+        with self._lock:
+            parts = [f"{STAGE_LABELS.get(k, k)} {v:.2f}s" for k, v in self.durations.items()]
+            parts += [f"{STAGE_LABELS.get(k, k)} T+{v:.2f}s"
+                      for k, v in sorted(self.marks.items(), key=lambda item: item[1])]
+        return ", ".join(parts)
+
+
+# 进程内共享的计时器
+STARTUP = StartupTimer()
@@ -0,0 +1,377 @@
+"""
+遥测通道：小车端检测结果的紧凑消息格式与收发
+
+协议（默认端口 5002）：每条消息一行 JSON（UTF-8，以 '\\n' 结尾）
+    连接建立后服务端先发送类别表:
+        {"t": "classes", "names": {"0": "person", ...}}
+    之后每次推理发送一条检测消息:
+        {"t": "det", "seq": 帧序号, "ts": 采集时间戳, "ms": 推理耗时,
+         "w": 帧宽, "h": 帧高, "d": [[类别ID, 置信度, x1, y1, x2, y2], ...]}
+
+- TelemetryServer：小车端，接受订阅连接并广播消息（每个连接独立的有界队列和发送线程，
+  慢客户端只丢弃旧消息，不阻塞推理）
+- EdgeDetectionReceiver：客户端，订阅检测消息，接口与 InferenceWorker 一致
+  （start/stop/reset/latest/fps），可直接替换本地推理；连接和断线重连都在接收线程中按退避策略进行，
+  断线时清空检测结果
+"""
+
+import json
+import socket
+import threading
+import time
+from collections import deque
+
+TELEMETRY_PORT = 5002
+
+
+def encode_message(message):
+    """消息 -> 一行 JSON 字节串"""
+    return (json.dumps(message, separators=(',', ':'), ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def encode_detections(detections, seq, ts, frame_size, class_ids, infer_time=0.0):
+    """把检测结果列表编码为紧凑的检测消息
+
+    class_ids 为 类别名 -> 类别ID 的映射。
+    """
+    rows = []
+    for det in detections:
+        x1, y1, x2, y2 = det['bbox']
+        rows.append([class_ids.get(det['class'], -1), round(float(det['confidence']), 3),
+                     int(x1), int(y1), int(x2), int(y2)])
+    return encode_message({
+        't': 'det', 'seq': seq, 'ts': round(ts, 4), 'ms': round(infer_time * 1000, 1),
+        'w': frame_size[0], 'h': frame_size[1], 'd': rows,
+    })
+
+
+def decode_detections(message, class_names):
+    """检测消息 -> 检测结果列表（与 detectors.py 的格式一致）"""
+    detections = []
+    for class_id, confidence, x1, y1, x2, y2 in message.get('d', []):
+        detections.append({
+            'class': class_names.get(class_id, f"class_{class_id}"),
+            'confidence': confidence,
+            'bbox': [x1, y1, x2, y2],
+        })
+    return detections
+
+
+def scale_detections(detections, src_size, dst_size):
+    """把检测框从 src_size (w, h) 缩放到 dst_size (w, h)"""
+    if not src_size or tuple(src_size) == tuple(dst_size):
+        return detections
+    sx = dst_size[0] / src_size[0]
+    sy = dst_size[1] / src_size[1]
+    scaled = []
+    for det in detections:
+        x1, y1, x2, y2 = det['bbox']
+        det = dict(det)
+        det['bbox'] = [int(x1 * sx), int(y1 * sy), int(x2 * sx), int(y2 * sy)]
+        scaled.append(det)
+    return scaled
+
+
+class _TelemetrySubscriber:
+    """一个订阅连接：有界消息队列 + 独立发送线程
+
+    队列满时丢弃最旧的消息（检测结果只需要最新的），慢连接只会落后、丢消息，不会阻塞推理线程。
+    """
+
+    def __init__(self, sock, address, max_pending, on_close):
+        self.sock = sock
+        self.address = address
+        self.on_close = on_close
+        self.queue = deque(maxlen=max_pending)
+        self.cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name=f"TelemetrySend-{address}")
+        self.thread.daemon = True
+
+    def put(self, data):
+        with self.cond:
+            if self.closed:
+                return
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(data)
+            self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.clear()
+            self.cond.notify()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                data = self.queue.popleft()
+            try:
+                self.sock.sendall(data)
+            except Exception as e:
+                if not self.closed:
+                    print(f"发送遥测消息失败 {self.address}: {e}")
+                self.close()
+                self.on_close(self)
+                return
+
+
+class TelemetryServer:
+    """遥测广播服务（小车端）
+
+    每个订阅连接有自己的有界队列和发送线程，broadcast 只入队，不在推理线程中发送。
+
+    参数:
+        port: 监听端口
+        send_timeout: 单次发送超时（秒），超时即断开该订阅连接
+        max_pending: 每个连接最多排队的消息数，满时丢弃最旧的消息
+    """
+
+    def __init__(self, port=TELEMETRY_PORT, send_timeout=2.0, max_pending=4):
+        self.port = port
+        self.send_timeout = send_timeout
+        self.max_pending = max_pending
+        self.server_socket = None
+        self.clients = []
+        self.hello = None  # 新连接建立后首先发送的消息（类别表）
+        self._lock = threading.Lock()
+        self.running = False
+        self.messages_sent = 0
+
+    def start(self, hello=None):
+        """开始监听，hello 为新连接首先收到的消息"""
+        self.hello = encode_message(hello) if hello is not None else None
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind(('0.0.0.0', self.port))
+        self.server_socket.listen(5)
+        self.running = True
+        thread = threading.Thread(target=self._accept_loop, name="TelemetryAccept")
+        thread.daemon = True
+        thread.start()
+        print(f"遥测服务器启动在端口 {self.port}")
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                client_socket, address = self.server_socket.accept()
+            except Exception as e:
+                if self.running:
+                    print(f"接受遥测连接时出错: {e}")
+                continue
+            if not self.running:
+                client_socket.close()
+                break
+            print(f"新的遥测连接来自 {address}")
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client_socket.settimeout(self.send_timeout)
+            client = _TelemetrySubscriber(client_socket, address, self.max_pending,
+                                          self._remove)
+            if self.hello is not None:
+                client.put(self.hello)
+            with self._lock:
+                self.clients.append(client)
+            client.thread.start()
+
+    def _remove(self, client):
+        with self._lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def broadcast(self, data):
+        """向所有订阅者发送一条已编码的消息（只入队，立即返回）"""
+        with self._lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.put(data)
+        self.messages_sent += 1
+
+    def dropped(self):
+        """各订阅连接因发送太慢丢弃的消息数之和"""
+        with self._lock:
+            return sum(client.dropped for client in self.clients)
+
+    def stop(self):
+        """关闭所有连接"""
+        self.running = False
+        with self._lock:
+            clients = list(self.clients)
+            self.clients.clear()
+        for client in clients:
+            client.close()
+        if self.server_socket:
+            try:
+                self.server_socket.close()
+            except:
+                pass
+
+
+class EdgeDetectionReceiver:
+    """订阅小车端检测结果（客户端）
+
+    参数:
+        host: 小车地址
+        port: 遥测端口
+        on_result: 可选回调 on_result(detections, seq, ts)，收到检测消息后在接收线程中调用；
+            连接中断时以空结果 ([], 0, 0.0) 调用一次
+    """
+
+    # 检测时间戳来自小车时钟，不能与本地时间直接比较
+    remote_clock = True
+
+    def __init__(self, host, port=TELEMETRY_PORT, on_result=None):
+        self.host = host
+        self.port = port
+        self.on_result = on_result
+        self.class_names = {}
+        self.frame_size = None  # 检测坐标对应的帧尺寸 (w, h)
+        self._lock = threading.Lock()
+        self._socket = None
+        self._thread = None
+        self._running = False
+        self._detections = []
+        self._result_seq = 0
+        self._result_ts = 0.0
+        self.connected = False  # 遥测连接是否建立
+        self.reconnects = 0     # 断线重连次数
+
+        # 统计计数
+        self.inference_count = 0
+        self.last_infer_time = 0.0
+        self.fps = 0.0
+        self._fps_count = 0
+        self._fps_start = time.time()
+
+    def start(self):
+        """开始接收（连接和断线重连都在接收线程中进行，不阻塞调用方）"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="EdgeDetectionReceiver")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """断开连接"""
+        self._running = False
+        sock = self._socket
+        if sock is not None:
+            try:
+                sock.close()
+            except:
+                pass
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        self._socket = None
+
+    def latest(self):
+        """返回最近一次检测结果 (检测列表, 帧序号, 采集时间戳)"""
+        with self._lock:
+            return self._detections, self._result_seq, self._result_ts
+
+    def reset(self):
+        """清空检测结果和统计"""
+        with self._lock:
+            self._detections = []
+            self._result_seq = 0
+            self._result_ts = 0.0
+        self.fps = 0.0
+        self._fps_count = 0
+        self._fps_start = time.time()
+
+    def _run(self):
+        # car_sdk 依赖本模块，这里延迟导入
+        from car_sdk import connect_with_backoff
+
+        while self._running:
+            sock, downtime = connect_with_backoff(self.host, self.port, lambda: self._running)
+            if sock is None:
+                break
+            sock.settimeout(1.0)
+            self._socket = sock
+            print(f"已连接遥测通道 {self.host}:{self.port}（耗时 {downtime * 1000:.0f}ms）")
+            self.connected = True
+            try:
+                self._receive(sock)
+            finally:
+                self.connected = False
+                self._socket = None
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+            if self._running:
+                # 连接中断：清空旧的检测结果，避免界面和跟踪继续使用冻结的检测框
+                with self._lock:
+                    self._detections = []
+                    self._result_seq = 0
+                    self._result_ts = 0.0
+                self.fps = 0.0
+                self.reconnects += 1
+                print("遥测连接中断，正在重连")
+                if self.on_result is not None:
+                    self.on_result([], 0, 0.0)
+
+    def _receive(self, sock):
+        """接收并处理消息，直到连接断开或停止"""
+        buffer = b''
+        while self._running:
+            try:
+                data = sock.recv(65536)
+            except socket.timeout:
+                continue
+            except Exception as e:
+                if self._running:
+                    print(f"接收遥测数据出错: {e}")
+                return
+            if not data:
+                return
+            buffer += data
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                if line:
+                    self._handle(line)
+
+    def _handle(self, line):
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"遥测消息解析错误: {e}")
+            return
+        kind = message.get('t')
+        if kind == 'classes':
+            self.class_names = {int(k): v for k, v in message.get('names', {}).items()}
+        elif kind == 'det':
+            detections = decode_detections(message, self.class_names)
+            with self._lock:
+                # 推理耗时先于结果更新，读到新结果时耗时已是对应的值
+                self.last_infer_time = message.get('ms', 0.0) / 1000
+                self._detections = detections
+                self._result_seq = message.get('seq', self._result_seq + 1)
+                self._result_ts = message.get('ts', time.time())
+                self.frame_size = (message.get('w'), message.get('h'))
+            self.inference_count += 1
+
+            # 推理FPS（小车端推理速率）
+            self._fps_count += 1
+            elapsed = time.time() - self._fps_start
+            if elapsed >= 1.0:
+                self.fps = self._fps_count / elapsed
+                self._fps_count = 0
+                self._fps_start = time.time()
+            
+            if self.on_result is not None:
+                self.on_result(detections, self._result_seq, self._result_ts)
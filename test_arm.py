@@ -22,6 +22,9 @@ SO101 机械臂基础测试脚本
 2. 运行测试：
    python3 test_arm.py
 3. 按提示输入串口号和 robot_id（默认 my_follower_arm），然后根据菜单选择动作
+
+每个动作按设定时长执行，然后根据后台回读的位置等待到位（不再固定 sleep），
+并打印实际用时和剩余偏差。
 """
 
 import sys
@@ -46,6 +49,18 @@ def select_robot_id(default: str = "my_follower_arm") -> str:
     return rid or default
 
 
+def wait_arrival(arm: ArmController, joint_ids=None, timeout: float = 3.0) -> None:
+    """等待动作到位，打印到位用时或剩余偏差。"""
+    start = time.monotonic()
+    reached = arm.wait_until_reached(joint_ids, tolerance=2.0, timeout=timeout)
+    elapsed = (time.monotonic() - start) * 1000
+    if reached:
+        print(f"完成（轨迹结束后 {elapsed:.0f} ms 到位）")
+    else:
+        errors = ", ".join(f"关节{jid}: {err:+.1f}" for jid, err in arm.position_error().items())
+        print(f"未在 {timeout:.1f}s 内到位，偏差 [{errors}]")
+
+
 def main() -> None:
     print("==== SO101 机械臂测试程序 ====")
     port = select_port()
@@ -78,28 +93,25 @@ def main() -> None:
             if choice == "1":
                 print("执行：回到初始姿态...")
                 arm.go_home(duration_ms=1500)
-                time.sleep(2.0)
-                print("完成")
+                wait_arrival(arm)
 
             elif choice == "2":
                 print("执行：关节2 上下摆动一次...")
                 arm.set_joint_angle(2, 30, duration_ms=600)
-                time.sleep(0.8)
+                wait_arrival(arm, [2])
                 arm.set_joint_angle(2, -10, duration_ms=600)
-                time.sleep(0.8)
-                print("完成")
+                wait_arrival(arm, [2])
 
             elif choice == "3":
                 print("执行：打开夹爪...")
                 arm.open_gripper(open_percent=100.0)
-                time.sleep(1.0)
-                print("完成")
+                wait_arrival(arm, [6])
 
             elif choice == "4":
                 print("执行：闭合夹爪...")
                 arm.close_gripper(close_percent=0.0)
-                time.sleep(1.0)
-                print("完成")
+                # 夹住物体时到不了 0%，超时只说明被物体挡住
+                wait_arrival(arm, [6], timeout=1.0)
 
             elif choice == "5":
                 try:
@@ -116,8 +128,7 @@ def main() -> None:
 
                 print(f"执行：关节 {jid} -> {ang} 度，用时 {dur} ms ...")
                 arm.set_joint_angle(jid, ang, duration_ms=dur)
-                time.sleep(dur / 1000.0 + 0.3)
-                print("完成")
+                wait_arrival(arm, [jid])
 
             elif choice == "0":
                 print("退出测试程序。")
@@ -129,6 +140,9 @@ def main() -> None:
     except KeyboardInterrupt:
         print("\n收到 Ctrl+C，准备退出...")
     finally:
+        print(f"轨迹时序统计: {arm.timing_stats()}")
+        if arm.state_poller is not None:
+            print(f"状态轮询统计: {arm.state_poller.stats()}")
         arm.close()
         print("串口已关闭。")
 
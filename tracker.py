@@ -0,0 +1,269 @@
+"""
+轻量多目标跟踪器（SORT / ByteTrack 风格）
+
+- 每个轨迹使用匀速卡尔曼滤波，状态为 [cx, cy, s, r, vcx, vcy, vs]
+  （中心点、面积、宽高比及其速度），所有轨迹的预测与更新按批向量化计算
+- 关联使用 IoU 代价矩阵 + 匈牙利算法（有 scipy 时），否则退化为贪心匹配
+- 按置信度分两轮关联（ByteTrack）：先用高分检测，再用低分检测补充未匹配轨迹
+
+典型用法：检测器只在部分帧运行（如 5Hz），其余帧调用 predict() 得到框，
+以 30Hz 绘制稳定的带 ID 的检测框。
+
+检测结果在原有格式基础上增加 'track_id' 字段：
+    {'class': 类别名, 'confidence': 置信度, 'bbox': [x1, y1, x2, y2], 'track_id': 轨迹ID}
+"""
+
+import numpy as np
+
+_solver = None  # scipy 的匈牙利算法，首次使用时导入（scipy.optimize 导入较慢）
+_solver_loaded = False
+
+# 状态转移矩阵（匀速模型，面积也带速度，宽高比视为常数）
+_F = np.eye(7)
+_F[0, 4] = _F[1, 5] = _F[2, 6] = 1.0
+# 观测矩阵
+_H = np.eye(4, 7)
+# 过程噪声 / 观测噪声 / 初始协方差（与 SORT 一致）
+_Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+_R = np.diag([1.0, 1.0, 10.0, 10.0])
+_P0 = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+
+
+def xyxy_to_z(boxes):
+    """[x1, y1, x2, y2] -> [cx, cy, 面积, 宽高比]"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    w = boxes[:, 2] - boxes[:, 0]
+    h = boxes[:, 3] - boxes[:, 1]
+    return np.stack([boxes[:, 0] + w / 2, boxes[:, 1] + h / 2,
+                     w * h, w / np.maximum(h, 1e-6)], axis=1)
+
+
+def x_to_xyxy(states):
+    """卡尔曼状态 -> [x1, y1, x2, y2]"""
+    area = np.maximum(states[:, 2], 1e-6)
+    w = np.sqrt(area * np.maximum(states[:, 3], 1e-6))
+    h = area / np.maximum(w, 1e-6)
+    return np.stack([states[:, 0] - w / 2, states[:, 1] - h / 2,
+                     states[:, 0] + w / 2, states[:, 1] + h / 2], axis=1)
+
+
+def iou_matrix(a, b):
+    """两组框的 IoU 矩阵，形状 (len(a), len(b))"""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def select_target(detections, target_class, track_id=None):
+    """从检测结果中选出跟随/跟踪的目标
+
+    优先沿用 track_id 对应的轨迹（目标不会在相近的两个框之间跳动），否则取目标类别中面积最大的框。
+    调用方用返回结果的 'track_id' 更新自己记住的轨迹ID。没有目标类别时返回 None。
+    """
+    candidates = [d for d in detections if d['class'] == target_class]
+    if not candidates:
+        return None
+    if track_id is not None:
+        for det in candidates:
+            if det.get('track_id') == track_id:
+                return det
+    return max(candidates, key=lambda d: (d['bbox'][2] - d['bbox'][0])
+               * (d['bbox'][3] - d['bbox'][1]))
+
+
+def load_solver():
+    """导入匈牙利算法（可在后台线程提前调用，避免首次关联时卡顿），scipy 不可用时返回 None"""
+    global _solver, _solver_loaded
+    if not _solver_loaded:
+        try:
+            from scipy.optimize import linear_sum_assignment
+            _solver = linear_sum_assignment
+        except ImportError:
+            _solver = None
+        _solver_loaded = True
+    return _solver
+
+
+def assign(iou, threshold):
+    """按 IoU 矩阵做一一匹配，返回 [(行, 列), ...]，只保留 IoU >= threshold 的匹配"""
+    if iou.size == 0:
+        return []
+    solver = load_solver()
+    if solver is not None:
+        rows, cols = solver(-iou)
+        pairs = zip(rows, cols)
+    else:
+        # 贪心：按 IoU 从大到小依次匹配
+        order = np.dstack(np.unravel_index(np.argsort(-iou, axis=None), iou.shape))[0]
+        used_r, used_c, pairs = set(), set(), []
+        for r, c in order:
+            if iou[r, c] < threshold:
+                break
+            if r in used_r or c in used_c:
+                continue
+            used_r.add(r)
+            used_c.add(c)
+            pairs.append((r, c))
+    return [(int(r), int(c)) for r, c in pairs if iou[r, c] >= threshold]
+
+
+class MultiObjectTracker:
+    """向量化 SORT/ByteTrack 风格跟踪器
+
+    参数:
+        iou_threshold: 关联所需的最小 IoU
+        high_threshold: 高分检测阈值（低于此分数的检测只用于第二轮关联，不新建轨迹）
+        max_age: 轨迹连续多少次更新未匹配后删除
+        min_hits: 轨迹至少匹配多少次后才输出
+        class_aware: 是否只在同类别之间关联
+    """
+
+    def __init__(self, iou_threshold=0.3, high_threshold=0.5, max_age=5, min_hits=2,
+                 class_aware=True):
+        self.iou_threshold = iou_threshold
+        self.high_threshold = high_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.class_aware = class_aware
+        self.reset()
+
+    def reset(self):
+        """清空所有轨迹"""
+        self.x = np.zeros((0, 7))        # 状态
+        self.P = np.zeros((0, 7, 7))     # 协方差
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.classes = []
+        self.confidences = np.zeros(0)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.misses = np.zeros(0, dtype=np.int64)  # 连续未匹配的更新次数
+        self.next_id = 1
+        self.detection_ids = []  # 最近一次 update 中每个输入检测关联到的轨迹ID，未关联为 -1
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _predict(self):
+        """所有轨迹前进一步（批量卡尔曼预测）"""
+        if len(self.ids) == 0:
+            return
+        # 面积不能为负
+        shrink = (self.x[:, 2] + self.x[:, 6]) <= 0
+        self.x[shrink, 6] = 0.0
+        self.x = self.x @ _F.T
+        self.P = _F @ self.P @ _F.T + _Q
+
+    def _correct(self, track_idx, z):
+        """批量卡尔曼更新，track_idx 与观测 z (K, 4) 一一对应"""
+        x = self.x[track_idx]
+        P = self.P[track_idx]
+        S = _H @ P @ _H.T + _R                      # (K, 4, 4)
+        K = P @ _H.T @ np.linalg.inv(S)             # (K, 7, 4)
+        y = z - x @ _H.T                            # (K, 4)
+        self.x[track_idx] = x + np.einsum('kij,kj->ki', K, y)
+        self.P[track_idx] = (np.eye(7) - K @ _H) @ P
+
+    def predict(self):
+        """无检测帧：推进一步并返回预测的检测结果"""
+        self._predict()
+        return self._outputs()
+
+    def update(self, detections):
+        """有检测帧：推进一步、关联并返回带 track_id 的检测结果"""
+        self._predict()
+
+        boxes = np.array([d['bbox'] for d in detections], dtype=np.float64).reshape(-1, 4)
+        scores = np.array([d['confidence'] for d in detections], dtype=np.float64)
+        classes = [d['class'] for d in detections]
+
+        unmatched_tracks = np.arange(len(self.ids))
+        matched_tracks, matched_dets = [], []
+        high = np.flatnonzero(scores >= self.high_threshold)
+        low = np.flatnonzero(scores < self.high_threshold)
+
+        # 两轮关联：高分检测优先，低分检测补充
+        for det_group in (high, low):
+            if len(det_group) == 0 or len(unmatched_tracks) == 0:
+                continue
+            iou = iou_matrix(x_to_xyxy(self.x[unmatched_tracks]), boxes[det_group])
+            if self.class_aware:
+                same = np.array([[self.classes[t] == classes[d] for d in det_group]
+                                 for t in unmatched_tracks], dtype=bool)
+                iou = np.where(same, iou, 0.0)
+            pairs = assign(iou, self.iou_threshold)
+            if not pairs:
+                continue
+            rows = [r for r, _ in pairs]
+            matched_tracks.extend(unmatched_tracks[rows])
+            matched_dets.extend(det_group[[c for _, c in pairs]])
+            unmatched_tracks = np.delete(unmatched_tracks, rows)
+
+        matched_tracks = np.array(matched_tracks, dtype=np.int64)
+        matched_dets = np.array(matched_dets, dtype=np.int64)
+
+        detection_ids = np.full(len(detections), -1, dtype=np.int64)
+        detection_ids[matched_dets] = self.ids[matched_tracks]
+
+        # 更新匹配上的轨迹
+        if len(matched_tracks):
+            self._correct(matched_tracks, xyxy_to_z(boxes[matched_dets]))
+            self.hits[matched_tracks] += 1
+            self.misses[matched_tracks] = 0
+            self.confidences[matched_tracks] = scores[matched_dets]
+            for t, d in zip(matched_tracks, matched_dets):
+                self.classes[t] = classes[d]
+        self.misses[unmatched_tracks] += 1
+
+        # 未匹配的高分检测新建轨迹
+        new_dets = np.setdiff1d(high, matched_dets)
+        if len(new_dets):
+            z = xyxy_to_z(boxes[new_dets])
+            x = np.zeros((len(new_dets), 7))
+            x[:, :4] = z
+            self.x = np.vstack([self.x, x])
+            self.P = np.concatenate([self.P, np.repeat(_P0[None], len(new_dets), axis=0)])
+            self.ids = np.concatenate([self.ids, np.arange(self.next_id,
+                                                           self.next_id + len(new_dets))])
+            detection_ids[new_dets] = self.ids[-len(new_dets):]
+            self.next_id += len(new_dets)
+            self.classes.extend(classes[d] for d in new_dets)
+            self.confidences = np.concatenate([self.confidences, scores[new_dets]])
+            self.hits = np.concatenate([self.hits, np.ones(len(new_dets), dtype=np.int64)])
+            self.misses = np.concatenate([self.misses, np.zeros(len(new_dets), dtype=np.int64)])
+
+        # 删除长时间未匹配的轨迹
+        alive = self.misses <= self.max_age
+        if not alive.all():
+            self.x, self.P = self.x[alive], self.P[alive]
+            self.ids = self.ids[alive]
+            self.classes = [c for c, keep in zip(self.classes, alive) if keep]
+            self.confidences = self.confidences[alive]
+            self.hits, self.misses = self.hits[alive], self.misses[alive]
+
+        self.detection_ids = detection_ids.tolist()
+        return self._outputs()
+
+    def _outputs(self):
+        """把当前轨迹转换为检测结果列表
+
+        只输出已确认且最近一次更新匹配上的轨迹，丢失的轨迹保留用于重新关联但不绘制。
+        """
+        if len(self.ids) == 0:
+            return []
+        visible = (self.hits >= self.min_hits) & (self.misses == 0)
+        boxes = x_to_xyxy(self.x[visible]).astype(int)
+        outputs = []
+        for box, idx in zip(boxes, np.flatnonzero(visible)):
+            outputs.append({
+                'class': self.classes[idx],
+                'confidence': float(self.confidences[idx]),
+                'bbox': [int(v) for v in box],
+                'track_id': int(self.ids[idx]),
+            })
+        return outputs
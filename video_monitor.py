@@ -1,16 +1,19 @@
 import tkinter as tk
 from tkinter import ttk
 import cv2
-from PIL import Image, ImageTk
 import time
-from queue import Queue
 import logging
 import os
 import socket
-import numpy as np
 import threading
 import struct
 import pickle
+from frame_decode import decode_for_display
+from display_surface import DisplaySurface
+from playback import create_playback
+from gui_log import BatchedTextHandler
+from hud import HudCounters, HudOverlay
+from car_sdk import connect_with_backoff
 
 class VideoMonitor:
     def __init__(self, root, host="192.168.1.100", port=5001):
@@ -30,15 +33,17 @@ class VideoMonitor:
         
         # 初始化其他变量
         self.camera_running = False
-        self.frame_queue = Queue(maxsize=2)
-        self.processing_frame = False
-        self.frame_interval = 1/30
-        self.last_frame_time = 0
-        self.frame_count = 0
-        self.fps_update_interval = 1.0
-        self.last_fps_update = time.time()
+        self.playback = create_playback('live')  # 播放策略：live / smooth
+        self.render_pending = False
+        self.added_latency = 0.0  # 播放策略附加的延迟（到达 -> 渲染，平滑值）
+        self.hud_counters = HudCounters()  # 接收/显示帧率、帧龄、码率和丢帧统计
+        self.latency_update_interval = 1.0
+        self.last_latency_update = time.time()
         self.video_socket = None
         self.video_thread = None
+        self.stall_timeout = 3.0  # 超过该时间收不到数据视为连接中断（秒）
+        self.reconnect_times = []  # 每次视频重连的耗时（秒）
+        self.display_size = (0, 0)  # 视频显示区域大小，由<Configure>事件更新
         
         # 创建界面元素
         self.create_widgets()
@@ -68,8 +73,14 @@ class VideoMonitor:
         self.video_frame = ttk.Frame(main_frame)
         self.video_frame.pack(fill=tk.BOTH, expand=True)
         
-        self.video_label = ttk.Label(self.video_frame, background='black')
-        self.video_label.pack(fill=tk.BOTH, expand=True)
+        self.video_canvas = tk.Canvas(self.video_frame, background='black', highlightthickness=0)
+        self.video_canvas.pack(fill=tk.BOTH, expand=True)
+        self.video_canvas.bind('<Configure>', self.on_video_resize)
+        self.video_surface = DisplaySurface(self.video_canvas)
+        
+        # HUD 叠加在视频左上角，点击画面显示/隐藏
+        self.hud = HudOverlay(self.video_canvas, self.hud_counters)
+        self.video_canvas.bind('<Button-1>', lambda event: self.hud.toggle())
         
         # 控制区域
         control_frame = ttk.Frame(main_frame)
@@ -101,9 +112,18 @@ class VideoMonitor:
                                         command=self.take_snapshot)
         self.snapshot_button.pack(side=tk.LEFT, padx=5)
         
-        # FPS显示
-        self.fps_label = ttk.Label(button_frame, text="FPS: 0")
-        self.fps_label.pack(side=tk.LEFT, padx=5)
+        # 播放模式选择
+        self.playback_var = tk.StringVar(value=self.playback.name)
+        ttk.Radiobutton(button_frame, text="实时", value='live',
+                        variable=self.playback_var,
+                        command=self.on_playback_mode_change).pack(side=tk.LEFT)
+        ttk.Radiobutton(button_frame, text="平滑", value='smooth',
+                        variable=self.playback_var,
+                        command=self.on_playback_mode_change).pack(side=tk.LEFT)
+        
+        # 播放模式附加延迟显示
+        self.latency_label = ttk.Label(button_frame, text="附加延迟: 0ms")
+        self.latency_label.pack(side=tk.LEFT, padx=5)
         
         # 日志区域
         log_frame = ttk.Frame(main_frame)
@@ -126,6 +146,7 @@ class VideoMonitor:
             # 创建socket连接
             self.video_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.video_socket.connect((self.host, self.port))
+            self.video_socket.settimeout(self.stall_timeout)
             
             # 启动视频接收线程
             self.video_thread = threading.Thread(target=self.receive_video)
@@ -138,6 +159,22 @@ class VideoMonitor:
             self.logger.error(f"连接视频流失败: {e}")
             self.stop_camera()
 
+    def reconnect_video(self):
+        """视频连接中断后按退避策略重连，成功返回 True（停止播放时返回 False）"""
+        if self.video_socket:
+            try:
+                self.video_socket.close()
+            except OSError:
+                pass
+        sock, downtime = connect_with_backoff(self.host, self.port, lambda: self.camera_running)
+        if sock is None:
+            return False
+        sock.settimeout(self.stall_timeout)
+        self.video_socket = sock
+        self.reconnect_times.append(downtime)
+        self.logger.info(f"视频已重连，耗时 {downtime * 1000:.0f}ms")
+        return True
+
     def receive_video(self):
         """接收视频流"""
         try:
@@ -146,27 +183,30 @@ class VideoMonitor:
                     # 接收帧大小
                     header = self.receive_all(4)
                     if not header:
-                        break
+                        raise ConnectionError("连接已关闭")
                     frame_size = struct.unpack('>L', header)[0]
                     
                     # 接收帧数据
                     frame_data = self.receive_all(frame_size)
                     if not frame_data:
-                        break
+                        raise ConnectionError("连接已关闭")
                     
-                    # 解码图像
-                    frame = cv2.imdecode(
-                        np.frombuffer(frame_data, dtype=np.uint8),
-                        cv2.IMREAD_COLOR
-                    )
+                    # 按当前显示区域大小解码
+                    display_w, display_h = self.display_size
+                    frame = decode_for_display(frame_data, display_w, display_h)
                     
+                    self.hud_counters.frame_received(frame_size + 4)
                     if frame is not None:
                         # 处理帧
                         self.process_frame(frame)
                     
                 except Exception as e:
-                    self.logger.error(f"接收视频数据错误: {e}")
-                    break
+                    if not self.camera_running:
+                        break
+                    # Wi-Fi 短暂中断等：自动重连，不需要手动重新开启摄像头
+                    self.logger.warning(f"视频连接中断: {e}，正在重连")
+                    if not self.reconnect_video():
+                        break
                 
         except Exception as e:
             self.logger.error(f"视频接收线程错误: {e}")
@@ -176,6 +216,10 @@ class VideoMonitor:
             self.camera_running = False
             self.root.after(0, self.update_camera_button)
 
+    def on_video_resize(self, event):
+        """记录视频显示区域大小（留出边框，避免标签被图像撑大）"""
+        self.display_size = (max(0, event.width - 4), max(0, event.height - 4))
+
     def receive_all(self, size):
         """接收指定大小的数据"""
         data = bytearray()
@@ -193,6 +237,7 @@ class VideoMonitor:
     def cleanup(self):
         """清理资源"""
         self.stop_camera()
+        self.hud.stop()
         if hasattr(self, 'root'):
             self.root.destroy()
 
@@ -209,6 +254,7 @@ class VideoMonitor:
             try:
                 self.camera_running = True
                 self.camera_button.configure(text="关闭摄像头")
+                self.hud_counters.reset()
                 self.logger.info("正在连接视频流...")
                 self.connect_to_video_stream()
             except Exception as e:
@@ -232,6 +278,10 @@ class VideoMonitor:
             if hasattr(self, 'video_thread') and self.video_thread and self.video_thread.is_alive():
                 self.video_thread.join(timeout=1.0)
             
+            if self.reconnect_times:
+                self.logger.info(f"视频重连 {len(self.reconnect_times)} 次，平均耗时 "
+                                 f"{sum(self.reconnect_times) / len(self.reconnect_times) * 1000:.0f}ms")
+            
             # 清理资源
             self.cleanup_video()
             self.camera_button.configure(text="开启摄像头")
@@ -240,111 +290,90 @@ class VideoMonitor:
     def cleanup_video(self):
         """清理视频相关资源"""
         # 清空帧队列
-        while not self.frame_queue.empty():
-            try:
-                self.frame_queue.get_nowait()
-            except:
-                pass
+        self.playback.reset()
+        self.added_latency = 0.0
         
-        # 清理显示
-        self.video_label.configure(image='')
-        if hasattr(self.video_label, 'image'):
-            del self.video_label.image
-        self.fps_label.configure(text="FPS: 0")
-        
-        # 重置计数器
-        self.frame_count = 0
-        self.last_fps_update = time.time()
-        
-        # 强制垃圾回收
-        import gc
-        gc.collect()
+        # 清理显示（释放复用的PhotoImage）
+        stats = self.video_surface.stats()
+        self.logger.info(f"显示表面统计: 新建 {stats['allocations']} 次, "
+                         f"原地更新 {stats['updates']} 次, "
+                         f"缓存 {stats['cached_bytes'] / 1024:.0f} KB")
+        self.video_surface.clear()
+        self.latency_label.configure(text="附加延迟: 0ms")
 
     def process_frame(self, frame):
-        """处理接收到的视频帧"""
+        """处理接收到的视频帧（接收线程调用）"""
         try:
-            if self.frame_queue.full():
-                try:
-                    self.frame_queue.get_nowait()
-                except:
-                    pass
-            
-            self.frame_queue.put_nowait(frame)
+            self.playback.push(frame, time.time())
             
-            if not self.processing_frame:
+            if not self.render_pending:
+                self.render_pending = True
                 self.root.after_idle(self.process_next_frame)
             
         except Exception as e:
             self.logger.error(f"处理视频帧错误: {e}")
 
     def process_next_frame(self):
-        """处理队列中的下一帧"""
+        """按播放策略渲染下一帧"""
+        self.render_pending = False
         try:
-            if self.processing_frame:
-                return
-            
             current_time = time.time()
-            if current_time - self.last_frame_time < self.frame_interval:
-                self.root.after(int((self.frame_interval - 
-                                   (current_time - self.last_frame_time)) * 1000), 
-                              self.process_next_frame)
-                return
-            
-            self.processing_frame = True
+            item = self.playback.pop(current_time)
             
-            try:
-                frame = self.frame_queue.get_nowait()
-                
-                # 转换颜色空间
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                
-                # 转换为PIL图像
-                image = Image.fromarray(frame_rgb)
-                
-                # 创建PhotoImage
-                photo = ImageTk.PhotoImage(image=image)
-                
-                # 更新显示
-                self.update_video_frame(photo)
-                
-                # 更新FPS计数
-                self.frame_count += 1
-                if current_time - self.last_fps_update >= self.fps_update_interval:
-                    fps = self.frame_count / (current_time - self.last_fps_update)
-                    self.fps_label.configure(text=f"FPS: {fps:.1f}")
-                    self.frame_count = 0
-                    self.last_fps_update = current_time
-                
-                del frame_rgb
-                image.close()
-                
-            except Exception as e:
-                self.logger.error(f"处理帧数据错误: {e}")
-            
-            self.last_frame_time = current_time
-            self.processing_frame = False
+            if item is not None:
+                frame, arrival_time = item
+                try:
+                    # 转换颜色空间
+                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    
+                    # 更新显示（复用PhotoImage，原地paste）
+                    self.update_video_frame(frame_rgb)
+                    
+                    # 统计播放策略附加的延迟
+                    latency = time.time() - arrival_time
+                    self.added_latency += (latency - self.added_latency) * 0.1
+                    
+                    # 帧率、帧龄和丢帧数由 HUD 显示
+                    self.hud_counters.frame_rendered(arrival_time)
+                    self.hud_counters.dropped_frames = self.playback.dropped
+                    if current_time - self.last_latency_update >= self.latency_update_interval:
+                        self.latency_label.configure(
+                            text=f"附加延迟: {self.added_latency * 1000:.0f}ms")
+                        self.last_latency_update = current_time
+                    
+                    del frame_rgb
+                    
+                except Exception as e:
+                    self.logger.error(f"处理帧数据错误: {e}")
             
-            if not self.frame_queue.empty():
-                self.root.after_idle(self.process_next_frame)
+            # 按策略安排下一次渲染
+            delay = self.playback.next_due(time.time())
+            if delay is not None and not self.render_pending:
+                self.render_pending = True
+                self.root.after(max(1, int(delay * 1000)), self.process_next_frame)
             
         except Exception as e:
             self.logger.error(f"处理视频帧错误: {e}")
-            self.processing_frame = False
 
-    def update_video_frame(self, photo):
+    def on_playback_mode_change(self):
+        """切换播放模式"""
+        mode = self.playback_var.get()
+        if mode == self.playback.name:
+            return
+        self.playback = create_playback(mode)
+        self.added_latency = 0.0
+        self.logger.info(f"播放模式切换为: {'实时' if mode == 'live' else '平滑'}")
+
+    def update_video_frame(self, frame_rgb):
         """更新视频显示"""
         try:
-            old_photo = getattr(self.video_label, 'image', None)
-            self.video_label.configure(image=photo)
-            self.video_label.image = photo
-            if old_photo is not None:
-                del old_photo
+            self.video_surface.show(frame_rgb)
         except Exception as e:
             self.logger.error(f"更新视频帧失败: {e}")
 
     def take_snapshot(self):
         """截图功能"""
-        if hasattr(self.video_label, 'image'):
+        if self.video_surface.current is not None:
             # 创建screenshots目录（如果不存在）
             if not os.path.exists('screenshots'):
                 os.makedirs('screenshots')
@@ -353,9 +382,8 @@ class VideoMonitor:
             filename = os.path.join('screenshots', f"snapshot_{timestamp}.png")
             try:
                 # 保存当前帧
-                if hasattr(self.video_label, 'image'):
-                    # 将PhotoImage转换回PIL Image
-                    image = ImageTk.getimage(self.video_label.image)
+                image = self.video_surface.snapshot()
+                if image is not None:
                     image.save(filename)
                     self.logger.info(f"截图已保存: {filename}")
             except Exception as e:
@@ -367,23 +395,6 @@ class VideoMonitor:
 
     def setup_logging(self):
         """配置日志系统"""
-        # 创建自定义的日志处理器，将日志输出到文本框
-        class TextHandler(logging.Handler):
-            def __init__(self, text_widget):
-                super().__init__()
-                self.text_widget = text_widget
-
-            def emit(self, record):
-                msg = self.format(record)
-                def append():
-                    self.text_widget.insert(tk.END, msg + '\n')
-                    self.text_widget.see(tk.END)
-                    # 限制日志显示行数
-                    if float(self.text_widget.index('end')) > 1000:  # 超过1000行
-                        self.text_widget.delete('1.0', '100.0')  # 删除前100行
-                # 在主线程中更新GUI
-                self.text_widget.after(0, append)
-
         try:
             # 创建日志记录器
             self.logger = logging.getLogger('VideoMonitor')
@@ -393,8 +404,8 @@ class VideoMonitor:
             for handler in self.logger.handlers[:]:
                 self.logger.removeHandler(handler)
             
-            # 创建文本处理器
-            text_handler = TextHandler(self.log_text)
+            # 创建文本处理器（界面线程定时批量写入，最多保留1000行）
+            text_handler = BatchedTextHandler(self.log_text, max_lines=1000)
             
             # 设置日志格式
             formatter = logging.Formatter(
@@ -1,9 +1,7 @@
 import tkinter as tk
 from tkinter import ttk
 import cv2
-from PIL import Image, ImageTk
 import time
-from queue import Queue
 import logging
 import os
 import socket
@@ -11,14 +9,38 @@ import numpy as np
 import threading
 import struct
 import pickle
-from ultralytics import YOLO
-import torch
+from display_surface import DisplaySurface
+from inference_worker import LatestFrameSlot
+from detection_service import load_detection_service_async
+from tracker import MultiObjectTracker, load_solver
+from motion_gate import MotionGate
+from telemetry import TELEMETRY_PORT, EdgeDetectionReceiver, scale_detections
+from startup_timer import STARTUP
+from detection_log import DetectionLogWriter
+from gui_log import BatchedTextHandler
+from hud import HudCounters, HudOverlay
+from car_sdk import connect_with_backoff
 
 class VideoMonitorAI:
-    def __init__(self, root, host="192.168.1.100", port=5001):
+    def __init__(self, root, host="192.168.1.100", port=5001, backend='ultralytics',
+                 int8=False, detect_rate=0, tracking=True, motion_gate=False,
+                 motion_roi=False, edge_detection=False, telemetry_port=TELEMETRY_PORT,
+                 detection_log=None):
         self.root = root
         self.host = host
         self.port = port
+        self.backend = backend  # 检测后端：ultralytics / onnxruntime / openvino
+        self.detector_options = {'int8': True} if int8 else {}  # INT8量化模型
+        # 推理频率上限（Hz），0 表示不限；开启跟踪时两次推理之间由跟踪器预测检测框
+        self.detect_interval = 1.0 / detect_rate if detect_rate > 0 else 0.0
+        # 运动门控：画面无变化时跳过推理，可选只推理变化区域
+        self.motion_gate = MotionGate(use_roi=motion_roi) if motion_gate else None
+        # 车端检测：不在本地推理，改为订阅小车遥测通道中的检测结果
+        self.edge_detection = edge_detection
+        self.telemetry_port = telemetry_port
+        # 检测日志目录：每次开启视频在其下新建一个列式日志（见 detection_log.py）
+        self.detection_log = detection_log
+        self.log_writer = None
         
         # 设置窗口大小和位置
         window_width = 800
@@ -31,25 +53,38 @@ class VideoMonitorAI:
         
         # 初始化其他变量
         self.camera_running = False
-        self.frame_queue = Queue(maxsize=2)
-        self.processing_frame = False
-        self.frame_interval = 1/30
-        self.last_frame_time = 0
-        self.frame_count = 0
-        self.fps = 0
-        self.fps_update_interval = 1.0
-        self.last_fps_update = time.time()
+        self.frame_slot = LatestFrameSlot()  # 接收线程写入的最新帧
+        self.render_pending = False
+        self.rendered_seq = 0
+        self.rendered_result_seq = 0
+        self.hud_counters = HudCounters()  # 接收/显示帧率、帧龄、码率和丢帧统计
         self.video_socket = None
         self.video_thread = None
+        self.stall_timeout = 3.0  # 超过该时间收不到数据视为连接中断（秒）
+        self.reconnect_times = []  # 每次视频重连的耗时（秒）
         
-        # 初始化YOLO模型
-        try:
-            self.model = YOLO('yolov8n.pt')
-            self.class_names = self.model.model.names
-        except Exception as e:
-            print(f"YOLO模型初始化失败: {e}")
-            self.model = None
-            self.class_names = {}
+        # 多目标跟踪：在推理帧之间预测检测框并分配稳定的轨迹ID
+        # 推理结果在推理/接收线程中送入跟踪器并写入检测日志，界面线程只做预测和绘制，
+        # 跟踪器、检测日志和以下状态由 result_lock 保护
+        self.tracker = MultiObjectTracker() if tracking else None
+        self.result_lock = threading.Lock()
+        self.tracked_seq = 0  # 已送入跟踪器的推理结果序号
+        self.drawn_seq = 0    # 界面线程已绘制的推理结果序号
+        self.tracked_result = ([], 0, 0.0)  # 最近一次跟踪后的结果，供云台自动跟踪等读取
+        self.frame_size = None  # 检测坐标对应的帧尺寸 (宽, 高)（车端检测时为小车采集分辨率）
+        
+        # YOLO模型（进程内所有窗口共享同一个检测服务和模型实例），在后台加载，
+        # 加载期间视频照常显示，模型就绪后才开始叠加检测结果
+        self.detection_service = None
+        self.detector = None
+        self.class_names = {}
+        self.inference_worker = None
+        self.model_state = 'loading'  # loading / ready / failed / edge
+        self.first_detection_logged = False
+        if self.edge_detection:
+            self.model_state = 'edge'
+            self.inference_worker = EdgeDetectionReceiver(
+                host, self.telemetry_port, on_result=self.on_result)
         
         # 创建界面元素
         self.create_widgets()
@@ -57,6 +92,12 @@ class VideoMonitorAI:
         # 设置日志
         self.setup_logging()
         
+        if not self.edge_detection:
+            self.load_model()
+        if self.tracker is not None:
+            # 跟踪器的匈牙利算法依赖 scipy，提前在后台导入
+            threading.Thread(target=load_solver, daemon=True).start()
+        
         # 设置关闭处理
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
@@ -70,8 +111,13 @@ class VideoMonitorAI:
         self.video_frame = ttk.Frame(main_frame)
         self.video_frame.pack(fill=tk.BOTH, expand=True)
         
-        self.video_label = ttk.Label(self.video_frame, background='black')
-        self.video_label.pack(fill=tk.BOTH, expand=True)
+        self.video_canvas = tk.Canvas(self.video_frame, background='black', highlightthickness=0)
+        self.video_canvas.pack(fill=tk.BOTH, expand=True)
+        self.video_surface = DisplaySurface(self.video_canvas)
+        
+        # HUD 叠加在视频左上角，点击画面显示/隐藏
+        self.hud = HudOverlay(self.video_canvas, self.hud_counters)
+        self.video_canvas.bind('<Button-1>', lambda event: self.hud.toggle())
         
         # 控制区域
         control_frame = ttk.Frame(main_frame)
@@ -103,9 +149,15 @@ class VideoMonitorAI:
                                         command=self.take_snapshot)
         self.snapshot_button.pack(side=tk.LEFT, padx=5)
         
-        # FPS显示
-        self.fps_label = ttk.Label(button_frame, text="FPS: 0")
-        self.fps_label.pack(side=tk.LEFT, padx=5)
+        # 推理帧率（摄像头接收/显示帧率在画面 HUD 中显示）
+        self.infer_fps_label = ttk.Label(button_frame, text="推理FPS: 0")
+        self.infer_fps_label.pack(side=tk.LEFT, padx=5)
+        
+        # 模型状态
+        model_text = "模型: 车端检测" if self.model_state == 'edge' else "模型: 加载中..."
+        self.model_label = ttk.Label(button_frame, text=model_text)
+        self.model_label.pack(side=tk.LEFT, padx=5)
+        self.model_label.bind('<Button-1>', self.retry_model_load)  # 加载失败后点击重试
         
         # 日志区域
         log_frame = ttk.Frame(main_frame)
@@ -128,9 +180,23 @@ class VideoMonitorAI:
             # 创建socket连接
             self.video_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.video_socket.connect((self.host, self.port))
+            self.video_socket.settimeout(self.stall_timeout)
             
             self.camera_running = True
             self.camera_button.configure(text="关闭摄像头")
+            self.hud_counters.reset()
+            
+            # 启动推理线程（模型仍在加载时，加载完成后再启动；上次加载失败时重新加载）
+            self.retry_model_load()
+            self.start_inference()
+            
+            if self.detection_log:
+                log_path = os.path.join(self.detection_log,
+                                        f"{self.host}_{time.strftime('%Y%m%d_%H%M%S')}")
+                with self.result_lock:
+                    self.log_writer = DetectionLogWriter(log_path, class_names=self.class_names,
+                                                         background=True)
+                self.logger.info(f"检测日志: {log_path}")
             
             # 启动视频接收线程
             self.video_thread = threading.Thread(target=self.receive_video)
@@ -143,6 +209,66 @@ class VideoMonitorAI:
             self.logger.error(f"连接视频流失败: {e}")
             return False
     
+    def start_inference(self):
+        """启动推理（车端检测模式下连接遥测通道）"""
+        if self.inference_worker is None:
+            return
+        self.inference_worker.reset()
+        with self.result_lock:
+            self.tracked_seq = 0
+            self.drawn_seq = 0
+            self.tracked_result = ([], 0, 0.0)
+            if self.tracker is not None:
+                self.tracker.reset()
+        self.rendered_result_seq = 0
+        if self.edge_detection:
+            self.inference_worker.host = self.host
+        try:
+            self.inference_worker.start()
+        except Exception as e:
+            self.logger.error(f"连接检测遥测通道失败: {e}")
+
+    def load_model(self):
+        """在后台加载共享检测服务（已加载时直接回调）"""
+        self.model_state = 'loading'
+        self.model_label.config(text="模型: 加载中...", cursor='')
+        load_detection_service_async(self.on_model_loaded_async, 'yolov8n.pt',
+                                     self.backend, **self.detector_options)
+
+    def retry_model_load(self, event=None):
+        """模型加载失败后重新加载（点击模型标签或下次开启摄像头时）"""
+        if self.model_state == 'failed':
+            self.logger.info("重新加载检测模型...")
+            self.load_model()
+
+    def on_model_loaded_async(self, service, error):
+        """模型加载线程的回调，切回主线程处理"""
+        try:
+            self.root.after(0, lambda: self.on_model_loaded(service, error))
+        except (RuntimeError, tk.TclError):
+            pass  # 窗口已关闭
+
+    def on_model_loaded(self, service, error):
+        """模型加载完成：注册到共享检测服务，正在播放时立即开始推理"""
+        if error is not None:
+            self.model_state = 'failed'
+            self.model_label.config(text="模型: 加载失败（点击重试）", cursor='hand2')
+            self.logger.error(f"YOLO模型初始化失败: {error}")
+            return
+        
+        # 推理：注册到共享检测服务，按批推理，总是取最新帧、跳过过期帧
+        self.detection_service = service
+        self.detector = service.detector
+        self.class_names = self.detector.class_names
+        self.inference_worker = service.register(
+            self.frame_slot, name=f"{self.host}:{self.port}",
+            min_interval=self.detect_interval, gate=self.motion_gate, on_result=self.on_result)
+        self.model_state = 'ready'
+        self.model_label.config(text="模型: 就绪")
+        self.logger.info(f"检测模型已就绪（{self.backend}），启动耗时: {STARTUP.summary()}")
+        if self.camera_running:
+            self.start_inference()
+
     def stop_monitor(self):
         self.camera_running = False
         if self.video_socket is not None:
@@ -155,8 +281,41 @@ class VideoMonitorAI:
         if self.video_thread is not None and self.video_thread.is_alive():
             self.video_thread.join(timeout=1.0)
         
+        if self.inference_worker is not None:
+            self.inference_worker.stop()
+        with self.result_lock:
+            log_writer, self.log_writer = self.log_writer, None
+        if log_writer is not None:
+            log_writer.close()
+            self.logger.info(f"检测日志已保存 {log_writer.rows_written} 条")
+        if self.motion_gate is not None and self.motion_gate.frames:
+            stats = self.motion_gate.stats()
+            self.logger.info(f"运动门控: 跳过 {stats['gated']}/{stats['frames']} 帧 "
+                             f"({stats['hit_rate']:.0%}), ROI推理 {stats['roi_inferences']} 次, "
+                             f"估计节省推理时间 {stats['saved_time']:.1f}s")
+        if self.reconnect_times:
+            self.logger.info(f"视频重连 {len(self.reconnect_times)} 次，平均耗时 "
+                             f"{sum(self.reconnect_times) / len(self.reconnect_times) * 1000:.0f}ms")
+        self.frame_slot.clear()
+        self.video_surface.clear()
         self.camera_button.configure(text="开启摄像头")
     
+    def reconnect_video(self):
+        """视频连接中断后按退避策略重连，成功返回 True（停止播放时返回 False）"""
+        if self.video_socket:
+            try:
+                self.video_socket.close()
+            except OSError:
+                pass
+        sock, downtime = connect_with_backoff(self.host, self.port, lambda: self.camera_running)
+        if sock is None:
+            return False
+        sock.settimeout(self.stall_timeout)
+        self.video_socket = sock
+        self.reconnect_times.append(downtime)
+        self.logger.info(f"视频已重连，耗时 {downtime * 1000:.0f}ms")
+        return True
+
     def receive_video(self):
         """接收视频流"""
         try:
@@ -165,13 +324,13 @@ class VideoMonitorAI:
                     # 接收帧大小
                     header = self.receive_all(4)
                     if not header:
-                        break
+                        raise ConnectionError("连接已关闭")
                     frame_size = struct.unpack('>L', header)[0]
                     
                     # 接收帧数据
                     frame_data = self.receive_all(frame_size)
                     if not frame_data:
-                        break
+                        raise ConnectionError("连接已关闭")
                     
                     # 解码图像
                     frame = cv2.imdecode(
@@ -180,26 +339,20 @@ class VideoMonitorAI:
                     )
                     
                     if frame is not None:
-                        # 保存最后一帧用于截图
-                        self.last_frame = frame.copy()
-                        
-                        # 处理帧
-                        processed_frame, detections = self.process_frame(frame)
-                        
-                        # 更新FPS
-                        self.update_fps()
-                        
-                        # 转换为tkinter图像
-                        image = Image.fromarray(processed_frame)
-                        photo = ImageTk.PhotoImage(image=image)
+                        # 只写入最新帧，推理在独立线程中进行
+                        self.frame_slot.put(frame)
+                        self.hud_counters.frame_received(frame_size + 4)
                         
-                        # 更新显示
-                        self.video_label.configure(image=photo)
-                        self.video_label.image = photo
+                        # 在主线程中渲染最新帧
+                        self.schedule_render()
                     
                 except Exception as e:
-                    self.logger.error(f"接收视频数据错误: {e}")
-                    break
+                    if not self.camera_running:
+                        break
+                    # Wi-Fi 短暂中断等：自动重连，不需要手动重新开启摄像头
+                    self.logger.warning(f"视频连接中断: {e}，正在重连")
+                    if not self.reconnect_video():
+                        break
                 
         except Exception as e:
             self.logger.error(f"视频接收线程错误: {e}")
@@ -209,6 +362,102 @@ class VideoMonitorAI:
             self.camera_running = False
             self.root.after(0, self.update_camera_button)
     
+    def schedule_render(self):
+        """请求在主线程中渲染一次（合并重复请求，可在任意线程调用）"""
+        if not self.render_pending:
+            self.render_pending = True
+            self.root.after_idle(self.render_latest_frame)
+
+    def on_result(self, detections, seq, ts, infer_time=None):
+        """推理线程（或车端检测接收线程）的结果回调：更新跟踪器，写入检测日志
+
+        每个推理结果都会写入日志，不依赖界面是否绘制；坐标为推理所用帧的分辨率
+        （车端检测为小车采集分辨率），关联上的轨迹ID写入 track_id 列，未关联为 -1。
+        日志在释放 result_lock 之后追加，落盘由写入器的后台线程完成，不阻塞推理和界面渲染。
+        """
+        if self.edge_detection:
+            frame_size = self.inference_worker.frame_size
+        else:
+            frame = self.frame_slot.get()[1]
+            frame_size = (frame.shape[1], frame.shape[0]) if frame is not None else self.frame_size
+        with self.result_lock:
+            tracked = detections
+            track_ids = None
+            if self.tracker is not None:
+                tracked = self.tracker.update(detections)
+                track_ids = self.tracker.detection_ids
+            log_writer = self.log_writer
+            self.tracked_seq = seq
+            self.tracked_result = (tracked, seq, ts)
+            self.frame_size = frame_size
+        if log_writer is not None:
+            rows = detections
+            if track_ids is not None:
+                rows = [dict(det, track_id=track_id) if track_id >= 0 else det
+                        for det, track_id in zip(detections, track_ids)]
+            log_writer.append(seq, ts, rows)
+        if self.edge_detection and self.camera_running:
+            # 车端检测：预览帧率较低，检测结果到达时也重绘最后一帧
+            self.schedule_render()
+
+    def render_latest_frame(self):
+        """在主线程中渲染最新帧，叠加最近一次的检测结果"""
+        self.render_pending = False
+        if not self.camera_running:
+            return
+        try:
+            seq, frame, arrival_ts = self.frame_slot.get()
+            result_seq = self.inference_worker.latest()[1] if self.inference_worker else 0
+            if frame is None or (seq == self.rendered_seq
+                                 and result_seq == self.rendered_result_seq):
+                return
+            if seq != self.rendered_seq:
+                # 两次显示之间被覆盖的帧计为丢帧
+                if self.rendered_seq:
+                    self.hud_counters.dropped_frames += max(0, seq - self.rendered_seq - 1)
+                self.hud_counters.frame_rendered(arrival_ts)
+            self.rendered_seq = seq
+            self.rendered_result_seq = result_seq
+            
+            # 保存最后一帧用于截图
+            self.last_frame = frame
+            
+            # 在副本上绘制，原始帧可能正被推理线程使用
+            detections = self.track_detections(frame.shape)
+            display_frame = self.draw_detections(frame.copy(), detections)
+            self.video_surface.show(display_frame)
+            STARTUP.mark('first_frame')
+            if result_seq and not self.first_detection_logged:
+                self.first_detection_logged = True
+                STARTUP.mark('first_detection')
+                self.logger.info(f"启动耗时: {STARTUP.summary()}")
+            
+            if self.inference_worker is not None:
+                infer_text = f"推理FPS: {self.inference_worker.fps:.1f}"
+                if self.motion_gate is not None:
+                    infer_text += f" 跳过: {self.motion_gate.stats()['hit_rate']:.0%}"
+                self.infer_fps_label.config(text=infer_text)
+        except Exception as e:
+            self.logger.error(f"更新视频帧失败: {e}")
+
+    def track_detections(self, frame_shape):
+        """返回当前帧要绘制的检测结果
+
+        有新的推理结果时绘制跟踪后的结果，否则用跟踪器预测的检测框；未开启跟踪时直接返回最近一次推理结果。
+        检测坐标对应推理所用帧（车端检测为小车采集分辨率），缩放到预览帧尺寸。
+        """
+        with self.result_lock:
+            detections = self.tracked_result[0]
+            if self.tracked_seq == self.drawn_seq and self.tracker is not None:
+                detections = self.tracker.predict()
+            self.drawn_seq = self.tracked_seq
+            frame_size = self.frame_size
+        return scale_detections(detections, frame_size, (frame_shape[1], frame_shape[0]))
+
+    def latest(self):
+        """最近一次推理结果（已跟踪，带轨迹ID）：(检测列表, 帧序号, 帧时间戳)，可在其他线程调用"""
+        return self.tracked_result
+
     def receive_all(self, size):
         """接收指定大小的数据"""
         data = bytearray()
@@ -253,6 +502,7 @@ class VideoMonitorAI:
     def on_closing(self):
         """处理窗口关闭"""
         self.stop_monitor()
+        self.hud.stop()
         self.root.destroy()
 
     def setup_logging(self):
@@ -260,8 +510,8 @@ class VideoMonitorAI:
         self.logger = logging.getLogger('VideoMonitorAI')
         self.logger.setLevel(logging.INFO)
         
-        # 创建文本处理器
-        text_handler = TextHandler(self.log_text)
+        # 创建文本处理器（界面线程定时批量写入）
+        text_handler = BatchedTextHandler(self.log_text)
         text_handler.setLevel(logging.INFO)
         
         # 设置日志格式
@@ -271,76 +521,38 @@ class VideoMonitorAI:
         # 添加处理器
         self.logger.addHandler(text_handler)
 
+    def detect(self, frame):
+        """运行YOLO检测，返回检测结果列表"""
+        if self.detector is None:
+            return []
+        
+        if not isinstance(frame, np.ndarray):
+            frame = np.array(frame)
+        
+        return self.detector.detect(frame)
+    
+    def draw_detections(self, frame, detections):
+        """在帧上绘制检测框，返回RGB图像（帧率等统计由 HUD 显示）"""
+        try:
+            for det in detections:
+                x1, y1, x2, y2 = det['bbox']
+                # 只绘制边界框和轨迹ID，不显示类别
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                if 'track_id' in det:
+                    cv2.putText(frame, f"#{det['track_id']}", (x1, max(y1 - 5, 15)),
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+        except Exception as e:
+            print(f"绘制检测结果时出错: {e}")
+        
+        # 转换颜色空间
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    
     def process_frame(self, frame):
-        """处理视频帧，添加目标检测和跟踪"""
+        """处理视频帧，添加目标检测（同步版本，检测与绘制在同一线程）"""
         detections = []
         try:
-            if not isinstance(frame, np.ndarray):
-                frame = np.array(frame)
-            
-            # 运行YOLO检测
-            if self.model is not None:
-                results = self.model(frame, verbose=False)
-                print("得到结果：", len(results))
-                
-                for result in results:
-                    # 获取检测框
-                    boxes = result.boxes.xyxy.cpu().numpy()
-                    confs = result.boxes.conf.cpu().numpy()
-                    cls = result.boxes.cls.cpu().numpy()
-                    
-                    # 处理每个检测结果
-                    for box, conf, cl in zip(boxes, confs, cls):
-                        x1, y1, x2, y2 = box.astype(int)
-                        class_id = int(cl)
-                        class_name = self.class_names.get(class_id, f"class_{class_id}")
-                        confidence = float(conf)
-                        
-                        # 添加到检测结果列表
-                        detections.append({
-                            'class': class_name,
-                            'confidence': confidence,
-                            'bbox': [x1, y1, x2, y2]
-                        })
-                        
-                        # 只绘制边界框，不显示类别
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            
-            # 显示FPS
-            cv2.putText(frame, f"FPS: {self.fps:.1f}", (10, 30),
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            
-            # 转换颜色空间
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
+            detections = self.detect(frame)
         except Exception as e:
             print(f"处理帧时出错: {e}")
-            # 如果出错，返回原始帧
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        return frame, detections
-    
-    def update_fps(self):
-        """更新FPS计数"""
-        self.frame_count += 1
-        current_time = time.time()
-        elapsed = current_time - self.last_fps_update
-        
-        if elapsed >= self.fps_update_interval:
-            self.fps = self.frame_count / elapsed
-            self.frame_count = 0
-            self.last_fps_update = current_time
-            # 更新FPS显示
-            self.fps_label.config(text=f"FPS: {self.fps:.1f}")
-
-class TextHandler(logging.Handler):
-    def __init__(self, text_widget):
-        super().__init__()
-        self.text_widget = text_widget
-
-    def emit(self, record):
-        def append():
-            msg = self.format(record)
-            self.text_widget.insert(tk.END, msg + '\n')
-            self.text_widget.see(tk.END)
-        self.text_widget.after(0, append) 
\ No newline at end of file
+        return self.draw_detections(frame, detections), detections